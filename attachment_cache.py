@@ -0,0 +1,137 @@
+# attachment_cache.py
+# 責務: 添付ファイルの内容ハッシュ → 抽出テキストを SQLite に永続化する。
+#       同じスキルシート (例: 複数の取引先から届く同一の スキルシート.xlsx) は、メール・実行をまたいで1回だけ解析する。
+#       キーは内容のハッシュのため、メールの EntryID や過去の出力ファイルに依存しない。
+
+import hashlib
+import os
+import sqlite3
+import time
+from config import ATTACHMENT_CACHE_PATH, ATTACHMENT_CACHE_MAX_ENTRIES
+
+# file_processor.get_attachment_text の抽出ロジックを変更した場合に上げる (全件が無効になる)
+ATTACHMENT_PARSER_VERSION = 1
+
+
+def hash_attachment(data: bytes, file_name: str) -> str:
+    """
+    添付ファイルの内容ハッシュ (キャッシュのキー) を返す。
+    解析方法は拡張子で決まるため、同じ内容でも拡張子が違えば別のキーにする。
+    """
+    extension = os.path.splitext(file_name)[1].lower()
+    return f"{hashlib.sha256(data).hexdigest()}{extension}"
+
+
+def hash_attachment_stream(stream, file_name: str, chunk_size: int = 1024 * 1024) -> str:
+    """hash_attachment と同じキーを、ファイルライクオブジェクトから少しずつ読んで計算する (大きなファイル用)。"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        digest.update(chunk)
+    extension = os.path.splitext(file_name)[1].lower()
+    return f"{digest.hexdigest()}{extension}"
+
+
+class AttachmentTextCache:
+    """
+    内容ハッシュをキーに、添付ファイルの抽出テキストを保存する SQLite キャッシュ。
+
+    - lookup(): 抽出テキストを返す (無ければ None)
+    - store(): 解析したテキストを書き込み待ちに積む (一定件数ごとにまとめてコミット)
+    - close(): 未書き込み分を反映し、上限件数を超えた分を最終利用が古い順に削除する
+    hits / misses / evictions の件数を stats に保持する。
+    同じスレッドで生成・使用すること（sqlite3 の接続はスレッドをまたげない）。
+    """
+
+    FLUSH_EVERY = 200
+
+    def __init__(self, path: str = ATTACHMENT_CACHE_PATH, max_entries: int = ATTACHMENT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._pending_texts = {}
+        self._pending_used = {}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS attachments ("
+            " content_hash TEXT PRIMARY KEY, parser_version INTEGER NOT NULL, text TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_attachments_last_used ON attachments (last_used)")
+        self._conn.commit()
+
+    def lookup(self, content_hash: str):
+        """抽出テキストを返す。無い場合・解析ロジックのバージョンが古い場合は None。"""
+        if content_hash in self._pending_texts:
+            self.stats['hits'] += 1
+            return self._pending_texts[content_hash]
+        row = self._conn.execute(
+            "SELECT text FROM attachments WHERE content_hash = ? AND parser_version = ?",
+            (content_hash, ATTACHMENT_PARSER_VERSION),
+        ).fetchone()
+        if row is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        self._pending_used[content_hash] = time.time()
+        return row[0]
+
+    def store(self, content_hash: str, text: str):
+        self._pending_texts[content_hash] = text
+        if len(self._pending_texts) >= self.FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """書き込み待ちのテキストと最終利用時刻を1トランザクションで反映する。"""
+        if not self._pending_texts and not self._pending_used:
+            return
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO attachments (content_hash, parser_version, text, last_used) VALUES (?, ?, ?, ?)",
+                [(content_hash, ATTACHMENT_PARSER_VERSION, text, now) for content_hash, text in self._pending_texts.items()],
+            )
+            self._conn.executemany(
+                "UPDATE attachments SET last_used = ? WHERE content_hash = ?",
+                [(used, content_hash) for content_hash, used in self._pending_used.items()],
+            )
+        self._pending_texts = {}
+        self._pending_used = {}
+
+    def evict(self) -> int:
+        """上限件数を超えた分と古いバージョンの解析結果を、最終利用が古い順に削除する。削除件数を返す。"""
+        with self._conn:
+            outdated = self._conn.execute(
+                "DELETE FROM attachments WHERE parser_version != ?", (ATTACHMENT_PARSER_VERSION,)
+            ).rowcount
+        total = self._conn.execute("SELECT COUNT(*) FROM attachments").fetchone()[0]
+        excess = max(total - self.max_entries, 0)
+        if excess:
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM attachments WHERE content_hash IN"
+                    " (SELECT content_hash FROM attachments ORDER BY last_used ASC LIMIT ?)", (excess,)
+                )
+        self.stats['evictions'] += outdated + excess
+        return outdated + excess
+
+    def summary(self) -> str:
+        """ヒット率などの集計を1行の文字列で返す。"""
+        looked_up = self.stats['hits'] + self.stats['misses']
+        hit_rate = (self.stats['hits'] / looked_up) * 100 if looked_up else 0
+        return (f"添付ファイルキャッシュ: ヒット {self.stats['hits']} / ミス {self.stats['misses']} "
+                f"/ 削除 {self.stats['evictions']} (ヒット率 {hit_rate:.1f}%)")
+
+    def close(self):
+        self.flush()
+        self.evict()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,301 @@
+# attachment_pool.py
+# 責務: 添付ファイルのテキスト化 (file_processor.get_attachment_text) をワーカープールで実行する。
+#       COM スレッドは添付ファイルの内容をスプール (attachment_spool.py) に読み込んでジョブを投入するだけにし、
+#       大きな Excel / PDF の解析中もメールの列挙を止めない。結果は submit() の戻り値 (ジョブ) から collect() で受け取る。
+#       添付ファイルキャッシュ (attachment_cache.py) を渡すと、内容が同じファイルは解析せずにキャッシュのテキストを使う。
+
+import itertools
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from config import ATTACHMENT_WORKERS, ATTACHMENT_POOL_MODE, ATTACHMENT_TIMEOUT_SEC, ATTACHMENT_MAX_ABANDONED_JOBS
+from attachment_cache import hash_attachment_stream
+from attachment_spool import AttachmentSpool, spool_file_path
+
+try:
+    from file_processor import get_attachment_text
+except ImportError:
+    def get_attachment_text(*args, **kwargs): return "ATTACHMENT_CONTENT_FILE_IO_FAILED"
+
+
+def parse_spooled_attachment(file_name: str, data: bytes, path: str, spool_dir: str) -> str:
+    """
+    スプールした添付ファイル (data: メモリ上の内容 / path: 書き出したファイル) をテキスト化する。
+    解析関数 (file_processor.get_attachment_text) はパスしか受け付けないため、メモリ上の内容は
+    解析の直前にスプール先 (ローカルの一時ディレクトリ) へ書き出す。書き出したファイルは解析後に削除する
+    (ワーカーで実行。ProcessPoolExecutor から pickle 可能な関数)。
+    """
+    if data is not None:
+        path = spool_file_path(spool_dir, file_name)
+        with open(path, 'wb') as f:
+            f.write(data)
+    try:
+        return str(get_attachment_text(path, file_name))
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# 実行を待っているジョブの開始を確認する間隔 (秒)
+_START_POLL_SEC = 0.05
+
+# [ワーカープロセス] ジョブの開始時刻を親プロセスに知らせるキュー (process モードのみ)
+_started_queue = None
+
+
+def _init_process_worker(started_queue):
+    global _started_queue
+    _started_queue = started_queue
+
+
+def _run_job(job_id: int, started, file_name: str, data: bytes, path: str, spool_dir: str) -> str:
+    """
+    [ワーカーで実行] 開始時刻を記録してから parse_spooled_attachment を実行する (待ち時間の上限は開始から数える)。
+    started は thread モードでは開始時刻の dict (同じプロセス)、process モードでは None (_started_queue で知らせる)。
+    """
+    if started is not None:
+        started[job_id] = time.time()
+    else:
+        _started_queue.put((job_id, time.time()))
+    return parse_spooled_attachment(file_name, data, path, spool_dir)
+
+
+def _format_text(file_name: str, content: str) -> str:
+    return f"\n--- FILE: {file_name} ---\n{content}\n"
+
+
+def _format_error(file_name: str, error) -> str:
+    return f"\n--- ERROR reading {file_name}: {error} ---\n"
+
+
+def is_complete(attachments_text: str) -> bool:
+    """collect() の結果に、読み込み・解析に失敗 (タイムアウトを含む) したファイルが無いかを返す。"""
+    return "--- ERROR reading " not in attachments_text
+
+
+class AttachmentPool:
+    """
+    添付ファイルのテキスト化を行うワーカープール。
+    workers が 0 以下の場合はプールを作らず、submit() の中で直列に処理する (従来どおりの動作)。
+    mode は "thread" (既定。解析ライブラリの多くは I/O と C 実装の処理で GIL を手放す) または "process"。
+    timeout はファイル1件の解析が始まってから結果を待つ上限 (秒。workers > 0 の場合のみ)。
+    他のジョブの後ろで実行を待つ時間は数えない。超えたファイルはエラーとして本文に記録し、結果を待たずに進む。
+    cache (attachment_cache.AttachmentTextCache) を渡した場合は、解析前に内容ハッシュで参照し、
+    解析に成功したテキストを書き込む。cache は close() で一緒に閉じる。
+    spool (attachment_spool.AttachmentSpool) を省略した場合は、既定の設定のスプールを使う。
+
+    注意: タイムアウトした解析は止められない (スレッドは外から止められず、ProcessPoolExecutor もワーカーを個別に止められない)。
+    見捨てたジョブはワーカーを占有したまま残るため、プールのワーカーがすべて埋まった場合は新しいプールに入れ替え、
+    実行待ちのジョブを移す。見捨てたまま終わらないジョブが max_abandoned 件に達した後は、プールを入れ替えず
+    (占有されたワーカーがそれ以上増えないように)、ワーカーが空くまで新しい添付ファイルはエラーとして記録する。
+    """
+
+    def __init__(self, workers: int = ATTACHMENT_WORKERS, mode: str = ATTACHMENT_POOL_MODE,
+                 timeout: float = ATTACHMENT_TIMEOUT_SEC, cache=None, spool: AttachmentSpool = None,
+                 max_abandoned: int = ATTACHMENT_MAX_ABANDONED_JOBS):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"未対応のプール種別です: {mode}")
+        self.workers = workers
+        self.mode = mode
+        self.timeout = timeout
+        self.max_abandoned = max_abandoned
+        self.cache = cache
+        self.spool = spool if spool is not None else AttachmentSpool()
+        self.stats = {'files': 0, 'errors': 0, 'timeouts': 0, 'abandoned': 0, 'pool_replacements': 0}
+        self._job_ids = itertools.count()
+        self._started = {}     # {ジョブ番号: 開始時刻} ワーカーが解析を始めた時刻
+        self._started_queue = multiprocessing.Queue() if workers > 0 and mode == "process" else None
+        self._jobs = {}        # {future: (ジョブ番号, ファイル名, SpooledAttachment, プール)} 終わっていないジョブ
+        self._replaced = {}    # {future: future} プールの入れ替えで移したジョブの、移した先
+        self._abandoned = set()  # タイムアウトして見捨てた (まだ終わっていない) ジョブ
+        self._in_flight = {}   # {内容ハッシュ: future} 解析中の同じ内容のファイルは、同じジョブの結果を使う
+        self._timed_out = set()
+        self.executor = self._new_executor() if workers > 0 else None
+
+    def _new_executor(self):
+        if self.mode == "process":
+            return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_process_worker,
+                                       initargs=(self._started_queue,))
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="attachment")
+
+    def _submit_job(self, file_name: str, spooled):
+        job_id = next(self._job_ids)
+        started = None if self.mode == "process" else self._started
+        future = self.executor.submit(_run_job, job_id, started, file_name, spooled.data, spooled.path, self.spool.spool_dir)
+        self._jobs[future] = (job_id, file_name, spooled, self.executor)
+        return future
+
+    def submit(self, attachments) -> list:
+        """
+        添付ファイル [(ファイル名, 読み込み関数), ...] をスプールに読み込み、テキスト化のジョブを投入する。
+        読み込み関数は AttachmentSpool を1つ受け取り、SpooledAttachment を返す
+        (例: lambda spool: spool.from_outlook(attachment.FileName, attachment))。
+        戻り値のジョブ [(ファイル名, future または None, 完成したテキスト または None, 内容ハッシュ), ...] を collect() に渡す。
+        """
+        jobs = []
+        for file_name, load in attachments:
+            self.stats['files'] += 1
+            spooled = None
+            content_hash = None
+            try:
+                spooled = load(self.spool)
+                if self.cache is not None:
+                    with spooled.open() as stream:
+                        content_hash = hash_attachment_stream(stream, file_name)
+                    cached_text = self.cache.lookup(content_hash)
+                    if cached_text is None and content_hash in self._in_flight:
+                        spooled.discard()
+                        jobs.append((file_name, self._in_flight[content_hash], None, content_hash))
+                        continue
+                    if cached_text is not None:
+                        spooled.discard()
+                        jobs.append((file_name, None, _format_text(file_name, cached_text), None))
+                        continue
+
+                if self.executor is None:
+                    content = parse_spooled_attachment(file_name, spooled.data, spooled.path, self.spool.spool_dir)
+                    if content_hash is not None:
+                        self.cache.store(content_hash, content)
+                    jobs.append((file_name, None, _format_text(file_name, content), None))
+                    continue
+                if self._stuck():
+                    raise RuntimeError("解析ワーカーがすべて応答しないため、テキスト化できませんでした")
+                future = self._submit_job(file_name, spooled)
+                if content_hash is not None:
+                    self._in_flight[content_hash] = future
+                jobs.append((file_name, future, None, content_hash))
+            except Exception as file_ex:
+                self.stats['errors'] += 1
+                jobs.append((file_name, None, _format_error(file_name, file_ex), None))
+                if spooled is not None:
+                    spooled.discard()
+        return jobs
+
+    def _current(self, future):
+        """プールの入れ替えで移したジョブは、移した先の future を返す。"""
+        while future in self._replaced:
+            future = self._replaced[future]
+        return future
+
+    def _started_at(self, future):
+        """ジョブの開始時刻 (まだ始まっていない場合は None)。"""
+        if self._started_queue is not None:
+            while True:
+                try:
+                    job_id, started = self._started_queue.get_nowait()
+                except queue.Empty:
+                    break
+                self._started[job_id] = started
+        job = self._jobs.get(future)
+        return self._started.get(job[0]) if job is not None else None
+
+    def _stuck(self) -> bool:
+        """現在のプールのワーカーが、すべて見捨てたジョブで埋まっているか。"""
+        self._abandoned = {future for future in self._abandoned if not future.done()}
+        return sum(1 for future in self._abandoned if self._jobs[future][3] is self.executor) >= self.workers
+
+    def _abandon(self, future):
+        """期限を過ぎたジョブを見捨てる。プールのワーカーがすべて埋まった場合は、上限まではプールを入れ替える。"""
+        if future in self._timed_out:
+            return
+        self._timed_out.add(future)
+        if future.done():
+            return
+        self._abandoned.add(future)
+        self.stats['abandoned'] += 1
+        if self._stuck() and len(self._abandoned) < self.max_abandoned:
+            self._replace_executor()
+
+    def _replace_executor(self):
+        """新しいプールを作り、古いプールで実行を待っているジョブを移す (実行中のジョブは古いプールで続ける)。"""
+        old_executor = self.executor
+        self.executor = self._new_executor()
+        self.stats['pool_replacements'] += 1
+        for future, (job_id, file_name, spooled, executor) in list(self._jobs.items()):
+            if executor is not old_executor or future.done() or future in self._abandoned:
+                continue
+            # process モードでは、実行待ちのジョブもワーカーへの受け渡し用のキューに入ると取り消せないため、開始前なら移す
+            if future.cancel() or self._started_at(future) is None:
+                self._replaced[future] = self._submit_job(file_name, spooled)
+                del self._jobs[future]
+        for content_hash, future in self._in_flight.items():
+            self._in_flight[content_hash] = self._current(future)
+        old_executor.shutdown(wait=False)
+        print(f"⚠️ 添付ファイルの解析ワーカーがすべて応答しないため、新しいワーカーで続けます (見捨てたジョブ: {len(self._abandoned)} 件)")
+
+    def _reap(self):
+        """開始から timeout 秒を過ぎたジョブを見捨てる (実行待ちのジョブが、応答しないワーカーの後ろで待ち続けないように)。"""
+        now = time.time()
+        for future in list(self._jobs):
+            if future.done() or future in self._timed_out:
+                continue
+            started = self._started_at(future)
+            if started is not None and now - started > self.timeout:
+                self._abandon(future)
+
+    def _wait(self, future) -> str:
+        """ジョブの結果を、ジョブが始まってから timeout 秒まで待つ。超えた場合は FutureTimeoutError。"""
+        while True:
+            future = self._current(future)
+            if future in self._timed_out:
+                # 同じ内容のファイルで一度タイムアウトしたジョブは、再び待たない
+                raise FutureTimeoutError()
+            started = self._started_at(future)
+            if started is None and self._stuck():
+                raise RuntimeError("解析ワーカーがすべて応答しないため、テキスト化できませんでした")
+            wait = _START_POLL_SEC if started is None else max(started + self.timeout - time.time(), 0)
+            try:
+                return future.result(timeout=wait)
+            except FutureTimeoutError:
+                if started is not None:
+                    self._abandon(future)
+                    raise
+                self._reap()
+
+    def is_done(self, jobs) -> bool:
+        return all(future is None or self._current(future).done() for _, future, _, _ in jobs or [])
+
+    def collect(self, jobs) -> str:
+        """ジョブの結果を投入順に結合した添付ファイルのテキストを返す (ファイルごとに、解析の開始から timeout 秒まで待つ)。"""
+        attachments_text = ""
+        for file_name, future, text, content_hash in jobs:
+            if future is not None:
+                try:
+                    content = self._wait(future)
+                    text = _format_text(file_name, content)
+                    if content_hash is not None and self._in_flight.pop(content_hash, None) is not None:
+                        self.cache.store(content_hash, content)
+                except FutureTimeoutError:
+                    self.stats['timeouts'] += 1
+                    self._in_flight.pop(content_hash, None)
+                    text = _format_error(file_name, f"テキスト化が開始から {self.timeout} 秒以内に終わりませんでした")
+                except Exception as file_ex:
+                    self.stats['errors'] += 1
+                    self._in_flight.pop(content_hash, None)
+                    text = _format_error(file_name, file_ex)
+            attachments_text += text
+        for future in [future for future in self._jobs if future.done()]:
+            self._started.pop(self._jobs.pop(future)[0], None)
+        return attachments_text.strip()
+
+    def close(self):
+        """プール・キャッシュ・スプールを閉じる。実行前に取り消したジョブの書き出したファイルは削除する (実行中のジョブは待たない)。"""
+        if self.cache is not None:
+            print(self.cache.summary())
+            self.cache.close()
+            self.cache = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            for future, (_, _, spooled, _) in self._jobs.items():
+                if future.cancelled():
+                    spooled.discard()
+            self._jobs = {}
+        if self._started_queue is not None:
+            self._started_queue.close()
+        self.spool.close()
+        if self.stats['timeouts']:
+            print(f"⚠️ 添付ファイルのテキスト化がタイムアウトしたファイル: {self.stats['timeouts']} 件")
+        if self._abandoned:
+            print(f"⚠️ 終了時に応答していない解析ワーカー: {len(self._abandoned)} 件 (見捨てたジョブはワーカーを占有したまま残ります)")
@@ -0,0 +1,103 @@
+# attachment_spool.py
+# 責務: 添付ファイルの内容を読み込んで保持 (スプール) する。閾値以下のファイルはメモリ上に、超えるファイルはディスクに置く。
+#       従来は添付ファイルごとに「一時ファイルへ保存 → 読み込み → 削除」をプロファイル配下 (SCRIPT_DIR) で行っており、
+#       ネットワーク上のプロファイルでは3回のファイル操作が大きな待ち時間になっていた。
+#       Outlook の添付ファイルは PR_ATTACH_DATA_BIN プロパティからバイト列を直接読み、読めない場合だけ SaveAsFile を使う。
+#       メモリ上の内容は、添付ファイルキャッシュの参照 (内容ハッシュ) に書き出さずに使う (キャッシュにあれば書き出しは不要)。
+#       注意: 解析関数 (file_processor.get_attachment_text) はパスしか受け付けないため、解析するファイルは大きさによらず
+#       解析の直前に書き出す (attachment_pool.parse_spooled_attachment)。書き出し先は、既定ではローカルの一時ディレクトリ
+#       (ATTACHMENT_SPOOL_DIR)。減るのはプロファイル配下への書き出し・読み戻しと、キャッシュにあるファイルの書き出しで、
+#       解析するファイルの書き出しは残る。
+
+import io
+import os
+import re
+import uuid
+from config import ATTACHMENT_SPOOL_DIR, ATTACHMENT_SPOOL_MAX_MEMORY_BYTES
+
+# 添付ファイルの内容 (バイナリ) を表す MAPI プロパティ
+PR_ATTACH_DATA_BIN = "http://schemas.microsoft.com/mapi/proptag/0x37010102"
+
+
+def spool_file_path(spool_dir: str, file_name: str) -> str:
+    """スプール先のディレクトリに、重複しない書き出し用のパスを作る。"""
+    os.makedirs(spool_dir, exist_ok=True)
+    safe_filename = re.sub(r'[\\/:*?"<>|]', '_', file_name)
+    return os.path.join(spool_dir, f"{uuid.uuid4().hex}_{safe_filename}")
+
+
+class SpooledAttachment:
+    """添付ファイル1件の内容。data (メモリ上のバイト列) か path (書き出したファイル) のどちらかを持つ。"""
+
+    def __init__(self, file_name: str, data: bytes = None, path: str = None):
+        self.file_name = file_name
+        self.data = data
+        self.path = path
+
+    @property
+    def in_memory(self) -> bool:
+        return self.data is not None
+
+    def open(self):
+        """内容を読み取るファイルライクオブジェクトを返す。"""
+        if self.data is not None:
+            return io.BytesIO(self.data)
+        return open(self.path, 'rb')
+
+    def discard(self):
+        """書き出したファイルがあれば削除する (解析に渡さない場合に呼ぶ)。"""
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class AttachmentSpool:
+    """
+    添付ファイルのスプール。max_memory_bytes 以下のファイルはメモリ上に保持し、超えるファイルは spool_dir に書き出す
+    (メモリ上のファイルも、解析する場合は attachment_pool.parse_spooled_attachment が書き出す)。
+    stats に、メモリ上に保持した件数 (in_memory) と書き出した件数 (spilled) を数える。
+    """
+
+    def __init__(self, spool_dir: str = ATTACHMENT_SPOOL_DIR, max_memory_bytes: int = ATTACHMENT_SPOOL_MAX_MEMORY_BYTES):
+        self.spool_dir = spool_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.stats = {'in_memory': 0, 'spilled': 0}
+
+    def from_bytes(self, file_name: str, data: bytes) -> SpooledAttachment:
+        if len(data) <= self.max_memory_bytes:
+            self.stats['in_memory'] += 1
+            return SpooledAttachment(file_name, data=data)
+        path = spool_file_path(self.spool_dir, file_name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.stats['spilled'] += 1
+        return SpooledAttachment(file_name, path=path)
+
+    def from_saver(self, file_name: str, save_as_file) -> SpooledAttachment:
+        """保存関数 (Outlook の Attachment.SaveAsFile と同じ形) でスプール先に書き出す。"""
+        path = spool_file_path(self.spool_dir, file_name)
+        try:
+            save_as_file(path)
+        except Exception:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        self.stats['spilled'] += 1
+        return SpooledAttachment(file_name, path=path)
+
+    def from_outlook(self, file_name: str, attachment) -> SpooledAttachment:
+        """
+        Outlook の添付ファイルを読み込む。閾値以下のファイルは PR_ATTACH_DATA_BIN からバイト列を直接読み、
+        読めない場合 (大きなファイル、埋め込みアイテムなど) は SaveAsFile で書き出す。
+        """
+        if getattr(attachment, 'Size', self.max_memory_bytes + 1) <= self.max_memory_bytes:
+            try:
+                data = attachment.PropertyAccessor.GetProperty(PR_ATTACH_DATA_BIN)
+                return self.from_bytes(file_name, bytes(data))
+            except Exception:
+                pass
+        return self.from_saver(file_name, attachment.SaveAsFile)
+
+    def close(self):
+        if os.path.exists(self.spool_dir) and not os.listdir(self.spool_dir):
+            try: os.rmdir(self.spool_dir)
+            except OSError: pass
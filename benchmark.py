@@ -0,0 +1,303 @@
+# benchmark.py
+# 責務: data_generation.generate_raw_data で作った試験用メールを使い、
+#       抽出・評価・Excel出力・検索の各処理の処理速度 (件/秒) とピークメモリを計測して JSON に書き出す。
+#
+# 使い方:
+#   python benchmark.py                          # 既定の件数 (BENCHMARK_SIZES) で全ステージを計測
+#   python benchmark.py --sizes 1000,10000 --stages extract,search --output bench.json
+#   python benchmark.py --check                  # 抽出・検索をベースラインと比較し、性能が落ちていれば終了コード1
+#   python benchmark.py --update-baseline        # 現在の計測結果でベースラインを更新する (基準マシンで実行)
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+from config import BENCHMARK_SIZES, BENCHMARK_SEED, BENCHMARK_OUTPUT_PATH, SCRIPT_DIR
+from config import (BENCHMARK_BASELINE_PATH, BENCHMARK_CHECK_SIZE, BENCHMARK_CHECK_REPEAT,
+                    BENCHMARK_THROUGHPUT_TOLERANCE, BENCHMARK_MEMORY_TOLERANCE)
+from data_generation import generate_raw_data
+from extraction_core import extract_skills_data
+from evaluator_core import run_triple_csv_validation
+from result_schema import apply_result_schema
+from skillsheet_filter import filter_skillsheets
+
+STAGES = ['extract', 'evaluate', 'excel', 'search']
+CHECK_STAGES = ['extract', 'search'] # 回帰チェックの対象 (ホットパス)
+
+# 検索ステージで使う条件 (検索画面の入力に相当)
+SEARCH_KEYWORDS = ['java']
+SEARCH_RANGES = {
+    'age': {'lower': '25', 'upper': '50'},
+    'price': {'lower': '', 'upper': '1000000'},
+    'start': {'lower': '', 'upper': ''},
+}
+# 検索画面 (App._load_data) と同じ列名に揃える
+SEARCH_RENAME_MAP = {
+    '単金': '単価',
+    'スキルor言語': 'スキル',
+    '名前': '氏名',
+    '期間_開始': '実働開始',
+    '本文(テキスト形式)': '本文',
+    '本文(ファイル含む)': '添付ファイル内容',
+    '件名（メール）': '件名',
+}
+
+
+def _measure(func, with_memory: bool = True, repeat: int = 1):
+    """
+    func() を実行し、(戻り値, 経過秒, ピークメモリMB) を返す。
+    tracemalloc は処理を遅くするため、時間は計測なしの実行（repeat 回の最短値）、メモリは別の1回で測る。
+    """
+    elapsed = None
+    for _ in range(max(repeat, 1)):
+        gc.collect()
+        started = time.perf_counter()
+        result = func()
+        run_elapsed = time.perf_counter() - started
+        elapsed = run_elapsed if elapsed is None else min(elapsed, run_elapsed)
+
+    peak_mb = None
+    if with_memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func()
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+    return result, elapsed, peak_mb
+
+
+def build_corpus(num_records: int, seed: int = BENCHMARK_SEED):
+    """固定シードで試験用データを生成し、(問題 DataFrame, 正解 DataFrame) を返す。"""
+    random.seed(seed)
+    df_raw = generate_raw_data(num_records)
+    df_question = df_raw[['EntryID', '件名', '本文(テキスト形式)', '宛先メール']].copy()
+    master_cols = ['EntryID', '名前', '年齢', '単金', 'スキルor言語', '業種']
+    df_master = df_raw[['EntryID'] + [f'{col}_M' for col in master_cols[1:]]].copy()
+    df_master.columns = master_cols
+    return df_question, df_master
+
+
+def _search_frame(df_extracted: pd.DataFrame) -> pd.DataFrame:
+    """抽出結果を検索画面で読み込んだ時と同じ列名・型に変換する。"""
+    df = df_extracted.rename(columns={k: v for k, v in SEARCH_RENAME_MAP.items() if k in df_extracted.columns})
+    for col in ['スキル', '件名', '本文', '添付ファイル内容']:
+        if col not in df.columns:
+            df[col] = ''
+    return apply_result_schema(df)
+
+
+def run_benchmark(sizes, stages=STAGES, mode: str = "row", with_memory: bool = True, seed: int = BENCHMARK_SEED,
+                  repeat: int = 1) -> list:
+    """件数ごとに各ステージを計測し、結果の dict のリストを返す。"""
+    results = []
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for num_records in sizes:
+            print(f"\n--- {num_records} 件 ---")
+            df_question, df_master = build_corpus(num_records, seed)
+            master_path = os.path.join(work_dir, 'master.tsv')
+            df_master.to_csv(master_path, index=False, encoding='utf-8-sig', sep='\t')
+
+            # 後続ステージの入力として、抽出結果は計測の有無にかかわらず用意する
+            def extract():
+                return extract_skills_data(df_question.copy(), mode=mode)
+
+            if 'extract' in stages:
+                df_extracted, elapsed, peak_mb = _measure(extract, with_memory, repeat)
+                results.append(_result('extract', num_records, elapsed, peak_mb))
+            else:
+                df_extracted = extract()
+
+            stage_funcs = {
+                'evaluate': lambda: _quiet(run_triple_csv_validation, df_extracted, master_path,
+                                           os.path.join(work_dir, 'eval.tsv')),
+                'excel': lambda: df_extracted.to_excel(os.path.join(work_dir, 'result.xlsx'), index=False),
+            }
+            if 'search' in stages:
+                df_search = _search_frame(df_extracted)
+                stage_funcs['search'] = lambda: filter_skillsheets(df_search, SEARCH_KEYWORDS, SEARCH_RANGES)
+
+            for stage in stages:
+                if stage == 'extract':
+                    continue
+                try:
+                    _, elapsed, peak_mb = _measure(stage_funcs[stage], with_memory, repeat)
+                    results.append(_result(stage, num_records, elapsed, peak_mb))
+                except ImportError as e:
+                    # Excel 出力の openpyxl など、任意の依存が無い場合は計測を省く
+                    results.append(_result(stage, num_records, skipped=str(e)))
+
+    return results
+
+
+def _quiet(func, *args):
+    """評価処理などのコンソール出力を抑えて実行する。"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args)
+
+
+def _result(stage: str, num_records: int, elapsed: float = None, peak_mb: float = None, skipped: str = None) -> dict:
+    result = {'stage': stage, 'records': num_records}
+    if skipped is not None:
+        result['skipped'] = skipped
+        print(f"  {stage:<9} スキップ ({skipped})")
+        return result
+
+    result['seconds'] = round(elapsed, 4)
+    result['records_per_sec'] = round(num_records / elapsed, 1) if elapsed > 0 else None
+    result['peak_memory_mb'] = round(peak_mb, 2) if peak_mb is not None else None
+    memory_text = f"{peak_mb:8.1f} MB" if peak_mb is not None else "       - MB"
+    print(f"  {stage:<9} {elapsed:9.3f} 秒  {result['records_per_sec']:>12} 件/秒  {memory_text}")
+    return result
+
+
+def _git_commit() -> str:
+    """計測したコードのコミット。コミットしていない変更がある場合は '-dirty' を付ける (ベースラインを更新するコミットなど)。"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        changes = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=SCRIPT_DIR,
+                                 capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{commit}-dirty" if changes else commit
+
+
+def build_report(results: list, mode: str, seed: int) -> dict:
+    """計測結果に実行環境の情報を添えた、コミット間で比較できるレポートを作る。"""
+    return {
+        'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'extraction_mode': mode,
+        'seed': seed,
+        'results': results,
+    }
+
+
+def write_report(report: dict, path: str):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📊 ベンチマーク結果を出力しました: {path}")
+
+
+def compare_with_baseline(results: list, baseline: dict, throughput_tolerance: float = BENCHMARK_THROUGHPUT_TOLERANCE,
+                          memory_tolerance: float = BENCHMARK_MEMORY_TOLERANCE) -> list:
+    """
+    計測結果をベースラインと比較し、許容範囲を超えた劣化の説明文のリストを返す（空なら合格）。
+    どちらかで計測できなかったステージは比較しない。
+    """
+    baseline_results = {
+        (r['stage'], r['records']): r for r in baseline.get('results', []) if 'skipped' not in r
+    }
+    failures = []
+    for result in results:
+        key = (result['stage'], result['records'])
+        base = baseline_results.get(key)
+        if 'skipped' in result or base is None:
+            print(f"  {result['stage']:<9} {result['records']} 件: ベースラインと比較できないため省略")
+            continue
+
+        if base.get('records_per_sec') and result.get('records_per_sec'):
+            ratio = result['records_per_sec'] / base['records_per_sec']
+            status = '✅' if ratio >= 1 - throughput_tolerance else '❌'
+            print(f"  {status} {result['stage']:<9} 処理速度 {result['records_per_sec']:>10} 件/秒 "
+                  f"(ベースライン {base['records_per_sec']}, {ratio * 100:.0f}%)")
+            if status == '❌':
+                failures.append(f"{result['stage']}: 処理速度が {(1 - ratio) * 100:.0f}% 低下 "
+                                f"({base['records_per_sec']} → {result['records_per_sec']} 件/秒)")
+
+        if base.get('peak_memory_mb') and result.get('peak_memory_mb') is not None:
+            ratio = result['peak_memory_mb'] / base['peak_memory_mb']
+            status = '✅' if ratio <= 1 + memory_tolerance else '❌'
+            print(f"  {status} {result['stage']:<9} ピークメモリ {result['peak_memory_mb']:>8} MB "
+                  f"(ベースライン {base['peak_memory_mb']}, {ratio * 100:.0f}%)")
+            if status == '❌':
+                failures.append(f"{result['stage']}: ピークメモリが {(ratio - 1) * 100:.0f}% 増加 "
+                                f"({base['peak_memory_mb']} → {result['peak_memory_mb']} MB)")
+    return failures
+
+
+def run_check(args) -> int:
+    """回帰チェック (--check / --update-baseline) を実行し、終了コードを返す。"""
+    results = run_benchmark([args.check_size], CHECK_STAGES, args.mode, True, args.seed, BENCHMARK_CHECK_REPEAT)
+    report = build_report(results, args.mode, args.seed)
+
+    if args.update_baseline:
+        write_report(report, args.baseline)
+        print("✅ ベースラインを更新しました。基準マシンで計測した結果をコミットしてください。")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"❌ ベースライン '{args.baseline}' がありません。先に --update-baseline を実行してください。")
+        return 1
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    if baseline.get('platform') != report['platform'] or baseline.get('python') != report['python']:
+        print(f"⚠️ ベースラインと実行環境が異なります ({baseline.get('platform')} / Python {baseline.get('python')})。"
+              "結果は参考値として扱ってください。")
+
+    print(f"\n--- ベースライン ({baseline.get('commit')}) との比較 ---")
+    failures = compare_with_baseline(results, baseline, args.throughput_tolerance, args.memory_tolerance)
+    if failures:
+        print("\n❌ 性能の劣化を検出しました:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    print("\n✅ 性能はベースラインの許容範囲内です。")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='抽出パイプラインのベンチマーク')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in BENCHMARK_SIZES),
+                        help='計測する件数 (カンマ区切り)')
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"計測するステージ (カンマ区切り: {','.join(STAGES)})")
+    parser.add_argument('--mode', default='row', choices=['row', 'vectorized'], help='extract_skills_data の抽出モード')
+    parser.add_argument('--seed', type=int, default=BENCHMARK_SEED, help='試験用データの乱数シード')
+    parser.add_argument('--no-memory', action='store_true', help='ピークメモリを計測しない (計測時間が約半分になる)')
+    parser.add_argument('--output', default=BENCHMARK_OUTPUT_PATH, help='結果 JSON の出力先')
+    parser.add_argument('--check', action='store_true', help='抽出・検索の性能をベースラインと比較する (劣化時は終了コード1)')
+    parser.add_argument('--update-baseline', action='store_true', help='抽出・検索を計測してベースラインを書き換える')
+    parser.add_argument('--baseline', default=BENCHMARK_BASELINE_PATH, help='ベースライン JSON のパス')
+    parser.add_argument('--check-size', type=int, default=BENCHMARK_CHECK_SIZE, help='回帰チェックに使う件数')
+    parser.add_argument('--throughput-tolerance', type=float, default=BENCHMARK_THROUGHPUT_TOLERANCE,
+                        help='許容する処理速度の低下率 (0.2 = 20%%)')
+    parser.add_argument('--memory-tolerance', type=float, default=BENCHMARK_MEMORY_TOLERANCE,
+                        help='許容するピークメモリの増加率 (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    args.sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    args.stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    unknown = [s for s in args.stages if s not in STAGES]
+    if unknown:
+        parser.error(f"未対応のステージです: {', '.join(unknown)}")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.check or args.update_baseline:
+        return run_check(args)
+    results = run_benchmark(args.sizes, args.stages, args.mode, not args.no_memory, args.seed)
+    write_report(build_report(results, args.mode, args.seed), args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
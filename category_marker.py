@@ -0,0 +1,104 @@
+# category_marker.py
+# 責務: 処理済みカテゴリの書き込み (Categories の更新 + Save) を、取り込みのループから切り離して専用スレッドで行う。
+#       従来はメールごとに取り込みのスレッドで同期的に Save しており、キーワードに該当しないメールの分も含めて
+#       1件あたりの COM 呼び出しが倍になり、取り込みの速さが Outlook の保存待ちに左右されていた。
+#       取り込み側は EntryID をキューに積むだけにし、専用スレッド (独自の COM アパートメント) が
+#       まとめて取り出して GetItemFromID → 更新 → Save を行う。失敗した場合は待ち時間を延ばしながら再試行する。
+#       注意: 書き込みは close() まで遅れるため、取り込みの途中でプロセスが落ちた場合、未反映のメールは次回も未処理として読まれる。
+
+import queue
+import threading
+import time
+from config import CATEGORY_MARK_BATCH_SIZE, CATEGORY_MARK_RETRIES, CATEGORY_MARK_BACKOFF_SEC
+
+# 書き込み用のスレッドで COM を初期化する (pywin32 が無い環境・記録済みのスタンドインでは不要)
+try:
+    import pythoncom
+except ImportError:
+    pythoncom = None
+
+_STOP = object()
+
+
+class CategoryMarker:
+    """
+    処理済みマークの書き込みキュー。mark() で EntryID を積み、close() で残りをすべて書き込んでスレッドを終える。
+    connect_namespace: 書き込み用のスレッドで呼ぶ、MAPI 名前空間を返す関数 (COM オブジェクトはスレッドをまたげないため)
+    apply: メールアイテムにマークを付けて保存する関数 (失敗した場合は例外を送出すること)
+    stats に、積んだ件数 (queued)・書き込んだ件数 (marked)・再試行の回数 (retries)・失敗した件数 (failed) を数える。
+    """
+
+    def __init__(self, connect_namespace, apply, batch_size: int = CATEGORY_MARK_BATCH_SIZE,
+                 retries: int = CATEGORY_MARK_RETRIES, backoff: float = CATEGORY_MARK_BACKOFF_SEC):
+        self.connect_namespace = connect_namespace
+        self.apply = apply
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.stats = {'queued': 0, 'marked': 0, 'retries': 0, 'failed': 0}
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="category-marker", daemon=True)
+        self._thread.start()
+
+    def mark(self, entry_id: str):
+        self.stats['queued'] += 1
+        self._queue.put(entry_id)
+
+    def close(self):
+        """キューに残ったマークをすべて書き込み、書き込み用のスレッドを終える。"""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def summary(self) -> str:
+        summary = f"処理済みマーク: 書き込み {self.stats['marked']} / {self.stats['queued']} 件 (再試行 {self.stats['retries']} 回)"
+        if self.stats['failed']:
+            summary += f" ⚠️ 失敗 {self.stats['failed']} 件 (処理済みカテゴリは付いていません)"
+        return summary
+
+    def _next_batch(self) -> list:
+        """キューから最大 batch_size 件を取り出す (1件目は届くまで待つ)。"""
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _mark_one(self, namespace, entry_id: str):
+        for attempt in range(self.retries + 1):
+            try:
+                self.apply(namespace.GetItemFromID(entry_id))
+                self.stats['marked'] += 1
+                return
+            except Exception as mark_ex:
+                if attempt == self.retries:
+                    self.stats['failed'] += 1
+                    print(f"警告: 処理済みマークの書き込みに失敗しました (EntryID: {entry_id}). エラー: {mark_ex}")
+                    return
+                self.stats['retries'] += 1
+                time.sleep(self.backoff * (2 ** attempt))
+
+    def _run(self):
+        if pythoncom is not None:
+            pythoncom.CoInitialize()
+        try:
+            namespace = None
+            try:
+                namespace = self.connect_namespace()
+            except Exception as connect_ex:
+                print(f"警告: 処理済みマークの書き込み用に Outlook へ接続できませんでした: {connect_ex}")
+            while True:
+                batch = self._next_batch()
+                stop = batch[-1] is _STOP
+                entry_ids = [entry_id for entry_id in batch if entry_id is not _STOP]
+                if namespace is None:
+                    self.stats['failed'] += len(entry_ids)
+                else:
+                    for entry_id in entry_ids:
+                        self._mark_one(namespace, entry_id)
+                if stop:
+                    break
+        finally:
+            if pythoncom is not None:
+                pythoncom.CoUninitialize()
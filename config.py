@@ -3,6 +3,7 @@
 #変数の宣言
 import os
 import sys 
+import tempfile
 
 def get_script_dir():
     """実行中のスクリプト（またはexe）のディレクトリパスを確実に取得する。"""
@@ -21,6 +22,16 @@ CONFIG_FILE_PATH = os.path.join(SCRIPT_DIR, 'name.csv') # Outlookアカウント
 MUST_INCLUDE_KEYWORDS = [r'スキルシート', r'業務経歴書', r'人材のご紹介', r'リソース'] # 必須キーワード
 EXCLUDE_KEYWORDS = [r'請求書', r'セミナー', r'お問い合わせ', r'休暇申請'] # 除外キーワード
 
+# 開発工程の判定キーワード: 本文にどれかを含む工程を '開発工程_<工程名>' 列で「あり」にする (空リストの工程は常に「あり」)
+PROCESS_KEYWORDS = {
+    '要件定義': [r'要件定義', r'要求分析'],
+    '基本設計': [r'基本設計', r'外部設計'],
+    '詳細設計': [r'詳細設計', r'内部設計'],
+    '製造': [r'製造', r'実装', r'コーディング'],
+    'テスト': [r'テスト', r'試験'],
+    '運用保守': [r'運用', r'保守'],
+}
+
 # 抽出パターンの定義: 正規表現と信頼度スコア
 ITEM_PATTERNS = {
     '氏名': [
@@ -49,9 +60,132 @@ ITEM_PATTERNS = {
     ],
 }
 
+# 抽出結果の列 (extraction_core.extract_skills_data の出力列)。項目名は ITEM_PATTERNS のキーの '_' より前
+MASTER_COLUMNS = (
+    ['EntryID', '件名', '宛先メール', '氏名', '年齢', '単金', '業務', 'スキル']
+    + [f'開発工程_{proc_name}' for proc_name in PROCESS_KEYWORDS]
+    + ['信頼度スコア', '本文(テキスト形式)']
+)
+
 OUTPUT_CSV_FILE = OUTPUT_EVAL_PATH.replace('.xlsx', '_final.csv') # 最終出力CSVファイル名
 INTERMEDIATE_CSV_FILE = 'intermediate_mail_data.csv' # 一時的な中間ファイル名
 
+# 抽出の並列実行設定 (extraction_core.extract_skills_data)
+EXTRACTION_WORKERS = 1 # 抽出プロセス数 (1: 直列, None: CPUコア数)
+PARALLEL_MIN_RECORDS = 2000 # この件数未満はプール起動コストの方が大きいため直列で処理する
+EXTRACTION_CHUNK_SIZE = 5000 # ストリーミング抽出 (collect_extracted) で1つの DataFrame にまとめる件数
+
+# 抽出結果キャッシュ (extraction_cache.py): 本文ハッシュ → 項目ごとの抽出結果
+EXTRACTION_CACHE_PATH = os.path.join(SCRIPT_DIR, 'extraction_cache.sqlite3')
+USE_EXTRACTION_CACHE = True # GUIの抽出実行時にキャッシュを使う
+EXTRACTION_CACHE_MAX_ENTRIES = 200000 # 保持する本文数の上限 (超えた分は最終利用が古い順に削除)
+
+# パターン計測 (pattern_profiler.py): 有効時は直列の row エンジンで抽出し、実行ごとにレポートを書き出す
+PATTERN_PROFILE_ENABLED = False
+PATTERN_PROFILE_REPORT_PATH = os.path.join(SCRIPT_DIR, 'pattern_profile_report.json')
+
+# ガード付き検索 (search_guard.py): 添付内容を結合した巨大な本文で検索が止まらないようにする
+GUARDED_SEARCH_ENABLED = False
+GUARDED_MIN_BODY_LENGTH = 20000 # これ未満の本文は従来どおり全文を検索する (結果は通常モードと同一)
+GUARDED_WINDOW_BEFORE = 50 # アンカーの前に含める文字数 (パターン先頭からアンカーまでの長さ以上にする)
+GUARDED_WINDOW_AFTER = 2000 # アンカーの後に含める文字数 (抽出値はこの範囲で打ち切られる)
+GUARDED_TIME_BUDGET_SEC = 2.0 # メール1件あたりの検索時間の上限 (超えた項目は N/A とし、レポートに記録)
+GUARDED_SEARCH_REPORT_PATH = os.path.join(SCRIPT_DIR, 'guarded_search_report.json')
+# 項目ごとのアンカー: その項目のどのパターンにも必ず含まれる文字列 (大文字小文字無視)
+PATTERN_ANCHORS = {
+    '氏名': ['名', '殿'],
+    '年齢': ['齢', '歳'],
+    '単金': ['金', '月額', '報酬', 'MP', '単価', '万円'],
+    '業務': ['務', '種'],
+    'スキル': ['：', ':'],
+}
+
+# Outlook の一括取得 (outlook_table.py): Folder.GetTable で EntryID・件名などを列単位でまとめて取得する
+OUTLOOK_USE_TABLE = True # False: 従来どおりアイテムごとに getattr で取得する
+OUTLOOK_TABLE_BATCH_SIZE = 500 # Table.GetArray で1回に取得する行数
+
+# 添付ファイルのテキスト化 (attachment_pool.py): メールの列挙と並行してワーカーで解析する
+ATTACHMENT_WORKERS = 4 # ワーカー数 (0: 列挙と同じスレッドで直列に処理)
+ATTACHMENT_POOL_MODE = "thread" # "thread" または "process"
+ATTACHMENT_TIMEOUT_SEC = 60 # ファイル1件の解析が始まってから結果を待つ上限 (秒)
+ATTACHMENT_MAX_ABANDONED_JOBS = 8 # タイムアウト後も終わらない解析 (止められずにワーカーを占有したままのもの) の上限
+ATTACHMENT_PIPELINE_DEPTH = 32 # 添付ファイルの解析待ちで保持するメール数の上限
+
+# 添付ファイルのスプール (attachment_spool.py): 閾値以下の添付ファイルはメモリ上に保持し (キャッシュの参照は書き出さずに行う)、
+# 大きなファイルと、解析するファイル (解析関数はパスしか受け付けないため大きさによらない) はローカルの一時ディレクトリに書き出す
+ATTACHMENT_SPOOL_DIR = os.path.join(tempfile.gettempdir(), 'skillsheet_attachments') # 書き出し先 (ネットワーク上のプロファイルを避けてローカルに置く)
+ATTACHMENT_SPOOL_MAX_MEMORY_BYTES = 8 * 1024 * 1024 # これを超える添付ファイルはディスクに書き出す
+
+# 添付ファイルキャッシュ (attachment_cache.py): 添付ファイルの内容ハッシュ → 抽出テキスト
+USE_ATTACHMENT_CACHE = True # 内容が同じ添付ファイルは、メール・実行をまたいで1回だけ解析する
+ATTACHMENT_CACHE_PATH = os.path.join(SCRIPT_DIR, 'attachment_cache.sqlite3')
+ATTACHMENT_CACHE_MAX_ENTRIES = 50000 # 保持するファイル数の上限 (超えた分は最終利用が古い順に削除)
+
+# メールストア (mail_store.py): EntryID → 添付ファイルのテキスト (処理済みメールの再読込で解析を省く)
+USE_MAIL_STORE = True
+MAIL_STORE_PATH = os.path.join(SCRIPT_DIR, 'mail_store.sqlite3')
+
+# 差分同期 (sync_state.py): 「未処理のみ」で、前回の最高水位 (最新の受信日時) 以降のメールだけを取得する
+USE_SYNC_STATE = True
+SYNC_STATE_PATH = os.path.join(SCRIPT_DIR, 'sync_state.sqlite3')
+SYNC_OVERLAP_MINUTES = 60 # 最高水位より少し前から取得し直す幅 (分)。受信日時が前後して届くメールの取りこぼしを防ぐ
+
+# 起動時の未処理メール件数 (email_processor.count_unprocessed_mail): 件名 (と本文の先頭) だけで軽く数える
+UNPROCESSED_COUNT_BODY_CHARS = 0 # 件名に必須キーワードが無いメールで、本文の先頭から見る文字数 (0 は件名のみ。Outlook 側の絞り込みと GetRowCount で数える。1以上は1件ずつ判定し、本文の取得も1件ずつになる)
+USE_UNPROCESSED_COUNT_CACHE = True # 1件ずつ判定する場合に前回の件数を保存し、次回はそれ以降に受信したメールだけを判定する
+
+# 期間の分割取得 (email_processor._iter_items_windowed): 取得期間 (過去N日・差分同期) を一定の日数ごとに分け、
+# 期間ごとに [ReceivedTime] で絞り込んだ Table を別スレッド (それぞれ独自の COM アパートメント) で取得する
+INGEST_WINDOW_DAYS = 7 # 1期間の日数 (0 で分割しない)。Table 経路 (OUTLOOK_USE_TABLE = True) のみ
+INGEST_WINDOW_WORKERS = 2 # 同時に取得する期間の数
+INGEST_WINDOW_QUEUE_SIZE = 64 # 期間ごとに、取り込み側が受け取る前に先読みしておくメールの件数
+
+# 複数のアカウント・フォルダの同時取り込み (ingest_jobs.py。MAIL_SOURCE_BACKEND = "outlook_multi" で使う)
+# 対象は {"account": アカウント, "folder": フォルダ, "read_mode": 読み込みモード (省略可), "days_ago": 日数 (省略可)} のリスト。
+# INGEST_JOB_SPEC_PATH に同じ形の JSON ファイルがあればそちらを優先する。どちらも無い場合は GUI で入力したアカウント・フォルダだけを取り込む
+INGEST_TARGETS = []
+INGEST_JOB_SPEC_PATH = os.path.join(SCRIPT_DIR, 'ingest_targets.json')
+INGEST_TARGET_WORKERS = 3 # 同時に取り込む対象の数 (対象ごとに1スレッド・1つの COM アパートメント)
+INGEST_TARGET_QUEUE_SIZE = 64 # 取り込み側が受け取る前に、全対象で先読みしておくメールの件数
+
+# キーワードの絞り込みを Outlook 側で行う (dasl_query.py): 必須/除外キーワードを件名・本文の DASL 条件に変換し、
+# 候補のメールだけを取得する (正確な判定は従来どおり取得後に行う)
+USE_DASL_KEYWORD_PUSHDOWN = False
+DASL_KEYWORD_OPERATOR = "like" # "like" (部分一致。候補の漏れなし) または "ci_phrasematch" (インデックス検索。語単位のため漏れる場合がある)
+
+# 処理済みマークの書き込み (category_marker.py): 取り込みのループでは保存せず、専用スレッドでまとめて書き込む
+USE_CATEGORY_WRITE_BEHIND = True
+CATEGORY_MARK_BATCH_SIZE = 50 # 1回に取り出して書き込む件数
+CATEGORY_MARK_RETRIES = 3 # 書き込みに失敗した場合の再試行回数
+CATEGORY_MARK_BACKOFF_SEC = 0.5 # 再試行までの待ち時間 (秒)。再試行のたびに倍にする
+
+# メール取得元 (mail_source.py): "outlook"、"outlook_multi" (INGEST_TARGETS の複数のアカウント・フォルダ)
+# または "local" (.eml ファイルのディレクトリ / mbox ファイル)
+MAIL_SOURCE_BACKEND = "outlook"
+LOCAL_MAIL_SOURCE_PATH = os.path.join(SCRIPT_DIR, 'local_mail')
+
+# 試験モード (main.py の [1] ダミーデータ生成 / data_generation.py) と評価 (evaluator_core.py)
+NUM_RECORDS = 100 # 生成する試験用メールの件数
+NAMES = [('山田', '太郎', 0), ('佐藤', '花子', 0), ('鈴木', '一郎', 0), ('高橋', '美咲', 0), ('John', 'Smith', 1), ('Emily', 'Brown', 1)] # (姓, 名, 0: 日本語 / 1: 英語)
+LANGUAGES = ['Java', 'Python', 'C#', 'Go', 'Ruby', 'PHP', 'JavaScript', 'TypeScript', 'COBOL', 'SQL'] # スキル (1〜5個を選ぶ)
+INDUSTRIES = ['金融', '製造', '流通', '通信', '公共', '医療']
+SALARY_UNITS = ['万円', '万', '円', '万円/月'] # '円' を含む単位は円単位の金額で書く
+NOISE = ['要件定義から担当', '詳細設計・製造・テスト', '（詳細は添付）', 'OS: Linux', '基本設計経験あり', '即日稼働可'] # 項目の間に混ぜる文
+INPUT_QUESTION_CSV = os.path.join(SCRIPT_DIR, 'question_mail_data.tsv') # 試験用メール (抽出の入力)
+MASTER_ANSWERS_PATH = os.path.join(SCRIPT_DIR, 'master_answers.tsv') # 試験用メールの正解
+EVALUATION_TARGETS = ['名前', '年齢', '単金', 'スキルor言語', '業種'] # 正解と比較する項目 (正解マスターの列名)
+
+# ベンチマーク (benchmark.py)
+BENCHMARK_SIZES = [1000, 10000, 100000, 1000000] # 計測する件数
+BENCHMARK_SEED = 20240401 # 試験用データの乱数シード (コミット間で同じデータを使う)
+BENCHMARK_OUTPUT_PATH = os.path.join(SCRIPT_DIR, 'benchmark_results.json')
+# 性能回帰チェック (python benchmark.py --check): 抽出と検索を固定データで計測し、ベースラインと比較する
+BENCHMARK_BASELINE_PATH = os.path.join(SCRIPT_DIR, 'benchmark_baseline.json')
+BENCHMARK_CHECK_SIZE = 5000 # チェックに使う件数
+BENCHMARK_CHECK_REPEAT = 3 # 処理時間は複数回の最短値を使う (他プロセスによる揺れを抑える)
+BENCHMARK_THROUGHPUT_TOLERANCE = 0.20 # 件/秒がベースラインよりこの割合を超えて下がったら失敗
+BENCHMARK_MEMORY_TOLERANCE = 0.20 # ピークメモリがベースラインよりこの割合を超えて増えたら失敗
+
 # =========================================================
 # 💡 ユーティリティ/ファイル処理関数
 # =========================================================
@@ -0,0 +1,290 @@
+# dasl_query.py
+# 責務: Outlook の Restrict / GetTable に渡す DASL 条件 ("@SQL=...") を組み立て、同じ条件をローカルで評価する。
+#       必須/除外キーワードを件名・本文の LIKE (または ci_phrasematch) 条件に変換すると、
+#       キーワードに該当しないメールを Outlook 側で除外でき、本文を COM で取得するメールが候補だけになる。
+#       変換結果は候補の絞り込みであり、正確な判定は従来どおり Python 側 (_keyword_filter_action) で行う。
+#       evaluate() は生成した条件を記録済みのスタンドイン (outlook_recording.py) で評価し、変換を検証するためのもの。
+
+import re
+
+PROP_SUBJECT = "urn:schemas:httpmail:subject"
+PROP_BODY = "urn:schemas:httpmail:textdescription"
+PROP_HAS_ATTACHMENT = "urn:schemas:httpmail:hasattachment"
+PROP_CATEGORIES = "urn:schemas-microsoft-com:office:office#Keywords"
+PROP_MESSAGE_CLASS = "http://schemas.microsoft.com/mapi/proptag/0x001A001E"
+
+DASL_PREFIX = "@SQL="
+
+# 'like': 部分一致 (大文字小文字無視)。Python 側の判定の候補を漏れなく含む
+# 'ci_phrasematch': インデックス検索 (Instant Search が有効なストアのみ)。速いが語単位の一致のため、候補から漏れる場合がある
+KEYWORD_OPERATORS = ('like', 'ci_phrasematch')
+
+
+def _quote(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def keyword_condition(prop: str, keyword: str, operator: str = 'like') -> str:
+    """プロパティ prop がキーワード (リテラル) を含む、という DASL 条件 ("@SQL=" なし)。"""
+    if operator == 'ci_phrasematch':
+        return f'"{prop}" ci_phrasematch {_quote(keyword)}'
+    escaped = re.sub(r'([%_\[])', r'[\1]', keyword)
+    return f'"{prop}" LIKE {_quote("%" + escaped + "%")}'
+
+
+def category_not_like(category: str) -> str:
+    """カテゴリ category が付いていない、という DASL 条件 ("@SQL=" なし。SQL の IS NULL OR NOT LIKE と同等)。"""
+    return f'("{PROP_CATEGORIES}" IS NULL OR NOT ({keyword_condition(PROP_CATEGORIES, category)}))'
+
+
+def mail_message_class_condition() -> str:
+    """メール (MessageClass が IPM.Note で始まる。olMailItem に当たる) に限る DASL 条件 ("@SQL=" なし)。"""
+    return f'"{PROP_MESSAGE_CLASS}" LIKE {_quote("IPM.Note%")}'
+
+
+def to_dasl_query(conditions) -> str:
+    """DASL 条件 ("@SQL=" なし) を AND で結合し、Restrict / GetTable に渡せる形にする。条件が無ければ空文字。"""
+    conditions = [condition for condition in conditions if condition]
+    if not conditions:
+        return ""
+    return DASL_PREFIX + " AND ".join(f"({condition})" for condition in conditions)
+
+
+def keyword_literals(keyword: str):
+    """
+    キーワード (KeywordMatcher と同じ正規表現文字列) を、同じ文字列に一致するリテラルのリストに変換する。
+    リテラル、またはリテラルを | で並べただけの正規表現に限る。それ以外は None (DASL に変換できない)。
+    """
+    if not keyword:
+        return None
+    literals = []
+    for alternative in re.split(r'(?<!\\)\|', keyword):
+        # エスケープした記号 (\. など) 以外の特殊文字を含む場合は、リテラルとして扱えない
+        if not re.fullmatch(r'(?:\\[^A-Za-z0-9]|[^\\.^$*+?{}\[\]()|])+', alternative):
+            return None
+        literals.append(re.sub(r'\\(.)', r'\1', alternative))
+    return literals
+
+
+def _contains_any(literals, operator: str) -> str:
+    return " OR ".join(
+        keyword_condition(prop, literal, operator) for literal in literals for prop in (PROP_SUBJECT, PROP_BODY)
+    )
+
+
+def subject_keywords_condition(keywords, operator: str = 'like'):
+    """
+    件名にキーワードのどれかを含む、という DASL 条件 ("@SQL=" なし)。
+    キーワードが無い・空文字を含む・変換できないキーワードがある場合は None (Python 側で判定すること)。
+    """
+    if not keywords or '' in keywords:
+        return None
+    literals = []
+    for keyword in keywords:
+        keyword_literal_list = keyword_literals(keyword)
+        if keyword_literal_list is None:
+            return None
+        literals.extend(keyword_literal_list)
+    return " OR ".join(keyword_condition(PROP_SUBJECT, literal, operator) for literal in literals)
+
+
+def keyword_pushdown_conditions(must_include_keywords, exclude_keywords, operator: str = 'like') -> list:
+    """
+    必須/除外キーワードから、Outlook 側で候補を絞り込む DASL 条件のリスト ("@SQL=" なし) を作る。
+    - 必須: 件名・本文のどれかにキーワードを含む、または添付ファイルがある (添付ファイルの内容は Outlook 側で判定できないため)。
+      変換できないキーワードが1つでもあれば、必須の条件は付けない
+    - 除外: 件名・本文に除外キーワードを含まない。変換できるキーワードだけを使う
+    キーワードのリストが空の場合は、そのグループの条件を付けない
+    (KeywordMatcher では空の必須はどのメールもヒットせず、空の除外はどのメールも除外しない。どちらも絞り込み不要)。
+    """
+    if operator not in KEYWORD_OPERATORS:
+        raise ValueError(f"未対応の演算子です: {operator}")
+    conditions = []
+
+    if must_include_keywords and '' not in must_include_keywords:
+        must_literals = []
+        for keyword in must_include_keywords:
+            literals = keyword_literals(keyword)
+            if literals is None:
+                must_literals = None
+                break
+            must_literals.extend(literals)
+        if must_literals:
+            conditions.append(f'{_contains_any(must_literals, operator)} OR "{PROP_HAS_ATTACHMENT}" = 1')
+
+    if exclude_keywords and '' not in exclude_keywords:
+        exclude_literals = [literal for keyword in exclude_keywords for literal in (keyword_literals(keyword) or [])]
+        if exclude_literals:
+            conditions.append(f"NOT ({_contains_any(exclude_literals, operator)})")
+
+    return conditions
+
+
+# ----------------------------------------------------------------------
+# ローカルでの評価 (記録済みのスタンドイン用)
+# ----------------------------------------------------------------------
+_TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<ident>"[^"]*")
+      | (?P<string>'(?:[^']|'')*')
+      | (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<op><>|>=|<=|=|<|>)
+      | (?P<paren>[()])
+      | (?P<word>[A-Za-z_]+)
+    )""", re.VERBOSE)
+
+
+def _tokenize(query: str) -> list:
+    tokens = []
+    position = 0
+    query = query.rstrip()
+    while position < len(query):
+        match = _TOKEN_PATTERN.match(query, position)
+        if match is None:
+            raise ValueError(f"DASL 条件を解釈できません: {query[position:]!r}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'ident':
+            tokens.append(('ident', text[1:-1]))
+        elif kind == 'string':
+            tokens.append(('value', text[1:-1].replace("''", "'")))
+        elif kind == 'number':
+            tokens.append(('value', float(text) if '.' in text else int(text)))
+        elif kind == 'word':
+            tokens.append(('word', text.upper()))
+        else:
+            tokens.append((kind, text))
+        position = match.end()
+    return tokens
+
+
+def _like_to_regex(pattern: str):
+    regex = ""
+    for part in re.findall(r"\[[^\]]\]|%|_|[^%_\[]+|\[", pattern):
+        if part == '%':
+            regex += ".*"
+        elif part == '_':
+            regex += "."
+        elif part.startswith('[') and len(part) == 3:
+            regex += re.escape(part[1])
+        else:
+            regex += re.escape(part)
+    return re.compile(regex, re.IGNORECASE | re.DOTALL)
+
+
+def _compare(value, operator: str, operand) -> bool:
+    if value is None:
+        return False
+    if isinstance(operand, str):
+        value = str(value).lower()
+        operand = operand.lower()
+    elif isinstance(value, bool):
+        value = int(value)
+    if operator == '=': return value == operand
+    if operator == '<>': return value != operand
+    if operator == '>=': return value >= operand
+    if operator == '<=': return value <= operand
+    if operator == '>': return value > operand
+    return value < operand
+
+
+class _Parser:
+    def __init__(self, tokens: list, get_property):
+        self.tokens = tokens
+        self.position = 0
+        self.get_property = get_property
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def _take(self, kind=None, text=None):
+        token = self._peek()
+        if (kind is not None and token[0] != kind) or (text is not None and token[1] != text):
+            raise ValueError(f"DASL 条件を解釈できません: {token[1]!r} の位置")
+        self.position += 1
+        return token
+
+    def parse(self):
+        condition = self._or()
+        if self.position != len(self.tokens):
+            raise ValueError(f"DASL 条件を解釈できません: {self._peek()[1]!r} 以降")
+        return condition
+
+    def _or(self):
+        conditions = [self._and()]
+        while self._peek() == ('word', 'OR'):
+            self._take()
+            conditions.append(self._and())
+        return lambda item: any(condition(item) for condition in conditions)
+
+    def _and(self):
+        conditions = [self._not()]
+        while self._peek() == ('word', 'AND'):
+            self._take()
+            conditions.append(self._not())
+        return lambda item: all(condition(item) for condition in conditions)
+
+    def _not(self):
+        if self._peek() == ('word', 'NOT'):
+            self._take()
+            condition = self._not()
+            return lambda item: not condition(item)
+        if self._peek()[0] == 'paren':
+            self._take('paren', '(')
+            condition = self._or()
+            self._take('paren', ')')
+            return condition
+        return self._predicate()
+
+    def _predicate(self):
+        _, prop = self._take('ident')
+        get_property = self.get_property
+        kind, text = self._peek()
+        if (kind, text) == ('word', 'IS'):
+            self._take()
+            negate = self._peek() == ('word', 'NOT')
+            if negate:
+                self._take()
+            self._take('word', 'NULL')
+            return lambda item: _values(get_property(item, prop)) == [] if not negate else _values(get_property(item, prop)) != []
+        if (kind, text) == ('word', 'LIKE'):
+            self._take()
+            regex = _like_to_regex(self._take('value')[1])
+            return lambda item: any(regex.fullmatch(str(value)) for value in _values(get_property(item, prop)))
+        if kind == 'word' and text in ('CI_PHRASEMATCH', 'CI_STARTSWITH'):
+            # インデックス検索の近似: 大文字小文字無視の部分一致 / 前方一致
+            self._take()
+            phrase = str(self._take('value')[1]).lower()
+            if text == 'CI_STARTSWITH':
+                return lambda item: any(str(value).lower().startswith(phrase) for value in _values(get_property(item, prop)))
+            return lambda item: any(phrase in str(value).lower() for value in _values(get_property(item, prop)))
+        if kind == 'op':
+            self._take()
+            operand = self._take('value')[1]
+            return lambda item: any(_compare(value, text, operand) for value in _values(get_property(item, prop)))
+        raise ValueError(f"DASL 条件を解釈できません: {text!r} の位置")
+
+
+def _values(value) -> list:
+    """プロパティの値を、評価用のリストにする (複数値のプロパティはそのまま。None・空文字は値なし)。"""
+    if value is None or value == '':
+        return []
+    if isinstance(value, (list, tuple)):
+        return [v for v in value if v is not None and v != '']
+    return [value]
+
+
+def compile_query(query: str, get_property):
+    """
+    DASL 条件 ("@SQL=...") を、アイテムを受け取って True / False を返す関数に変換する。
+    get_property(item, プロパティ名) はアイテムのプロパティ値 (複数値はリスト) を返す関数。
+    対応する構文: AND / OR / NOT / 括弧、=・<>・比較演算子、LIKE、IS [NOT] NULL、ci_phrasematch・ci_startswith (近似)。
+    """
+    if not query.startswith(DASL_PREFIX):
+        raise ValueError(f"DASL 条件ではありません (先頭に {DASL_PREFIX} が必要です): {query}")
+    return _Parser(_tokenize(query[len(DASL_PREFIX):]), get_property).parse()
+
+
+def evaluate(query: str, item, get_property) -> bool:
+    """DASL 条件をアイテム1件に対して評価する。"""
+    return compile_query(query, get_property)(item)
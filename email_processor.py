@@ -1,20 +1,45 @@
 # email_processor.py (安定版 - 逆順ループを廃止し、RPCエラーを回避)
 
 import pandas as pd
-import win32com.client as win32 # 👈 win32 というエイリアスを使用
-import pythoncom
 import os
 import datetime
 import re
 from datetime import timedelta
 import sys
-import uuid 
+import time
 import traceback
+import threading
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
+from keyword_matcher import KeywordMatcher
+from outlook_table import iter_table_rows, open_table
+from filter_cascade import FilterCascade, STAGE_SUBJECT, STAGE_BODY, STAGE_ATTACHMENT_NAMES, STAGE_ATTACHMENT_CONTENTS
+from attachment_pool import AttachmentPool, is_complete
+from attachment_spool import AttachmentSpool
+from attachment_cache import AttachmentTextCache
+from extraction_cache import hash_body
+from mail_store import MailStore
+from sync_state import SyncState, reset_sync_state, load_unprocessed_count, save_unprocessed_count
+from category_marker import CategoryMarker
+from dasl_query import (category_not_like, keyword_pushdown_conditions, mail_message_class_condition, subject_keywords_condition,
+                        to_dasl_query)
+
+# Outlook 連携 (pywin32) は Windows のみ。無い環境でもローカルのメール取得元 (mail_source.py) は使える
+try:
+    import win32com.client as win32 # 👈 win32 というエイリアスを使用
+    import pythoncom
+except ImportError:
+    win32 = None
+    pythoncom = None
 
 # 外部定数と関数の依存関係を想定 (維持)
 try:
-    from config import MUST_INCLUDE_KEYWORDS, EXCLUDE_KEYWORDS, SCRIPT_DIR
+    from config import (MUST_INCLUDE_KEYWORDS, EXCLUDE_KEYWORDS, SCRIPT_DIR, OUTLOOK_USE_TABLE, ATTACHMENT_PIPELINE_DEPTH,
+                        USE_ATTACHMENT_CACHE, USE_MAIL_STORE, USE_SYNC_STATE, USE_CATEGORY_WRITE_BEHIND,
+                        UNPROCESSED_COUNT_BODY_CHARS, USE_UNPROCESSED_COUNT_CACHE, USE_DASL_KEYWORD_PUSHDOWN,
+                        DASL_KEYWORD_OPERATOR, INGEST_WINDOW_DAYS, INGEST_WINDOW_WORKERS, INGEST_WINDOW_QUEUE_SIZE)
     def get_outlook_folder(outlook_ns, account_name, folder_path):
         """Outlookフォルダオブジェクトを取得する（実装は outlook_api.py にあるものと仮定）"""
         try:
@@ -22,54 +47,78 @@ try:
         except Exception:
             return None
     
-    try:
-        from file_processor import get_attachment_text
-    except ImportError:
-        def get_attachment_text(*args, **kwargs): return "ATTACHMENT_CONTENT_FILE_IO_FAILED" 
-    
 except ImportError:
     MUST_INCLUDE_KEYWORDS = [r'スキルシート']
     EXCLUDE_KEYWORDS = []
     SCRIPT_DIR = os.getcwd() 
+    OUTLOOK_USE_TABLE = False
+    ATTACHMENT_PIPELINE_DEPTH = 32
+    USE_ATTACHMENT_CACHE = False
+    USE_MAIL_STORE = False
+    USE_SYNC_STATE = False
+    USE_CATEGORY_WRITE_BEHIND = False
+    UNPROCESSED_COUNT_BODY_CHARS = 0
+    USE_UNPROCESSED_COUNT_CACHE = False
+    USE_DASL_KEYWORD_PUSHDOWN = False
+    DASL_KEYWORD_OPERATOR = "like"
+    INGEST_WINDOW_DAYS = 0
+    INGEST_WINDOW_WORKERS = 1
+    INGEST_WINDOW_QUEUE_SIZE = 64
     def get_outlook_folder(*args, **kwargs): return None
-    def get_attachment_text(*args, **kwargs): return "ATTACHMENT_CONTENT_FILE_IO_FAILED" 
     
 OUTPUT_FILENAME = 'extracted_skills_result.xlsx' 
 PROCESSED_CATEGORY_NAME = "スキルシート処理済" 
 
+# 必須/除外キーワードを1回の走査で判定するマッチャー (起動時に一度だけ構築)
+MAIL_KEYWORD_MATCHER = KeywordMatcher({'must_include': MUST_INCLUDE_KEYWORDS, 'exclude': EXCLUDE_KEYWORDS})
+
+
+def _require_outlook():
+    """pywin32 が無い環境で Outlook 連携の関数が呼ばれた場合に、原因の分かるエラーにする。"""
+    if win32 is None or pythoncom is None:
+        raise RuntimeError("Outlook 連携には pywin32 (win32com) が必要です。ローカルのメール取得元 (MAIL_SOURCE_BACKEND = 'local') を使用してください。")
+
 # ----------------------------------------------------------------------
-# 💡 ヘルパー関数: 過去の本文データ復元 (維持)
+# 💡 共通機能: キーワード判定 (Outlook / ローカルのメール取得元で共用)
 # ----------------------------------------------------------------------
-def _load_previous_attachment_content() -> Dict[str, str]:
-    # ... (変更なし) ...
-    script_dir_path = SCRIPT_DIR if 'SCRIPT_DIR' in globals() else os.getcwd()
-    output_file_path = os.path.join(os.path.abspath(script_dir_path), OUTPUT_FILENAME)
+def _keyword_filter_action(full_search_text: str, is_processed: bool) -> str:
+    """
+    必須/除外キーワードの判定結果から、メールの扱いを返す。
+    'extract': 抽出対象 / 'skip': 対象外 / 'mark_skip': 未処理だがキーワードに該当しない (マークだけ付ける)
+    """
+    matched_groups = MAIL_KEYWORD_MATCHER.match_groups(full_search_text)
+    must_include = 'must_include' in matched_groups
+    is_excluded = 'exclude' in matched_groups
     
-    if os.path.exists(output_file_path):
-        try:
-            df_prev = pd.read_excel(output_file_path, usecols=['メールURL', '本文(ファイル含む)'], dtype=str)
-            df_prev['EntryID'] = df_prev['メールURL'].str.replace('outlook:', '', regex=False).str.strip()
-            df_prev.set_index('EntryID', inplace=True)
-            return df_prev['本文(ファイル含む)'].dropna().to_dict()
-        except Exception as e:
-            print(f"警告: 過去ファイルからの本文復元に失敗しました。エラー: {e}")
-            return {}
-    return {}
+    if is_processed and not must_include:
+        return 'skip'
+    if is_excluded:
+        return 'skip'
+    if not must_include and not is_processed:
+        return 'mark_skip'
+    return 'extract'
 
 # ----------------------------------------------------------------------
 # 💡 共通機能: メールアイテムの処理済みマーク (維持)
 # ----------------------------------------------------------------------
+def _apply_processed_category(mail_item):
+    """処理済みカテゴリを追加して保存する (既に付いている場合は保存しない)。失敗した場合は例外を送出する。"""
+    if mail_item.Class != 43: # olMailItem
+        return
+    current_categories = getattr(mail_item, 'Categories', '')
+    if PROCESSED_CATEGORY_NAME not in current_categories:
+        if current_categories:
+            mail_item.Categories = f"{current_categories},{PROCESSED_CATEGORY_NAME}"
+        else:
+            mail_item.Categories = PROCESSED_CATEGORY_NAME
+        mail_item.Save()
+
+
 def mark_email_as_processed(mail_item):
     # ... (変更なし) ...
     if mail_item.Class == 43: # olMailItem
         try:
-            current_categories = getattr(mail_item, 'Categories', '')
-            if PROCESSED_CATEGORY_NAME not in current_categories:
-                if current_categories:
-                    mail_item.Categories = f"{current_categories},{PROCESSED_CATEGORY_NAME}"
-                else:
-                    mail_item.Categories = PROCESSED_CATEGORY_NAME
-                mail_item.Save()
+            _apply_processed_category(mail_item)
         except Exception as e:
             pass 
         return True
@@ -81,6 +130,7 @@ def mark_email_as_processed(mail_item):
 def remove_processed_category(target_email: str, folder_path: str, days_ago: int = None) -> int:
     # ... (変更なし) ...
     reset_count = 0
+    _require_outlook()
     try:
         pythoncom.CoInitialize()
         
@@ -102,8 +152,8 @@ def remove_processed_category(target_email: str, folder_path: str, days_ago: int
         filter_query_list.append(category_filter_query)
         
         if days_ago is not None:
-            start_date = (datetime.datetime.now() - timedelta(days=days_ago)).strftime('%m/%d/%Y %H:%M %p')
-            filter_query_list.append(f"[ReceivedTime] < '{start_date}'") 
+            start_date = datetime.datetime.now() - timedelta(days=days_ago)
+            filter_query_list.append(f"[ReceivedTime] < '{_format_restrict_datetime(start_date)}'") 
 
         query_string = " AND ".join(filter_query_list)
         items_to_reset = items.Restrict(query_string)
@@ -117,6 +167,9 @@ def remove_processed_category(target_email: str, folder_path: str, days_ago: int
                     item.Save()
                     reset_count += 1
         
+        # マークを外したメールは差分同期の最高水位より古いため、次回の「未処理のみ」は全件を走査し直す
+        if reset_count:
+            reset_sync_state(target_email, folder_path)
         return reset_count
 
     except Exception as e:
@@ -125,25 +178,74 @@ def remove_processed_category(target_email: str, folder_path: str, days_ago: int
         pythoncom.CoUninitialize()
 
 # ----------------------------------------------------------------------
-# 💡 未処理メールの件数をカウント (維持)
+# 💡 共通機能: Outlook への接続とメール種別の判定
 # ----------------------------------------------------------------------
-def has_unprocessed_mail(folder_path: str, target_email: str) -> int:
-    # ... (変更なし) ...
+def _connect_outlook_namespace(outlook_app=None):
+    """Outlook の MAPI 名前空間を返す。outlook_app (記録済みのスタンドイン等) が渡された場合はそれを使う。"""
+    if outlook_app is None:
+        # 📌 修正1: win32.client.Dispatch の誤りを win32.Dispatch に修正
+        try:
+            outlook_app = win32.GetActiveObject("Outlook.Application")
+        except:
+            outlook_app = win32.Dispatch("Outlook.Application")
+    return outlook_app.GetNamespace("MAPI")
+
+
+def _format_restrict_datetime(value: datetime.datetime) -> str:
+    """Items.Restrict / GetTable の Jet 形式の条件に書く日時 (分単位)。"""
+    return value.strftime('%m/%d/%Y %I:%M %p')
+
+
+def _unprocessed_category_filter() -> str:
+    """
+    処理済みカテゴリが付いていないメールに絞り込む DASL 条件 (SQL の IS NULL OR NOT LIKE と同等)。
+    Restrict / GetTable には単独で渡すこと (DASL は先頭の "@SQL=" が必要で、Jet 形式の条件と AND で混ぜられない)。
+    """
+    return to_dasl_query([category_not_like(PROCESSED_CATEGORY_NAME)])
+
+
+def _is_mail_message_class(message_class) -> bool:
+    """Table の MessageClass 列から olMailItem (Class == 43) に当たるかを判定する。"""
+    return str(message_class or '').upper().startswith('IPM.NOTE')
+
+# ----------------------------------------------------------------------
+# 💡 未処理メールの件数をカウント
+# ----------------------------------------------------------------------
+def has_unprocessed_mail(folder_path: str, target_email: str, outlook_app=None, use_table: bool = OUTLOOK_USE_TABLE) -> int:
+    """
+    未処理（処理済みカテゴリなし）で必須キーワードを含むメールの件数を返す。
+    use_table=True の場合は Folder.GetTable で件名・カテゴリをまとめて取得し、
+    件名だけで判定できないメールに限って本文を取得する。
+    """
     unprocessed_count = 0
     if not folder_path or not target_email: return 0
+    if win32 is None and outlook_app is None: return 0
+    com_initialized = False
         
     try:
-        pythoncom.CoInitialize() 
-        
-        try:
-            outlook = win32.GetActiveObject("Outlook.Application")
-        except:
-            outlook = win32.Dispatch("Outlook.Application")
+        if outlook_app is None:
+            pythoncom.CoInitialize() 
+            com_initialized = True
 
-        namespace = outlook.GetNamespace("MAPI")
+        namespace = _connect_outlook_namespace(outlook_app)
         folder = get_outlook_folder(namespace, target_email, folder_path)
         
-        if folder:
+        if folder and use_table:
+            for row in iter_table_rows(folder, columns=['EntryID', 'Subject', 'Categories', 'MessageClass']):
+                if not _is_mail_message_class(row['MessageClass']):
+                    continue
+                if PROCESSED_CATEGORY_NAME in str(row['Categories'] or ''):
+                    continue
+                subject = str(row['Subject'] or '')
+                if MAIL_KEYWORD_MATCHER.match_groups(subject, groups=['must_include']):
+                    unprocessed_count += 1
+                    continue
+                item = namespace.GetItemFromID(str(row['EntryID']))
+                full_search_text = subject + " " + str(getattr(item, 'Body', ''))
+                if MAIL_KEYWORD_MATCHER.match_groups(full_search_text, groups=['must_include']):
+                    unprocessed_count += 1
+
+        elif folder:
             items = folder.Items
             try:
                 items.Sort("[ReceivedTime]", False) 
@@ -158,7 +260,7 @@ def has_unprocessed_mail(folder_path: str, target_email: str) -> int:
                     full_search_text = subject + " " + body 
 
                     if PROCESSED_CATEGORY_NAME not in categories:
-                        must_include = any(re.search(kw, full_search_text, re.IGNORECASE) for kw in MUST_INCLUDE_KEYWORDS)
+                        must_include = 'must_include' in MAIL_KEYWORD_MATCHER.match_groups(full_search_text, groups=['must_include'])
                         if must_include:
                             unprocessed_count += 1
                         
@@ -167,34 +269,644 @@ def has_unprocessed_mail(folder_path: str, target_email: str) -> int:
         unprocessed_count = 0
         
     finally:
-        pythoncom.CoUninitialize()
+        if com_initialized:
+            pythoncom.CoUninitialize()
         
     return unprocessed_count
 
 
+def count_unprocessed_mail(folder_path: str, target_email: str, outlook_app=None,
+                           body_chars: int = UNPROCESSED_COUNT_BODY_CHARS, use_cache: bool = USE_UNPROCESSED_COUNT_CACHE) -> int:
+    """
+    起動時の表示用に、未処理で必須キーワードを含むメールの件数を軽く数える (has_unprocessed_mail の簡易版)。
+    - 必須キーワードは件名だけで判定する。body_chars > 0 の場合は、件名に無いメールに限って本文の先頭 body_chars 文字も見る
+    - 件名だけで判定する場合 (body_chars = 0) は、処理済みカテゴリ・メール種別・件名のキーワードをすべて
+      GetTable の DASL 条件にし、行を取得せずに Table.GetRowCount で数える
+    - それ以外 (本文の先頭も見る・DASL に変換できないキーワードがある・絞り込みに失敗した) 場合は、
+      処理済みカテゴリだけを Outlook 側で絞り込んだ Table の行を1行ずつ判定する。
+      use_cache=True の場合は、数えた時刻と該当した EntryID を保存し (sync_state.py)、次回はそれ以降に受信したメールだけを判定する
+      (それより前のメールは前回の判定結果を使う。処理済み・削除済みになったメールは Table に現れないため数えない)
+    本文の途中にだけキーワードがあるメールは数えないため、正確な件数が必要な場合は has_unprocessed_mail を使う。
+    """
+    if not folder_path or not target_email: return 0
+    if win32 is None and outlook_app is None: return 0
+    com_initialized = False
+    cache_keywords = [MUST_INCLUDE_KEYWORDS, body_chars]
+    
+    try:
+        if outlook_app is None:
+            pythoncom.CoInitialize() 
+            com_initialized = True
+
+        namespace = _connect_outlook_namespace(outlook_app)
+        folder = get_outlook_folder(namespace, target_email, folder_path)
+        if folder is None:
+            return 0
+        
+        subject_condition = subject_keywords_condition(MUST_INCLUDE_KEYWORDS) if body_chars <= 0 else None
+        if subject_condition is not None:
+            query = to_dasl_query([category_not_like(PROCESSED_CATEGORY_NAME), mail_message_class_condition(), subject_condition])
+            try:
+                return open_table(folder, query, columns=['EntryID'], fallback=False).GetRowCount()
+            except Exception as count_error:
+                print(f"警告: 未処理メールの件数を Outlook 側で数えられないため、1件ずつ判定します: {count_error}")
+        
+        checked_at = datetime.datetime.now()
+        matched_ids = set()
+        since, cached_ids = None, set()
+        cached = load_unprocessed_count(target_email, folder_path, keywords=cache_keywords) if use_cache else None
+        if cached is not None:
+            since, cached_ids = cached[0], set(cached[1])
+        
+        for row in iter_table_rows(folder, _unprocessed_category_filter()):
+            if not _is_mail_message_class(row['MessageClass']):
+                continue
+            # 絞り込みに失敗した場合 (全件の Table にフォールバック) に備えて、ここでも判定する
+            if PROCESSED_CATEGORY_NAME in str(row['Categories'] or ''):
+                continue
+            entry_id = str(row['EntryID'])
+            # 前回の判定より前に受信したメールは、前回の結果を使う
+            if since is not None and _normalize_received_time(row['ReceivedTime']) < since:
+                if entry_id in cached_ids:
+                    matched_ids.add(entry_id)
+                continue
+            subject = str(row['Subject'] or '')
+            if MAIL_KEYWORD_MATCHER.match_groups(subject, groups=['must_include']):
+                matched_ids.add(entry_id)
+                continue
+            if body_chars > 0:
+                body_head = str(getattr(namespace.GetItemFromID(entry_id), 'Body', ''))[:body_chars]
+                if MAIL_KEYWORD_MATCHER.match_groups(subject + " " + body_head, groups=['must_include']):
+                    matched_ids.add(entry_id)
+        
+        if use_cache:
+            save_unprocessed_count(target_email, folder_path, checked_at, matched_ids, keywords=cache_keywords)
+        return len(matched_ids)
+
+    except Exception as e:
+        print(f"警告: 未処理メールチェック中にCOMエラー発生: {e}")
+        return 0
+        
+    finally:
+        if com_initialized:
+            pythoncom.CoUninitialize()
+
+
 # ----------------------------------------------------------------------
 # 💡 メイン抽出関数: Outlookからメールを取得
 # ----------------------------------------------------------------------
 
-def get_mail_data_from_outlook_in_memory(target_folder_path: str, account_name: str, read_mode: str = "all", days_ago: int = None) -> pd.DataFrame:
+def _normalize_received_time(received_time):
+    if received_time is not None and received_time.tzinfo is not None:
+        received_time = received_time.replace(tzinfo=None)
+    elif received_time is None:
+        received_time = datetime.datetime.now().replace(tzinfo=None)
+    return received_time
+
+
+class _IngestContext:
     """
-    Outlookからメールデータを抽出する。read_modeに基づいてフィルタリングを行う。
+    1回の取り込みで共有する状態
+    (段階フィルタ・添付ファイルのワーカープール・メールストア・差分同期の状態・処理済みマークの書き込みキュー)。
+    """
+
+    def __init__(self, cascade: FilterCascade, attachment_pool: AttachmentPool, mail_store: MailStore = None,
+                 sync_state: SyncState = None, category_marker: CategoryMarker = None):
+        self.cascade = cascade
+        self.attachment_pool = attachment_pool
+        self.mail_store = mail_store
+        self.sync_state = sync_state
+        self.category_marker = category_marker
+        self.unmarked = 0 # アイテムを取得できず、処理済みマークを付けられなかった未処理メールの件数
+
+
+def _open_ingest_context(cascade: FilterCascade = None) -> _IngestContext:
+    """取り込み1回分の状態を作る。終了時は _close_ingest_context を呼ぶこと (キャッシュ・スプール・ストアも閉じる)。"""
+    if cascade is None:
+        cascade = FilterCascade(MAIL_KEYWORD_MATCHER)
+    attachment_cache = AttachmentTextCache() if USE_ATTACHMENT_CACHE else None
+    mail_store = MailStore() if USE_MAIL_STORE else None
+    return _IngestContext(cascade, AttachmentPool(cache=attachment_cache), mail_store)
+
+
+def _close_ingest_context(ctx: _IngestContext, completed: bool = False):
+    """completed=True (最後まで走査できた) の場合だけ、差分同期の最高水位を進める。"""
+    ctx.attachment_pool.close()
+    if ctx.category_marker is not None:
+        ctx.category_marker.close()
+        if ctx.category_marker.stats['queued']:
+            print(ctx.category_marker.summary())
+    if ctx.mail_store is not None:
+        print(ctx.mail_store.summary())
+        ctx.mail_store.close()
+    if ctx.sync_state is not None:
+        ctx.sync_state.close(completed)
+        print(ctx.sync_state.summary())
+    if ctx.cascade.stats[STAGE_SUBJECT]['checked']:
+        print(ctx.cascade.summary())
+    if ctx.unmarked:
+        print(f"⚠️ アイテムを取得できず、処理済みマークを付けられなかったメール: {ctx.unmarked} 件 (次回も未処理として読み込まれます)")
+
+
+def _mark_processed(ctx: _IngestContext, mail_entry_id: str, mail_item):
+    """処理済みマークを付ける。書き込みキューがある場合は EntryID を積むだけにし、保存は専用スレッドに任せる。"""
+    if mail_item is None:
+        return
+    if ctx.category_marker is not None:
+        ctx.category_marker.mark(mail_entry_id)
+    else:
+        mark_email_as_processed(mail_item)
+
+
+def _begin_mail(mail_entry_id: str, subject: str, received_time, is_processed: bool, body: str, attachments: list,
+                ctx: _IngestContext, mail_item=None):
     """
-    data_records = []
-    temp_dir = os.path.join(SCRIPT_DIR, "temp_attachments_safe")
-    os.makedirs(temp_dir, exist_ok=True)
+    本文・添付ファイル名の除外判定を行い、添付ファイルのテキスト化をワーカープールに投入する。
+    除外された場合は None、それ以外は結果待ちのメール (dict) を返す (_finish_mail で完了させる)。
+    attachments は [(ファイル名, 読み込み関数), ...] (attachment_pool.AttachmentPool.submit と同じ形)。
+    件名の除外判定は呼び出し側で済ませておくこと。
+    mail_item (Outlook のアイテム) を渡した場合は、_finish_mail で処理済みマークを付ける。
+    """
+    cascade = ctx.cascade
+    # 除外キーワードは添付ファイルを保存・テキスト化する前に、軽い順 (本文 → 添付ファイル名) に判定する
+    if cascade.rejects(STAGE_BODY, body, has_attachments=bool(attachments)):
+        return None
+    
+    pending = {
+        'mail_item': mail_item,
+        'EntryID': mail_entry_id,
+        'is_processed': is_processed,
+        '件名': subject,
+        '受信日時': received_time,
+        '本文(テキスト形式)': body,
+        'attachment_names': [file_name for file_name, _ in attachments],
+        'attachments_text': "",
+        'jobs': None,
+    }
+    
+    if attachments:
+        if cascade.rejects(STAGE_ATTACHMENT_NAMES, " ".join(pending['attachment_names'])):
+            return None
+        
+        # 処理済みメールは、メールストアに保存したテキストを復元する (添付ファイルの読み込み・解析を省く)
+        # 本文・添付ファイル名が保存時と変わっている場合は復元せずに読み直す
+        if is_processed and ctx.mail_store is not None:
+            stored = ctx.mail_store.lookup(mail_entry_id)
+            if (stored is not None and stored['attachment_names'] == pending['attachment_names']
+                    and stored['body_hash'] == hash_body(body)):
+                pending['attachments_text'] = stored['attachments_text']
+                return pending
+        
+        # 内容の読み込みだけ行い、テキスト化はワーカープールに任せる
+        # (解析済みの内容と同じファイルは、添付ファイルキャッシュのテキストを使う)
+        started = time.perf_counter()
+        pending['jobs'] = ctx.attachment_pool.submit(attachments)
+        cascade.add_cost(STAGE_ATTACHMENT_CONTENTS, time.perf_counter() - started)
+    return pending
+
+
+def _finish_mail(pending: dict, ctx: _IngestContext):
+    """
+    添付ファイルのテキスト化の結果を受け取り、キーワード判定を行う。抽出対象ならレコード (dict)、対象外なら None を返す。
+    未処理メールへの処理済みマークもここで付ける (対象外でキーワードに該当しない場合と、抽出に成功した場合)。
+    """
+    mail_item = pending['mail_item']
+    is_processed = pending['is_processed']
+    
+    if pending['jobs'] is not None:
+        started = time.perf_counter()
+        pending['attachments_text'] = ctx.attachment_pool.collect(pending['jobs'])
+        ctx.cascade.add_cost(STAGE_ATTACHMENT_CONTENTS, time.perf_counter() - started)
+        # 次回以降の復元用に保存する (読み込み・解析に失敗したファイルがある場合は、次回読み直すため保存しない)
+        if ctx.mail_store is not None and is_complete(pending['attachments_text']):
+            ctx.mail_store.store(pending['EntryID'], hash_body(pending['本文(テキスト形式)']),
+                                 pending['attachment_names'], pending['attachments_text'])
+    attachments_text = pending['attachments_text']
+    if pending['attachment_names'] and ctx.cascade.rejects(STAGE_ATTACHMENT_CONTENTS, attachments_text):
+        return None
     
-    previous_attachment_content = _load_previous_attachment_content()
+    full_search_text = str(pending['件名']) + " " + str(pending['本文(テキスト形式)']) + " " + str(attachments_text)
+    
+    # キーワードフィルタリング (MUST/EXCLUDE)
+    filter_action = _keyword_filter_action(full_search_text, is_processed)
+    if filter_action == 'skip':
+         return None
+        
+    if filter_action == 'mark_skip':
+         # 未処理だが、キーワードに該当しないメールは抽出せず、マークだけ付けてスキップ
+         _mark_processed(ctx, pending['EntryID'], mail_item)
+         return None
+         
+    # レコードの準備
+    record = {
+        'EntryID': pending['EntryID'],
+        '件名': pending['件名'],
+        '受信日時': pending['受信日時'], 
+        '本文(テキスト形式)': pending['本文(テキスト形式)'], 
+        '本文(ファイル含む)': attachments_text, # 復元または新規抽出された本文
+        'Attachments': ", ".join(pending['attachment_names']),
+    }
+    
+    # 正常な処理フローを通過し、かつ未処理だった場合のみマーク
+    # (マーク後に返すため、呼び出し側が途中で止めても、返したメールはマーク済みになる。
+    #  書き込みキューを使う場合は、取り込みの終了時 (_close_ingest_context) にまとめて書き込まれる)
+    if not is_processed:
+        _mark_processed(ctx, pending['EntryID'], mail_item)
+    return record
+
+
+def _finish_in_order(pending_mails, ctx: _IngestContext, depth: int = ATTACHMENT_PIPELINE_DEPTH):
+    """
+    結果待ちのメールを受け取った順に完了させ、レコードを返すジェネレーター。
+    先頭のメールの添付ファイルがテキスト化されるまでは後続のメールの列挙・保存を進め、
+    結果待ちが depth 件を超えた場合だけ先頭の完了を待つ。
+    途中で止めた場合、結果待ちのまま残ったメールは差分同期の判定済みから外す (次回判定し直す)。
+    """
+    waiting = deque()
+    
+    def finish_head():
+        pending = waiting.popleft()
+        try:
+            return _finish_mail(pending, ctx)
+        except Exception as item_ex:
+            print(f"警告: メールアイテムの処理中にエラーが発生しました (EntryID: {pending['EntryID']}). スキップします。エラー: {item_ex}")
+            # 抽出が失敗した未処理メールは、次回以降のためにマークを付ける
+            if not pending['is_processed']:
+                 _mark_processed(ctx, pending['EntryID'], pending['mail_item']) 
+            return None
     
     try:
-        pythoncom.CoInitialize()
-        # 📌 修正1: win32.client.Dispatch の誤りを win32.Dispatch に修正
+        for pending in pending_mails:
+            waiting.append(pending)
+            while waiting and (len(waiting) > depth or ctx.attachment_pool.is_done(waiting[0]['jobs'])):
+                record = finish_head()
+                if record is not None:
+                    yield record
+        while waiting:
+            record = finish_head()
+            if record is not None:
+                yield record
+    finally:
+        if ctx.sync_state is not None:
+            for pending in waiting:
+                ctx.sync_state.forget(pending['EntryID'])
+
+
+def _begin_outlook_item(mail_item, mail_entry_id: str, subject: str, received_time, is_processed: bool, ctx: _IngestContext):
+    """Outlook のアイテムから本文・添付ファイルを読み、_begin_mail に渡す。"""
+    # 属性取得 (str() に強制変換でエラー回避)
+    started = time.perf_counter()
+    body = str(getattr(mail_item, 'Body', ''))       
+    has_files = hasattr(mail_item, 'Attachments') and mail_item.Attachments.Count > 0
+    attachments = [
+        (attachment.FileName, lambda spool, attachment=attachment: spool.from_outlook(attachment.FileName, attachment))
+        for attachment in mail_item.Attachments
+    ] if has_files else []
+    ctx.cascade.add_cost(STAGE_BODY, time.perf_counter() - started)
+    return _begin_mail(mail_entry_id, subject, received_time, is_processed, body, attachments, ctx, mail_item=mail_item)
+
+
+def _iter_items_legacy(items, read_mode: str, ctx: _IngestContext):
+    """Items を1件ずつ走査し、プロパティを getattr で個別に取得する従来の経路。結果待ちのメールを返す。"""
+    # ----------------------------------------------------
+    # 📌 修正4: 逆順ループを廃止し、安定したイテレーターループに戻す (IndexError回避)
+    # ----------------------------------------------------
+    for item in items:
+        if item.Class == 43: # olMailItem (メールアイテムのみを処理)
+            
+            try: 
+                mail_item = item
+                
+                is_processed = False
+                mail_entry_id = str(getattr(mail_item, 'EntryID', 'UNKNOWN')) 
+                
+                # 差分同期: 前回までに判定済みのメールは、他のプロパティを読まずに飛ばす
+                if ctx.sync_state is not None:
+                    if ctx.sync_state.is_seen(mail_entry_id):
+                        continue
+                    ctx.sync_state.mark_seen(mail_entry_id, _normalize_received_time(getattr(mail_item, 'ReceivedTime', None)))
+                
+                # 処理済みカテゴリチェック (is_processed を設定)
+                if hasattr(item, 'Categories'):
+                    current_categories = str(getattr(item, 'Categories', ''))
+                    if PROCESSED_CATEGORY_NAME in current_categories:
+                        is_processed = True
+                        
+                # 'unprocessed' モードの場合、処理済みはスキップ
+                # (Restrictが成功していれば、このチェックは不要だが、安全のために残す)
+                if read_mode == "unprocessed" and is_processed:
+                    continue 
+
+                subject = str(getattr(mail_item, 'Subject', '')) 
+                if ctx.cascade.rejects(STAGE_SUBJECT, subject):
+                    continue
+                received_time = _normalize_received_time(getattr(mail_item, 'ReceivedTime', datetime.datetime.now()))
+                pending = _begin_outlook_item(mail_item, mail_entry_id, subject, received_time, is_processed, ctx)
+
+            except Exception as item_ex:
+                print(f"警告: メールアイテムの処理中にエラーが発生しました (EntryID: {mail_entry_id}). スキップします。エラー: {item_ex}")
+                # 抽出が失敗した未処理メールは、次回以降のためにマークを付ける
+                if not is_processed:
+                     _mark_processed(ctx, mail_entry_id, mail_item) 
+                continue 
+            
+            if pending is not None:
+                yield pending
+
+
+def _iter_items_table(outlook_ns, target_folder, filter_queries: list, read_mode: str, start_date, ctx: _IngestContext):
+    """
+    Folder.GetTable で EntryID・件名・受信日時・カテゴリをまとめて取得し、
+    安価な条件 (メール種別・処理済み・期間・件名の除外キーワード) を通過した行だけアイテムを取得する経路。
+    filter_queries の条件は順に Outlook 側で絞り込む (outlook_table.open_table)。結果待ちのメールを返す。
+    """
+    for row in iter_table_rows(target_folder, filter_queries):
+        if not _is_mail_message_class(row['MessageClass']):
+            continue
+        mail_entry_id = str(row['EntryID'])
+        is_processed = PROCESSED_CATEGORY_NAME in str(row['Categories'] or '')
+        mail_item = None
+        
         try:
-            outlook_app = win32.GetActiveObject("Outlook.Application")
-        except:
-            outlook_app = win32.Dispatch("Outlook.Application")
+            # 'unprocessed' モード・期間指定は、Table の絞り込みに失敗した場合に備えてここでも判定する
+            if read_mode == "unprocessed" and is_processed:
+                continue
+            received_time = _normalize_received_time(row['ReceivedTime'])
+            if start_date is not None and received_time < start_date:
+                continue
+            # 差分同期: 前回までに判定済みのメールは、アイテムを取得せずに飛ばす
+            if ctx.sync_state is not None:
+                if ctx.sync_state.is_seen(mail_entry_id):
+                    continue
+                ctx.sync_state.mark_seen(mail_entry_id, received_time)
+
+            subject = str(row['Subject'] or '')
+            # 件名だけで除外キーワードに該当するメールは、本文を読んでも結果は同じ (スキップ) のため取得しない
+            if ctx.cascade.rejects(STAGE_SUBJECT, subject):
+                continue
+
+            started = time.perf_counter()
+            mail_item = outlook_ns.GetItemFromID(mail_entry_id)
+            ctx.cascade.add_cost(STAGE_BODY, time.perf_counter() - started)
+            pending = _begin_outlook_item(mail_item, mail_entry_id, subject, received_time, is_processed, ctx)
+
+        except Exception as item_ex:
+            print(f"警告: メールアイテムの処理中にエラーが発生しました (EntryID: {mail_entry_id}). スキップします。エラー: {item_ex}")
+            # 抽出が失敗した未処理メールは、次回以降のためにマークを付ける
+            if not is_processed:
+                if mail_item is not None:
+                    _mark_processed(ctx, mail_entry_id, mail_item)
+                elif ctx.category_marker is not None:
+                    # GetItemFromID に失敗した場合も、書き込みキューは EntryID からアイテムを取得し直してマークを付ける
+                    _mark_processed(ctx, mail_entry_id, _MARK_BY_ENTRY_ID)
+                else:
+                    ctx.unmarked += 1
+            continue 
+
+        if pending is not None:
+            yield pending
+
+
+# ----------------------------------------------------------------------
+# 💡 期間の分割取得: 期間ごとに別スレッド (STA) で Table を取得し、受信日時の順に取り込む
+# ----------------------------------------------------------------------
+# 別スレッドで取得したメールの mail_item の代わり (COM オブジェクトはアパートメントをまたげないため、
+# 処理済みマークは書き込みキュー (category_marker.py) で EntryID から付ける)
+_MARK_BY_ENTRY_ID = object()
+_WINDOW_DONE = object()
+
+
+def _split_windows(start_date: datetime.datetime, window_days: int, now: datetime.datetime = None) -> list:
+    """
+    start_date 以降を window_days 日ごとの期間 [(開始, 終了), ...] に分ける (古い順)。
+    期間の境界は分単位に揃え (Jet 形式の条件は分単位のため)、最後の期間は終了なし (取得中に届いたメールも含める)。
+    """
+    now = now or datetime.datetime.now()
+    step = timedelta(days=window_days)
+    windows = []
+    window_start = start_date
+    boundary = start_date.replace(second=0, microsecond=0) + step
+    while boundary < now:
+        windows.append((window_start, boundary))
+        window_start = boundary
+        boundary += step
+    windows.append((window_start, None))
+    return windows
+
+
+def _window_filter(window) -> str:
+    window_start, window_end = window
+    window_filter = f"[ReceivedTime] >= '{_format_restrict_datetime(window_start)}'"
+    if window_end is not None:
+        window_filter += f" AND [ReceivedTime] < '{_format_restrict_datetime(window_end)}'"
+    return window_filter
+
+
+def _put_until_cancelled(out_queue: queue.Queue, value, cancel: threading.Event) -> bool:
+    """取り込み側が止まった (cancel) 場合に待ち続けないよう、少しずつ待って渡す。渡せなかった場合は False。"""
+    while not cancel.is_set():
+        try:
+            out_queue.put(value, timeout=0.2)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _discard_fetched(fetched: dict):
+    """取り込まなかったメールの、先に読み込んだ添付ファイル (書き出したファイル) を削除する。"""
+    for spooled in fetched.get('spooled', []):
+        spooled.discard()
+
+
+def _raise(error):
+    raise error
+
+
+def _fetch_window(outlook_app, account_name: str, folder_path: str, dasl_query: str, window, read_mode: str,
+                  cascade: FilterCascade, seen_ids: frozenset, spool: AttachmentSpool, out_queue: queue.Queue,
+                  cancel: threading.Event):
+    """
+    [ワーカースレッドで実行] 1期間分のメールを Table で列挙し、受信日時の順に本文・添付ファイルを読み込んで out_queue に渡す。
+    このスレッドで COM を初期化し、独自に Outlook へ接続する (取得した COM オブジェクトは他のスレッドに渡さない)。
+    取り込みの状態 (差分同期・段階フィルタの集計・ワーカープール) には触れず、判定は取り込み側 (_begin_fetched_mail) で行う。
+    - 件名だけで除外キーワードに該当するメール・判定済み (seen_ids。差分同期の状態のスナップショット) のメールは、
+      アイテムを取得せずに件名だけを渡す
+    - 添付ファイルは、この期間専用の spool (書き出し先は取り込みのスプールと同じ) に読み込む
+    最後に _WINDOW_DONE を渡す。期間全体の失敗は例外オブジェクトとして渡す。
+    """
+    window_start, window_end = window
+    if pythoncom is not None:
+        pythoncom.CoInitialize()
+    try:
+        namespace = _connect_outlook_namespace(outlook_app)
+        folder = get_outlook_folder(namespace, account_name, folder_path)
+        if folder is None:
+            raise RuntimeError(f"指定されたフォルダパス '{folder_path}' が見つかりませんでした。")
+        
+        rows = []
+        for row in iter_table_rows(folder, [_window_filter(window), dasl_query]):
+            if not _is_mail_message_class(row['MessageClass']):
+                continue
+            # 絞り込みに失敗した場合に備えて、期間はここでも判定する (期間の重複・取りこぼしを防ぐ)
+            received_time = _normalize_received_time(row['ReceivedTime'])
+            if received_time < window_start or (window_end is not None and received_time >= window_end):
+                continue
+            rows.append((received_time, row))
+        rows.sort(key=lambda received_row: received_row[0])
+        
+        for received_time, row in rows:
+            if cancel.is_set():
+                return
+            mail_entry_id = str(row['EntryID'])
+            is_processed = PROCESSED_CATEGORY_NAME in str(row['Categories'] or '')
+            if read_mode == "unprocessed" and is_processed:
+                continue
+            fetched = {
+                'EntryID': mail_entry_id, '件名': str(row['Subject'] or ''), '受信日時': received_time, 'is_processed': is_processed,
+                'body': None, 'attachments': [], 'spooled': [], 'error': None, 'fetch_sec': 0.0, 'load_sec': 0.0,
+            }
+            if mail_entry_id not in seen_ids and not cascade.matcher.match_groups(fetched['件名'], groups=[cascade.group]):
+                try:
+                    started = time.perf_counter()
+                    mail_item = namespace.GetItemFromID(mail_entry_id)
+                    fetched['body'] = str(getattr(mail_item, 'Body', ''))
+                    has_files = hasattr(mail_item, 'Attachments') and mail_item.Attachments.Count > 0
+                    fetched['fetch_sec'] = time.perf_counter() - started
+                    started = time.perf_counter()
+                    for attachment in (mail_item.Attachments if has_files else []):
+                        file_name = attachment.FileName
+                        try:
+                            spooled = spool.from_outlook(file_name, attachment)
+                            fetched['spooled'].append(spooled)
+                            fetched['attachments'].append((file_name, lambda spool, spooled=spooled: spooled))
+                        except Exception as file_ex:
+                            # 読み込めなかったファイルは、ワーカープールでエラーとして本文に記録される
+                            fetched['attachments'].append((file_name, lambda spool, file_ex=file_ex: _raise(file_ex)))
+                    fetched['load_sec'] = time.perf_counter() - started
+                except Exception as item_ex:
+                    fetched['error'] = item_ex
+            if not _put_until_cancelled(out_queue, fetched, cancel):
+                _discard_fetched(fetched)
+                return
+    except Exception as window_ex:
+        _put_until_cancelled(out_queue, window_ex, cancel)
+    finally:
+        _put_until_cancelled(out_queue, _WINDOW_DONE, cancel)
+        if pythoncom is not None:
+            pythoncom.CoUninitialize()
+
+
+def _begin_fetched_mail(fetched: dict, ctx: _IngestContext):
+    """_fetch_window で読み込んだメールを、取り込み側のスレッドで判定し、_begin_mail に渡す。"""
+    mail_entry_id = fetched['EntryID']
+    is_processed = fetched['is_processed']
+    spool_stats = ctx.attachment_pool.spool.stats
+    for spooled in fetched['spooled']:
+        spool_stats['in_memory' if spooled.in_memory else 'spilled'] += 1
+    if ctx.sync_state is not None:
+        # 差分同期: 前回までに判定済みのメールは飛ばす (期間のスレッドはアイテムを取得せずに渡している)
+        if ctx.sync_state.is_seen(mail_entry_id):
+            _discard_fetched(fetched)
+            return None
+        ctx.sync_state.mark_seen(mail_entry_id, fetched['受信日時'])
+    if ctx.cascade.rejects(STAGE_SUBJECT, fetched['件名']):
+        return None
+    if fetched['error'] is not None:
+        print(f"警告: メールアイテムの処理中にエラーが発生しました (EntryID: {mail_entry_id}). スキップします。エラー: {fetched['error']}")
+        if not is_processed:
+            _mark_processed(ctx, mail_entry_id, _MARK_BY_ENTRY_ID)
+        _discard_fetched(fetched)
+        return None
+    
+    ctx.cascade.add_cost(STAGE_BODY, fetched['fetch_sec'])
+    ctx.cascade.add_cost(STAGE_ATTACHMENT_CONTENTS, fetched['load_sec'])
+    pending = _begin_mail(mail_entry_id, fetched['件名'], fetched['受信日時'], is_processed, fetched['body'],
+                          fetched['attachments'], ctx, mail_item=_MARK_BY_ENTRY_ID)
+    # ワーカープールに渡さなかった (除外された・メールストアから復元した) 場合は、読み込んだ添付ファイルを削除する
+    if pending is None or pending['jobs'] is None:
+        _discard_fetched(fetched)
+    return pending
+
+
+def _iter_items_windowed(outlook_app, account_name: str, folder_path: str, dasl_query: str, windows: list, read_mode: str,
+                         ctx: _IngestContext, workers: int = INGEST_WINDOW_WORKERS):
+    """
+    期間ごとの取得 (_fetch_window) を workers 個のスレッドで並行させ、古い期間から順に結果待ちのメールを返す
+    (期間内は受信日時の順)。1回の Restrict で長い期間を走査すると RPC のタイムアウトが起きやすいため、期間を分ける。
+    各期間は INGEST_WINDOW_QUEUE_SIZE 件まで先読みし、取り込み側が追いつくまで待つ。
+    処理済みマークは書き込みキュー (ctx.category_marker) が必要。
+    ctx の状態 (差分同期は同じスレッドでしか使えない) は、このジェネレーターを回す取り込み側のスレッドだけで使う。
+    """
+    cancel = threading.Event()
+    queues = [queue.Queue(maxsize=INGEST_WINDOW_QUEUE_SIZE) for _ in windows]
+    seen_ids = ctx.sync_state.seen_entry_ids() if ctx.sync_state is not None else frozenset()
+    pool_spool = ctx.attachment_pool.spool
+    # 期間は古い順に投入するため、取り込み側が待つ期間は常に取得中か取得済みになる
+    executor = ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="outlook-window")
+    for window, out_queue in zip(windows, queues):
+        spool = AttachmentSpool(spool_dir=pool_spool.spool_dir, max_memory_bytes=pool_spool.max_memory_bytes)
+        executor.submit(_fetch_window, outlook_app, account_name, folder_path, dasl_query, window, read_mode,
+                        ctx.cascade, seen_ids, spool, out_queue, cancel)
+    
+    try:
+        for out_queue in queues:
+            while True:
+                fetched = out_queue.get()
+                if fetched is _WINDOW_DONE:
+                    break
+                if isinstance(fetched, Exception):
+                    raise fetched
+                pending = _begin_fetched_mail(fetched, ctx)
+                if pending is not None:
+                    yield pending
+    finally:
+        cancel.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        for out_queue in queues:
+            while not out_queue.empty():
+                fetched = out_queue.get_nowait()
+                if isinstance(fetched, dict):
+                    _discard_fetched(fetched)
+
+
+def iter_mail_data_from_outlook(target_folder_path: str, account_name: str, read_mode: str = "all", days_ago: int = None,
+                                outlook_app=None, use_table: bool = OUTLOOK_USE_TABLE, cascade: FilterCascade = None,
+                                use_sync_state: bool = USE_SYNC_STATE, use_keyword_pushdown: bool = USE_DASL_KEYWORD_PUSHDOWN,
+                                window_days: int = INGEST_WINDOW_DAYS, window_workers: int = INGEST_WINDOW_WORKERS):
+    """
+    Outlookからメールデータを1件ずつ dict で返すジェネレーター。read_modeに基づいてフィルタリングを行う。
+    COMの初期化はこのジェネレーターを回すスレッドで行われるため、同じスレッドで最後まで（または close まで）回すこと。
+    use_table=True の場合は Folder.GetTable でプロパティをまとめて取得する (1件ごとの COM 呼び出しを減らす)。
+    outlook_app に outlook_recording.RecordedOutlook などを渡すと、Outlook なしで同じ処理を実行できる。
+    添付ファイルのテキスト化は attachment_pool のワーカーで行い、メールの列挙と並行させる。
+    除外キーワードは filter_cascade の段階フィルタで判定し、終了時に段階ごとの集計を表示する
+    (cascade を渡すと、呼び出し側で集計 cascade.report() を参照できる)。
+    read_mode="unprocessed" かつ use_sync_state=True の場合は差分同期 (sync_state.py) を行い、
+    2回目以降は前回の最高水位以降に受信したメールだけを取得し、判定済みのメールは読まずに飛ばす。
+    USE_CATEGORY_WRITE_BEHIND=True の場合、処理済みマークは専用スレッド (category_marker.py) で書き込み、
+    このジェネレーターの終了時 (close を含む) に残りをすべて書き込む。
+    use_keyword_pushdown=True の場合は、必須/除外キーワードを DASL 条件 (dasl_query.py) に変換して Outlook 側で候補を絞り込む
+    (候補にならなかった未処理メールには処理済みマークを付けない)。
+    use_table=True で取得期間の開始 (days_ago・差分同期) がある場合は、window_days 日ごとの期間に分け、
+    window_workers 個のスレッドで並行して取得する (_iter_items_windowed)。メールは古い期間から受信日時の順に返す。
+    """
+    if outlook_app is None:
+        _require_outlook()
+    ctx = _open_ingest_context(cascade)
+    if USE_CATEGORY_WRITE_BEHIND:
+        ctx.category_marker = CategoryMarker(lambda: _connect_outlook_namespace(outlook_app), _apply_processed_category)
+    if read_mode == "unprocessed" and use_sync_state:
+        ctx.sync_state = SyncState(account_name, target_folder_path, keywords=[MUST_INCLUDE_KEYWORDS, EXCLUDE_KEYWORDS])
+    com_initialized = False
+    completed = False
+    
+    try:
+        if outlook_app is None:
+            pythoncom.CoInitialize()
+            com_initialized = True
             
-        outlook_ns = outlook_app.GetNamespace("MAPI")
+        outlook_ns = _connect_outlook_namespace(outlook_app)
         target_folder = get_outlook_folder(outlook_ns, account_name, target_folder_path)
         
         if target_folder is None:
@@ -205,153 +917,88 @@ def get_mail_data_from_outlook_in_memory(target_folder_path: str, account_name:
         # ----------------------------------------------------
         # 📌 修正2: フィルタリングクエリの構築を強化 (RPCエラー回避)
         # ----------------------------------------------------
-        filter_query_list = []
+        # Jet 形式の条件と DASL の条件は1つの文字列に混ぜられないため、それぞれ AND で結合して順に絞り込む
+        jet_filters = []
+        dasl_conditions = []
+        start_date = None
         
         # 1. 期間指定フィルタ
         if (read_mode == "all" or read_mode == "days") and days_ago is not None:
-            start_date = (datetime.datetime.now() - timedelta(days=days_ago)).strftime('%m/%d/%Y %H:%M %p')
-            filter_query_list.append(f"[ReceivedTime] >= '{start_date}'")
+            start_date = datetime.datetime.now() - timedelta(days=days_ago)
+            jet_filters.append(f"[ReceivedTime] >= '{_format_restrict_datetime(start_date)}'")
 
         # 2. 未処理モードの場合、Outlook側でカテゴリによる絞り込みを行う
-        if read_mode == "unprocessed":
+        window_start = ctx.sync_state.window_start() if ctx.sync_state is not None else None
+        if read_mode == "unprocessed" and window_start is not None:
+            # 差分同期: 前回の最高水位 (から重なりの分だけ前) 以降に受信したメールだけを取得する
+            # (カテゴリの DASL 絞り込みより軽い。処理済みかどうかは取得後にカテゴリで判定する)
+            start_date = window_start
+            jet_filters.append(f"[ReceivedTime] >= '{_format_restrict_datetime(window_start)}'")
+        elif read_mode == "unprocessed":
             # DASLクエリを使用して、「Categories」プロパティに処理済みタグが含まれていないメールを検索
-            # (SQLの IS NULL OR NOT LIKE と同等)
-            category_filter = f"(\"urn:schemas-microsoft-com:office:office#Keywords\" IS NULL OR \"urn:schemas-microsoft-com:office:office#Keywords\" NOT LIKE '%{PROCESSED_CATEGORY_NAME}%')"
-            filter_query_list.append(category_filter)
+            dasl_conditions.append(category_not_like(PROCESSED_CATEGORY_NAME))
+
+        # 3. 必須/除外キーワードで候補を絞り込む (件名・本文の部分一致。正確な判定は取得後に行う)
+        if use_keyword_pushdown:
+            dasl_conditions.extend(keyword_pushdown_conditions(MUST_INCLUDE_KEYWORDS, EXCLUDE_KEYWORDS, DASL_KEYWORD_OPERATOR))
+
+        filter_queries = [query for query in (" AND ".join(jet_filters), to_dasl_query(dasl_conditions)) if query]
 
-        if filter_query_list:
-            query_string = " AND ".join(filter_query_list)
+        windows = _split_windows(start_date, window_days) if use_table and start_date is not None and window_days > 0 else []
+        if len(windows) > 1:
+            # 別スレッドで取得したメールには、このスレッドから COM で書き込めないため、処理済みマークは書き込みキューで付ける
+            if ctx.category_marker is None:
+                ctx.category_marker = CategoryMarker(lambda: _connect_outlook_namespace(outlook_app), _apply_processed_category)
+            yield from _finish_in_order(_iter_items_windowed(outlook_app, account_name, target_folder_path, to_dasl_query(dasl_conditions),
+                                                             windows, read_mode, ctx, window_workers), ctx)
+            completed = True
+            return
+
+        if use_table:
+            yield from _finish_in_order(_iter_items_table(outlook_ns, target_folder, filter_queries, read_mode, start_date, ctx), ctx)
+            completed = True
+            return
+
+        for query in filter_queries:
             try:
                 # 📌 修正3: 絞り込みを実行
                 # これにより、items の件数が大幅に減り、タイムアウトを防ぐ
-                items = items.Restrict(query_string)
+                items = items.Restrict(query)
             except Exception as restrict_error:
+                # 失敗した条件は使わずに続ける (取得後の判定で同じ結果になる。低速だが安全)
                 print(f"警告: Outlookの絞り込み(Restrict)に失敗しました: {restrict_error}")
-                # 失敗した場合は、全件ループで処理 (低速だが安全)
-                items = target_folder.Items
-
-        # ----------------------------------------------------
-        # 📌 修正4: 逆順ループを廃止し、安定したイテレーターループに戻す (IndexError回避)
-        # ----------------------------------------------------
-        for item in items:
-            if item.Class == 43: # olMailItem (メールアイテムのみを処理)
-                
-                extraction_succeeded = False 
-                
-                try: 
-                    mail_item = item
-                    
-                    is_processed = False
-                    mail_entry_id = str(getattr(mail_item, 'EntryID', 'UNKNOWN')) 
-                    
-                    # 処理済みカテゴリチェック (is_processed を設定)
-                    if hasattr(item, 'Categories'):
-                        current_categories = str(getattr(item, 'Categories', ''))
-                        if PROCESSED_CATEGORY_NAME in current_categories:
-                            is_processed = True
-                            
-                    # 'unprocessed' モードの場合、処理済みはスキップ
-                    # (Restrictが成功していれば、このチェックは不要だが、安全のために残す)
-                    if read_mode == "unprocessed" and is_processed:
-                        continue 
-
-                    # 属性取得 (str() に強制変換でエラー回避)
-                    subject = str(getattr(mail_item, 'Subject', '')) 
-                    body = str(getattr(mail_item, 'Body', ''))       
-                    received_time = getattr(mail_item, 'ReceivedTime', datetime.datetime.now())
-                    
-                    if received_time is not None and received_time.tzinfo is not None:
-                        received_time = received_time.replace(tzinfo=None)
-                    elif received_time is None:
-                        received_time = datetime.datetime.now().replace(tzinfo=None)
-                    
-                    attachments_text = ""
-                    attachment_names = []
-                    
-                    # 添付ファイルの読み込みロジック (ファイルI/Oのスキップと復元)
-                    has_files = hasattr(mail_item, 'Attachments') and mail_item.Attachments.Count > 0
-                    
-                    if has_files:
-                        attachment_names = [att.FileName for att in mail_item.Attachments]
-                        
-                        if is_processed and mail_entry_id in previous_attachment_content:
-                            # 処理済みの場合、ファイルI/Oをスキップして本文を復元
-                            attachments_text = str(previous_attachment_content.get(mail_entry_id, "")) 
-                            
-                        else:
-                            # 未処理の場合、ファイルI/Oを実行しテキストを抽出
-                            for attachment in mail_item.Attachments:
-                                
-                                safe_filename = re.sub(r'[\\/:*?"<>|]', '_', attachment.FileName)
-                                temp_file_path = os.path.join(temp_dir, f"{uuid.uuid4().hex}_{safe_filename}")
-                                
-                                try:
-                                    attachment.SaveAsFile(temp_file_path)
-                                    extracted_content = get_attachment_text(temp_file_path, attachment.FileName)
-                                    attachments_text += f"\n--- FILE: {attachment.FileName} ---\n{str(extracted_content)}\n"
-                                except Exception as file_ex:
-                                    attachments_text += f"\n--- ERROR reading {attachment.FileName}: {file_ex} ---\n"
-                                finally:
-                                    if os.path.exists(temp_file_path):
-                                        os.remove(temp_file_path)
-                            
-                            attachments_text = attachments_text.strip()
-                    
-                    full_search_text = str(subject) + " " + str(body) + " " + str(attachments_text)
-                    
-                    # キーワードフィルタリング (MUST/EXCLUDE)
-                    must_include = any(re.search(kw, full_search_text, re.IGNORECASE) for kw in MUST_INCLUDE_KEYWORDS)
-                    is_excluded = any(re.search(kw, full_search_text, re.IGNORECASE) for kw in EXCLUDE_KEYWORDS)
-                    
-                    
-                    # 抽出対象として残す条件を調整 (キーワードチェック)
-                    if is_processed and not must_include:
-                         continue
-
-                    if is_excluded:
-                         continue
-                        
-                    if not must_include and not is_processed:
-                         # 未処理だが、キーワードに該当しないメールは抽出せず、マークだけ付けてスキップ
-                         mark_email_as_processed(mail_item)
-                         continue
-                         
-                    # レコードの準備
-                    record = {
-                        'EntryID': mail_entry_id,
-                        '件名': subject,
-                        '受信日時': received_time, 
-                        '本文(テキスト形式)': body, 
-                        '本文(ファイル含む)': attachments_text, # 復元または新規抽出された本文
-                        'Attachments': ", ".join(attachment_names),
-                    }
-                    data_records.append(record)
-                    
-                    extraction_succeeded = True 
 
-                except Exception as item_ex:
-                    print(f"警告: メールアイテムの処理中にエラーが発生しました (EntryID: {mail_entry_id}). スキップします。エラー: {item_ex}")
-                    # 抽出が失敗した未処理メールは、次回以降のためにマークを付ける
-                    if not is_processed:
-                         mark_email_as_processed(mail_item) 
-                    continue 
-                
-                # 正常な処理フローを通過し、かつ未処理だった場合のみマーク
-                if extraction_succeeded and not is_processed:
-                    mark_email_as_processed(mail_item) 
+        yield from _finish_in_order(_iter_items_legacy(items, read_mode, ctx), ctx)
+        completed = True
 
     except Exception as e:
         raise RuntimeError(f"Outlook操作エラー: {e}\n詳細: {traceback.format_exc()}")
     finally:
-        # 一時ディレクトリのクリーンアップ
-        if os.path.exists(temp_dir) and not os.listdir(temp_dir):
-            try: os.rmdir(temp_dir)
-            except OSError: pass
-        pythoncom.CoUninitialize() 
+        _close_ingest_context(ctx, completed)
+        if com_initialized:
+            pythoncom.CoUninitialize() 
+
+
+def get_mail_data_from_outlook_in_memory(target_folder_path: str, account_name: str, read_mode: str = "all", days_ago: int = None) -> pd.DataFrame:
+    """
+    Outlookからメールデータを抽出する。read_modeに基づいてフィルタリングを行う。
+    （全件を DataFrame で返す。件数が多い場合は iter_mail_data_from_outlook と extraction_core.iter_extract を使う）
+    """
+    return mail_records_to_dataframe(
+        iter_mail_data_from_outlook(target_folder_path, account_name, read_mode=read_mode, days_ago=days_ago)
+    )
+
+
+def mail_records_to_dataframe(records) -> pd.DataFrame:
+    """メールレコード (dict) の iterable を、抽出処理に渡す DataFrame に変換する。"""
+    data_records = list(records)
             
     df = pd.DataFrame(data_records)
     str_cols = [col for col in df.columns if col != '受信日時']
     df[str_cols] = df[str_cols].fillna('N/A').astype(str)
+    # 受信日時は文字列化せず datetime64 で保持する (本文は抽出の正規表現処理のため Python 文字列のまま)
+    if '受信日時' in df.columns:
+        df['受信日時'] = pd.to_datetime(df['受信日時'], errors='coerce')
     return df
 
 # ----------------------------------------------------------------------
@@ -0,0 +1,163 @@
+# extraction_cache.py
+# 責務: 本文ハッシュ → 項目ごとの抽出結果を SQLite に永続化し、再送された同一スキルシートの再抽出を省く。
+#       各項目の結果には「その項目のパターン定義のフィンガープリント」を添えて保存するため、
+#       ITEM_PATTERNS / PROCESS_KEYWORDS を変更しても、変更した項目の結果だけが無効になる。
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from config import ITEM_PATTERNS, PROCESS_KEYWORDS, EXTRACTION_CACHE_PATH, EXTRACTION_CACHE_MAX_ENTRIES
+
+# clean_and_normalize など、パターン以外の抽出ロジックを変更した場合に上げる (全項目が無効になる)
+EXTRACTION_LOGIC_VERSION = 1
+
+
+def _fingerprint(payload) -> str:
+    """JSON化できる定義からフィンガープリントを作る。"""
+    text = json.dumps([EXTRACTION_LOGIC_VERSION, payload], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def compute_field_fingerprints(item_patterns: dict = ITEM_PATTERNS, process_keywords: dict = PROCESS_KEYWORDS) -> dict:
+    """
+    抽出項目ごとのフィンガープリントを返す。
+    ITEM_PATTERNS は '業務_業種' のように複数キーが同じ項目（'業務'）に集約されるため、項目単位でまとめる。
+    開発工程フラグは '開発工程_<工程名>' をキーとする。
+    """
+    grouped = {}
+    for item_key, pattern_list in item_patterns.items():
+        grouped.setdefault(item_key.split('_')[0], []).append([item_key, pattern_list])
+
+    fingerprints = {field: _fingerprint(definition) for field, definition in grouped.items()}
+    for proc_name, keywords in process_keywords.items():
+        fingerprints[f'開発工程_{proc_name}'] = _fingerprint(keywords)
+    return fingerprints
+
+
+def hash_body(text: str) -> str:
+    """正規化済み本文のハッシュ（キャッシュのキー）を返す。"""
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+
+class ExtractionCache:
+    """
+    本文ハッシュをキーに、項目ごとの (抽出値, スコア) を保存する SQLite キャッシュ。
+
+    - lookup(): フィンガープリントが現在の定義と一致する項目だけを返す
+    - store(): 再計算した項目を書き込む（一定件数ごとにまとめてコミット）
+    - close(): 未書き込み分を反映し、上限件数を超えた分を最終利用が古い順に削除する
+    hits / partial / misses / evictions の件数を stats に保持する。
+    同じスレッドで生成・使用すること（sqlite3 の接続はスレッドをまたげない）。
+    """
+
+    FLUSH_EVERY = 1000
+
+    def __init__(self, path: str = EXTRACTION_CACHE_PATH, max_entries: int = EXTRACTION_CACHE_MAX_ENTRIES, fingerprints: dict = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.fingerprints = fingerprints if fingerprints is not None else compute_field_fingerprints()
+        self.stats = {'hits': 0, 'partial': 0, 'misses': 0, 'stale_fields': 0, 'evictions': 0}
+        self._pending_fields = []
+        self._pending_bodies = {}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS bodies (body_hash TEXT PRIMARY KEY, last_used REAL NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fields ("
+            " body_hash TEXT NOT NULL, field TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+            " value TEXT, score INTEGER NOT NULL, PRIMARY KEY (body_hash, field))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_bodies_last_used ON bodies (last_used)")
+        self._conn.commit()
+
+    def lookup(self, text: str):
+        """
+        (本文ハッシュ, {項目: (抽出値, スコア)}) を返す。
+        返すのは現在の定義と一致する項目だけで、スコア0は「マッチなし」を表す。
+        """
+        body_hash = hash_body(text)
+        rows = self._conn.execute(
+            "SELECT field, fingerprint, value, score FROM fields WHERE body_hash = ?", (body_hash,)
+        ).fetchall()
+
+        fresh = {}
+        for field, fingerprint, value, score in rows:
+            if self.fingerprints.get(field) == fingerprint:
+                fresh[field] = (value, score)
+
+        if not rows:
+            self.stats['misses'] += 1
+        elif len(fresh) == len(self.fingerprints):
+            self.stats['hits'] += 1
+            self._pending_bodies[body_hash] = time.time()
+        else:
+            self.stats['partial'] += 1
+            self.stats['stale_fields'] += len(self.fingerprints) - len(fresh)
+        return body_hash, fresh
+
+    def store(self, body_hash: str, field_results: dict):
+        """再計算した項目の結果を書き込み待ちに積む。"""
+        for field, (value, score) in field_results.items():
+            fingerprint = self.fingerprints.get(field)
+            if fingerprint is not None:
+                self._pending_fields.append((body_hash, field, fingerprint, value, score))
+        self._pending_bodies[body_hash] = time.time()
+        if len(self._pending_bodies) >= self.FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """書き込み待ちの結果と最終利用時刻を1トランザクションで反映する。"""
+        if not self._pending_fields and not self._pending_bodies:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO fields (body_hash, field, fingerprint, value, score) VALUES (?, ?, ?, ?, ?)",
+                self._pending_fields,
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bodies (body_hash, last_used) VALUES (?, ?)",
+                list(self._pending_bodies.items()),
+            )
+        self._pending_fields = []
+        self._pending_bodies = {}
+
+    def evict(self) -> int:
+        """上限件数を超えた本文を、最終利用が古い順に削除する。削除件数を返す。"""
+        total = self._conn.execute("SELECT COUNT(*) FROM bodies").fetchone()[0]
+        excess = total - self.max_entries
+        if excess <= 0:
+            return 0
+        with self._conn:
+            self._conn.execute(
+                "CREATE TEMP TABLE evicted AS SELECT body_hash FROM bodies ORDER BY last_used ASC LIMIT ?", (excess,)
+            )
+            self._conn.execute("DELETE FROM fields WHERE body_hash IN (SELECT body_hash FROM evicted)")
+            self._conn.execute("DELETE FROM bodies WHERE body_hash IN (SELECT body_hash FROM evicted)")
+            self._conn.execute("DROP TABLE evicted")
+        self.stats['evictions'] += excess
+        return excess
+
+    def summary(self) -> str:
+        """ヒット率などの集計を1行の文字列で返す。"""
+        looked_up = self.stats['hits'] + self.stats['partial'] + self.stats['misses']
+        hit_rate = (self.stats['hits'] / looked_up) * 100 if looked_up else 0
+        return (f"抽出キャッシュ: ヒット {self.stats['hits']} / 一部再抽出 {self.stats['partial']} "
+                f"(再抽出項目 {self.stats['stale_fields']}) / ミス {self.stats['misses']} "
+                f"/ 削除 {self.stats['evictions']} (ヒット率 {hit_rate:.1f}%)")
+
+    def close(self):
+        self.flush()
+        self.evict()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -2,7 +2,140 @@
 
 import pandas as pd
 import re
-from config import MASTER_COLUMNS, ITEM_PATTERNS, PROCESS_KEYWORDS
+import os
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from keyword_matcher import KeywordMatcher
+from extraction_cache import compute_field_fingerprints
+from result_schema import apply_result_schema
+from pattern_profiler import PatternProfiler
+from search_guard import SearchGuard
+from config import MASTER_COLUMNS, ITEM_PATTERNS, PROCESS_KEYWORDS, EXTRACTION_WORKERS, PARALLEL_MIN_RECORDS, EXTRACTION_CHUNK_SIZE
+from config import PATTERN_PROFILE_ENABLED, PATTERN_PROFILE_REPORT_PATH, GUARDED_SEARCH_ENABLED, GUARDED_SEARCH_REPORT_PATH
+
+
+# ----------------------------------------------------
+# パターンバンク: ITEM_PATTERNS を一度だけコンパイルし、項目ごとに1回で確定させる
+# ----------------------------------------------------
+
+class PatternBank:
+    """
+    ITEM_PATTERNS を一度だけコンパイルし、項目ごとに「スコア降順（同点は定義順）」で並べたパターンバンク。
+
+    旧ロジックは全パターンを re.search し「score > 現在のスコア」で上書きしていたため、
+    結果は「マッチしたパターンのうち最高スコア（同点は先勝ち）の最左マッチ」と等しい。
+    バンクはその順に検索し、最初にマッチした時点で残りの低スコアパターンを打ち切る。
+    """
+
+    def __init__(self, item_patterns: dict):
+        self.entries = []          # [(base_item_name, score, compiled), ...] 定義順
+        self.field_priority = {}   # base_item_name -> スコア降順のエントリ番号
+
+        for item_key, pattern_list in item_patterns.items():
+            base_item_name = item_key.split('_')[0]
+            flags = re.IGNORECASE
+            if item_key == 'スキルor言語':
+                flags |= re.DOTALL
+
+            for pattern_info in pattern_list:
+                self.field_priority.setdefault(base_item_name, []).append(len(self.entries))
+                self.entries.append((base_item_name, pattern_info['score'], re.compile(pattern_info['pattern'], flags)))
+
+        # スコア0以下のパターンは旧ロジックでも採用されないため除外する
+        for base_item_name, indexes in self.field_priority.items():
+            self.field_priority[base_item_name] = sorted(
+                (i for i in indexes if self.entries[i][1] > 0), key=lambda i: -self.entries[i][1]
+            )
+
+    def scan(self, text: str, fields=None) -> dict:
+        """
+        本文を走査し、{項目名: (抽出値, スコア)} を返す。マッチしなかった項目は含まない。
+        fields を指定した場合は、その項目だけを走査する。
+        """
+        results = {}
+        for base_item_name, indexes in self.field_priority.items():
+            if fields is not None and base_item_name not in fields:
+                continue
+            for entry_index in indexes:
+                _, score, compiled = self.entries[entry_index]
+                match = compiled.search(text)
+                if match:
+                    results[base_item_name] = (match.group(1), score)
+                    break
+        return results
+
+    def scan_profiled(self, text: str, profiler, fields=None) -> dict:
+        """scan と同じ結果を返し、パターンごとの検索時間とマッチ有無を profiler に記録する。"""
+        results = {}
+        for base_item_name, indexes in self.field_priority.items():
+            if fields is not None and base_item_name not in fields:
+                continue
+            for entry_index in indexes:
+                _, score, compiled = self.entries[entry_index]
+                started = time.perf_counter()
+                match = compiled.search(text)
+                profiler.record(base_item_name, compiled.pattern, score, time.perf_counter() - started, match is not None)
+                if match:
+                    results[base_item_name] = (match.group(1), score)
+                    break
+        return results
+
+    def scan_guarded(self, text: str, guard, fields=None, profiler=None) -> dict:
+        """
+        guard（search_guard.SearchGuard）の範囲と時間の制限つきで scan を行う。
+        項目ごとにアンカー周辺の窓だけを前から順に検索し、アンカーが無い項目は検索しない。
+        時間切れになった時点で残りの項目を打ち切り、guard に記録する。
+        """
+        results = {}
+        guard.start_mail(len(text))
+        pending = [f for f in self.field_priority if fields is None or f in fields]
+        for position, base_item_name in enumerate(pending):
+            if guard.over_budget():
+                guard.record_overflow(len(text), pending[position:])
+                break
+            windows = guard.windows(text, base_item_name)
+            for entry_index in self.field_priority[base_item_name]:
+                _, score, compiled = self.entries[entry_index]
+                started = time.perf_counter()
+                match = None
+                for start, end in windows:
+                    match = compiled.search(text, start, end)
+                    if match:
+                        break
+                if profiler is not None:
+                    profiler.record(base_item_name, compiled.pattern, score, time.perf_counter() - started, match is not None)
+                if match:
+                    results[base_item_name] = (match.group(1), score)
+                    break
+        return results
+
+
+PATTERN_BANK = PatternBank(ITEM_PATTERNS)
+PROCESS_KEYWORD_MATCHER = KeywordMatcher(PROCESS_KEYWORDS, empty_matches_all=True)
+
+# 結果行に添える「項目ごとの定義フィンガープリントとスコア」の列 (パターン変更時の部分再抽出に使う)
+FIELD_META_COLUMN = '抽出メタ情報'
+FIELD_FINGERPRINTS = {field: fingerprint[:12] for field, fingerprint in compute_field_fingerprints().items()}
+
+
+def _field_meta(scores: dict) -> str:
+    """{項目: [フィンガープリント, スコア]} の JSON 文字列を作る。"""
+    meta = {field: [fingerprint, int(scores.get(field, 0))] for field, fingerprint in FIELD_FINGERPRINTS.items()}
+    return json.dumps(meta, ensure_ascii=False, separators=(',', ':'))
+
+
+def _parse_field_meta(meta_text) -> dict:
+    """抽出メタ情報の列を読み戻す。欠損や壊れた値は空 dict（全項目を再抽出）。"""
+    try:
+        meta = json.loads(meta_text)
+    except (TypeError, ValueError):
+        return {}
+    return meta if isinstance(meta, dict) else {}
+
+
+def _result_columns(with_field_meta: bool) -> list:
+    return MASTER_COLUMNS + [FIELD_META_COLUMN] if with_field_meta else MASTER_COLUMNS
 
 
 def clean_and_normalize(value: str, item_name: str) -> str:
@@ -54,66 +187,403 @@ def clean_and_normalize(value: str, item_name: str) -> str:
     return cleaned
 
 
-def extract_skills_data(mail_data_df: pd.DataFrame) -> pd.DataFrame:
-    """メールデータDataFrameを受け取り、抽出結果と信頼度スコアを返す。"""
-    
-    # 抽出前に本文をクリーンアップ (構造崩壊防止)
-    mail_data_df['本文(テキスト形式)'] = mail_data_df['本文(テキスト形式)'].str.replace(r'[\r\n\t]', ' ', regex=True)
-    mail_data_df['本文(テキスト形式)'] = mail_data_df['本文(テキスト形式)'].str.replace(r'\s+', ' ', regex=True) 
+def _clean_and_normalize_series(values: pd.Series, item_name: str) -> pd.Series:
+    """clean_and_normalize の列単位版。値が NaN（グループ不参加）の行も 'N/A' になる。"""
+    values = values.astype(object)
+    is_blank = values.isna() | (values.str.strip() == '')
+    cleaned = values.str.strip().str.replace('\xa0', ' ', regex=False)
+    cleaned = cleaned.str.replace(r'[\s\u3000]+', ' ', regex=True).str.strip()
+
+    if item_name == '名前' or item_name == '氏名':
+        cleaned = cleaned.str.replace(r'[\(（\[【].*?[\)）\]】]', '', regex=True)
+        cleaned = cleaned.str.replace(r'[・\_]', ' ', regex=True)
+        cleaned = cleaned.str.replace(r'[-]+$', '', regex=True).str.strip()
+        cleaned = cleaned.str.replace(r'\s+', '', regex=True).str.strip()
+
+    if item_name in ['年齢', '単金']:
+        source = cleaned if item_name == '年齢' else values.str.strip()
+        digits = source.str.replace(r'[\D\.,]+', '', regex=True)
+        # 全角などの非ASCII数字は int() と同じ解釈になるよう、該当行だけ個別に変換する
+        non_ascii = ~digits.str.fullmatch(r'[0-9]*').fillna(True)
+        if non_ascii.any():
+            digits[non_ascii] = digits[non_ascii].map(lambda v: str(int(v)))
+        stripped = digits.str.lstrip('0')
+        has_digits = digits.fillna('').str.len() > 0
+
+        if item_name == '年齢':
+            short = stripped.str.len() <= 3
+            age = pd.to_numeric(stripped.where(short & (stripped != ''), '0'))
+            in_range = has_digits & short & (age >= 18) & (age <= 100)
+            result = stripped.where(in_range, 'N/A')
+        else:
+            result = (stripped + '0000').where(stripped != '', '0').where(has_digits, 'N/A')
+        return result.where(~is_blank, 'N/A')
+
+    if item_name in ['マネジメント経験人数', '人数']:
+        cleaned = cleaned.str.replace(r'[\D\.,]+', '', regex=True)
+
+    if item_name in ['スキルor言語', 'OS', 'データベース', 'フレームワーク/ライブラリ', '開発ツール']:
+        cleaned = cleaned.str.replace(r'^【\s*言\s*語\s*】|^【\s*DB\s*】|^【\s*OS\s*】', '', regex=True, flags=re.IGNORECASE)
+        cleaned = cleaned.str.strip()
+        cleaned = cleaned.str.replace(r'[・、/\\|,;]', ',', regex=True)
+        cleaned = cleaned.str.replace(r'\s*,\s*', ',', regex=True).str.strip(',')
+
+    return cleaned.where(~is_blank, 'N/A')
+
+
+def _extract_skills_data_vectorized(mail_data_df: pd.DataFrame, with_field_meta: bool = False) -> pd.DataFrame:
+    """extract_skills_data の列単位版。本文列全体に各パターンを適用し、行ごとの Python 処理を行わない。"""
+    row_count = len(mail_data_df)
+    if row_count == 0:
+        return pd.DataFrame(columns=_result_columns(with_field_meta))
+
+    texts = mail_data_df['本文(テキスト形式)'].map(str).reset_index(drop=True)
+    columns = {}
+
+    if 'EntryID' in mail_data_df.columns:
+        columns['EntryID'] = mail_data_df['EntryID'].map(str).reset_index(drop=True)
+    else:
+        columns['EntryID'] = pd.Series([f'Row_{index+1}' for index in mail_data_df.index])
+    for col in ['件名', '宛先メール']:
+        if col in mail_data_df.columns:
+            columns[col] = mail_data_df[col].reset_index(drop=True)
+        else:
+            columns[col] = pd.Series('N/A', index=texts.index)
+
+    score_columns = {}
+    for base_item_name, indexes in PATTERN_BANK.field_priority.items():
+        raw_values = pd.Series(None, index=texts.index, dtype=object)
+        scores = pd.Series(0, index=texts.index)
+        unresolved = pd.Series(True, index=texts.index)
+
+        # スコアの高いパターンから順に、未確定の行だけへ適用する
+        for entry_index in indexes:
+            if not unresolved.any():
+                break
+            _, score, compiled = PATTERN_BANK.entries[entry_index]
+            # 外側のグループでマッチの有無を、元の第1グループで抽出値を得る
+            wrapped = re.compile(f'({compiled.pattern})', compiled.flags)
+            extracted = texts[unresolved].str.extract(wrapped, expand=True)
+            matched_index = extracted.index[extracted[0].notna()]
+            raw_values[matched_index] = extracted.loc[matched_index, 1]
+            scores[matched_index] = score
+            unresolved[matched_index] = False
+
+        matched = ~unresolved
+        cleaned = pd.Series('N/A', index=texts.index, dtype=object)
+        if matched.any():
+            cleaned[matched] = _clean_and_normalize_series(raw_values[matched], base_item_name)
+        columns[base_item_name] = cleaned
+        score_columns[base_item_name] = scores
+
+    for proc_name, keywords in PROCESS_KEYWORDS.items():
+        has_keyword = texts.str.contains('|'.join(keywords), case=False, regex=True)
+        columns[f'開発工程_{proc_name}'] = has_keyword.map({True: 'あり', False: 'なし'})
+
+    for col in MASTER_COLUMNS:
+        if col not in columns:
+            columns[col] = pd.Series('なし' if col.startswith('開発工程_') else 'N/A', index=texts.index)
+
+    # 信頼度スコア: マッチした項目のスコア平均（行ごとの round と同じ丸めになるよう値単位で変換）
+    score_frame = pd.DataFrame(score_columns, index=texts.index)
+    positive = score_frame.where(score_frame > 0)
+    matched_count = positive.count(axis=1)
+    mean_scores = (positive.sum(axis=1) / matched_count.where(matched_count > 0)).fillna(0)
+    if (matched_count > 0).any():
+        mean_scores = mean_scores.map({v: round(v, 1) for v in mean_scores.unique()})
+    else:
+        mean_scores = mean_scores.astype(int)
+    columns['信頼度スコア'] = mean_scores
+    columns['本文(テキスト形式)'] = texts
+    if with_field_meta:
+        score_records = score_frame.to_dict('records')
+        columns[FIELD_META_COLUMN] = pd.Series([_field_meta(scores) for scores in score_records], index=texts.index)
+
+    df_extracted = pd.DataFrame(columns)
+    df_extracted = df_extracted.reindex(columns=_result_columns(with_field_meta), fill_value='N/A')
+
+    return df_extracted
+
+
+def _compute_fields(full_mail_text: str, fields, profiler=None, guard=None) -> dict:
+    """
+    指定された項目（抽出項目名 または '開発工程_<工程名>'）だけを本文から計算し、{項目: (値, スコア)} で返す。
+    profiler（pattern_profiler.PatternProfiler）があればパターンごとの検索時間を記録する。
+    guard（search_guard.SearchGuard）があれば検索範囲と時間を制限する。
+    """
+    computed = {}
+    item_fields = [f for f in PATTERN_BANK.field_priority if f in fields]
+    if item_fields:
+        # 項目ごとに最高スコアの抽出値だけを正規化する
+        if guard is not None:
+            scanned = PATTERN_BANK.scan_guarded(full_mail_text, guard, fields=item_fields, profiler=profiler)
+        elif profiler is None:
+            scanned = PATTERN_BANK.scan(full_mail_text, fields=item_fields)
+        else:
+            scanned = PATTERN_BANK.scan_profiled(full_mail_text, profiler, fields=item_fields)
+        for base_item_name in item_fields:
+            if base_item_name in scanned:
+                extracted_value, score = scanned[base_item_name]
+                computed[base_item_name] = (clean_and_normalize(extracted_value, base_item_name), score)
+            else:
+                computed[base_item_name] = (None, 0)
+
+    processes = [p for p in PROCESS_KEYWORDS if f'開発工程_{p}' in fields]
+    if processes:
+        started = time.perf_counter()
+        matched_processes = PROCESS_KEYWORD_MATCHER.match_groups(full_mail_text, groups=processes)
+        if profiler is not None:
+            profiler.record('開発工程', 'PROCESS_KEYWORDS', 0, time.perf_counter() - started, bool(matched_processes))
+        for proc_name in processes:
+            computed[f'開発工程_{proc_name}'] = ('あり' if proc_name in matched_processes else 'なし', 0)
+    return computed
+
 
-    all_extracted_rows = []
+def _extract_fields(full_mail_text: str, cache=None, profiler=None, guard=None) -> dict:
+    """
+    抽出項目と開発工程フラグを {項目: (値, スコア)} で返す（スコア0はマッチなし）。
+    cache（extraction_cache.ExtractionCache）があれば、定義が変わっていない項目はキャッシュから取り出す。
+    guard がある場合の結果は窓で打ち切られている可能性があるため、キャッシュには書き込まない。
+    """
+    field_results = {}
+    body_hash = None
+    if cache is not None:
+        body_hash, field_results = cache.lookup(full_mail_text)
+
+    computed = _compute_fields(full_mail_text, [f for f in FIELD_FINGERPRINTS if f not in field_results], profiler, guard)
+
+    if cache is not None and computed and guard is None:
+        cache.store(body_hash, computed)
+    field_results.update(computed)
+    return field_results
+
+
+def _extract_row(row, index, cache=None, with_field_meta: bool = False, profiler=None, guard=None) -> dict:
+    """メール1件（Series または dict）から抽出結果の1行を作る。値は文字列化前。"""
+    mail_id = str(row.get('EntryID', f'Row_{index+1}'))
+    if profiler is not None:
+        profiler.current_mail_id = mail_id
+    if guard is not None:
+        guard.current_mail_id = mail_id
+    full_mail_text = str(row.get('本文(テキスト形式)', '')) 
     
-    for index, row in mail_data_df.iterrows():
-        mail_id = str(row.get('EntryID', f'Row_{index+1}'))
-        full_mail_text = str(row.get('本文(テキスト形式)', '')) 
-        
-        full_text_for_search = full_mail_text
-        
-        extracted_data = {'EntryID': mail_id, '件名': row.get('件名', 'N/A'), '宛先メール': row.get('宛先メール', 'N/A')} 
-        reliability_scores = {} 
+    full_text_for_search = full_mail_text
+    
+    extracted_data = {'EntryID': mail_id, '件名': row.get('件名', 'N/A'), '宛先メール': row.get('宛先メール', 'N/A')} 
+    reliability_scores = {} 
+    
+    field_results = _extract_fields(full_text_for_search, cache, profiler, guard)
+    for base_item_name in PATTERN_BANK.field_priority:
+        value, score = field_results[base_item_name]
+        if score > 0:
+            extracted_data[base_item_name] = value
+            reliability_scores[base_item_name] = score
         
-        for item_key, pattern_info in ITEM_PATTERNS.items():
-            pattern = pattern_info['pattern'] 
-            base_item_name = item_key.split('_')[0]
-            
-            flags = re.IGNORECASE
-            if item_key == 'スキルor言語':
-                flags |= re.DOTALL 
+    for proc_name in PROCESS_KEYWORDS:
+        flag_col = f'開発工程_{proc_name}'
+        extracted_data[flag_col] = field_results[flag_col][0]
 
-            match = re.search(pattern, full_text_for_search, flags)
-            
-            if match:
-                extracted_value = match.group(1)
-                score = pattern_info['score']
-                
-                cleaned_val = clean_and_normalize(extracted_value, base_item_name)
-                
-                current_score = reliability_scores.get(base_item_name, 0)
-                if score > current_score:
-                    extracted_data[base_item_name] = cleaned_val
-                    reliability_scores[base_item_name] = score
-            
-        for proc_name, keywords in PROCESS_KEYWORDS.items():
-            flag_col = f'開発工程_{proc_name}'
-            extracted_data[flag_col] = 'なし' 
-            if re.search('|'.join(keywords), full_mail_text, re.IGNORECASE):
-                extracted_data[flag_col] = 'あり' 
-
-        for col in MASTER_COLUMNS:
-              if col not in extracted_data:
-                  if col.startswith('開発工程_'):
-                      extracted_data[col] = 'なし' 
-                  else:
-                      extracted_data[col] = 'N/A' 
-
-        valid_scores = [s for s in reliability_scores.values() if s > 0]
-        extracted_data['信頼度スコア'] = round(sum(valid_scores) / len(valid_scores) if valid_scores else 0, 1)
-        extracted_data['本文(テキスト形式)'] = full_mail_text 
-
-        all_extracted_rows.append(extracted_data)
+    for col in MASTER_COLUMNS:
+          if col not in extracted_data:
+              if col.startswith('開発工程_'):
+                  extracted_data[col] = 'なし' 
+              else:
+                  extracted_data[col] = 'N/A' 
+
+    valid_scores = [s for s in reliability_scores.values() if s > 0]
+    extracted_data['信頼度スコア'] = round(sum(valid_scores) / len(valid_scores) if valid_scores else 0, 1)
+    extracted_data['本文(テキスト形式)'] = full_mail_text 
+    if with_field_meta:
+        extracted_data[FIELD_META_COLUMN] = _field_meta(reliability_scores)
+
+    return extracted_data
+
+
+def _extract_skills_data_rows(mail_data_df: pd.DataFrame, with_field_meta: bool = False, cache=None, profiler=None,
+                              guard=None) -> pd.DataFrame:
+    """1行ずつ抽出する従来のエンジン。"""
+    all_extracted_rows = [
+        _extract_row(row, index, cache, with_field_meta, profiler, guard) for index, row in mail_data_df.iterrows()
+    ]
             
     df_extracted = pd.DataFrame(all_extracted_rows)
-    df_extracted = df_extracted.reindex(columns=MASTER_COLUMNS, fill_value='N/A')
+    df_extracted = df_extracted.reindex(columns=_result_columns(with_field_meta), fill_value='N/A')
+    
+    return df_extracted
+
+
+# 抽出エンジン: 文字列化前の DataFrame を返す（並列時はチャンクを結合してから文字列化する）
+EXTRACTION_ENGINES = {
+    "row": _extract_skills_data_rows,
+    "vectorized": _extract_skills_data_vectorized,
+}
+
+
+def _extract_chunk(chunk: pd.DataFrame, mode: str, with_field_meta: bool) -> pd.DataFrame:
+    """ワーカープロセスで1チャンクを抽出する（ProcessPoolExecutor から pickle 可能な関数）。"""
+    return EXTRACTION_ENGINES[mode](chunk, with_field_meta)
+
+
+def _extract_skills_data_parallel(mail_data_df: pd.DataFrame, mode: str, workers: int, with_field_meta: bool) -> pd.DataFrame:
+    """メールをチャンクに分けてプロセスプールで抽出し、元の順序で結合する。"""
+    # ワーカー数の数倍に分割し、本文の長さの偏りで一部のワーカーだけが遅れるのを防ぐ
+    chunk_count = workers * 4
+    chunk_size = -(-len(mail_data_df) // chunk_count)
+    chunks = [mail_data_df.iloc[start:start + chunk_size] for start in range(0, len(mail_data_df), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_extract_chunk, chunks, [mode] * len(chunks), [with_field_meta] * len(chunks)))
+
+    return pd.concat(results, ignore_index=True)
+
+
+def extract_skills_data(mail_data_df: pd.DataFrame, mode: str = "row", workers: int = EXTRACTION_WORKERS, cache=None,
+                        with_field_meta: bool = False, typed: bool = False, profile: bool = PATTERN_PROFILE_ENABLED,
+                        guarded: bool = GUARDED_SEARCH_ENABLED) -> pd.DataFrame:
+    """
+    メールデータDataFrameを受け取り、抽出結果と信頼度スコアを返す。
+    mode="vectorized" の場合は列単位の抽出エンジンを使う（結果は "row" と同一）。
+    workers が2以上（None は CPU 数）かつ件数が PARALLEL_MIN_RECORDS 以上の場合は、
+    プロセスプールで並列に抽出する。少件数ではプール起動の方が高くつくため直列で処理する。
+    cache（extraction_cache.ExtractionCache）を渡した場合は、キャッシュを参照しながら
+    row エンジンで直列に抽出する（SQLite 接続はプロセス間で共有できないため）。
+    with_field_meta=True の場合は、部分再抽出（reextract_changed_fields）用の FIELD_META_COLUMN 列を追加する。
+    typed=True の場合は、全列文字列ではなく result_schema の型（年齢/単金は Int64 など）で返す。
+    profile=True の場合は、パターンごとの検索時間を計測しながら row エンジンで直列に抽出し、
+    終了時に PATTERN_PROFILE_REPORT_PATH へレポートを書き出す。
+    guarded=True の場合は、巨大な本文をアンカー周辺の窓と時間上限つきで検索する（search_guard.py）。
+    row エンジンで直列に抽出し、時間超過したメールを GUARDED_SEARCH_REPORT_PATH に書き出す。
+    """
+    if mode not in EXTRACTION_ENGINES:
+        raise ValueError(f"未対応の抽出モードです: {mode}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    
+    # 抽出前に本文をクリーンアップ (構造崩壊防止)。ストリーミング抽出 (iter_extract) と同じ _normalize_body を使い、
+    # 文字列以外の本文 (None・NaN) もすべてのエンジンで同じ文字列にする
+    mail_data_df['本文(テキスト形式)'] = mail_data_df['本文(テキスト形式)'].map(_normalize_body)
+
+    if profile or guarded:
+        profiler = PatternProfiler() if profile else None
+        guard = SearchGuard() if guarded else None
+        df_extracted = _extract_skills_data_rows(mail_data_df, with_field_meta, cache, profiler, guard)
+        if profiler is not None:
+            profiler.dump(PATTERN_PROFILE_REPORT_PATH)
+        if guard is not None:
+            guard.dump(GUARDED_SEARCH_REPORT_PATH)
+    elif cache is not None:
+        df_extracted = _extract_skills_data_rows(mail_data_df, with_field_meta, cache)
+    elif workers > 1 and len(mail_data_df) >= PARALLEL_MIN_RECORDS:
+        df_extracted = _extract_skills_data_parallel(mail_data_df, mode, workers, with_field_meta)
+    else:
+        df_extracted = EXTRACTION_ENGINES[mode](mail_data_df, with_field_meta)
+
     df_extracted = df_extracted.astype(str)
+    if typed:
+        df_extracted = apply_result_schema(df_extracted)
     
-    return df_extracted
\ No newline at end of file
+    return df_extracted
+
+
+# ----------------------------------------------------
+# ストリーミング抽出: メールを1件ずつ処理し、全件を DataFrame に載せない
+# ----------------------------------------------------
+
+def _normalize_body(body) -> str:
+    """
+    本文のクリーンアップ (改行・タブ・連続する空白を1つの空白にする) を1件分行う。extract_skills_data も同じ関数で行う。
+    文字列以外は str() で文字列化する (None は 'None'、NaN は 'nan'。エンジンによって値が変わらないようにする)。
+    """
+    if not isinstance(body, str):
+        body = str(body)
+    body = re.sub(r'[\r\n\t]', ' ', body)
+    return re.sub(r'\s+', ' ', body)
+
+
+def iter_extract(records, cache=None, profiler=None, guard=None):
+    """
+    メールレコード（dict）の iterable を受け取り、抽出結果を1行ずつ dict で返すジェネレーター。
+    各行は extract_skills_data の1行と同じ列（MASTER_COLUMNS）を持ち、値は文字列化前。
+    入力はジェネレーター（例: email_processor.iter_mail_data_from_outlook）でもよく、
+    処理件数によらずメモリ使用量は一定に保たれる。cache は extract_skills_data と同じ。
+    profiler（pattern_profiler.PatternProfiler）を渡すとパターンごとの検索時間を記録する（書き出しは呼び出し元）。
+    guard（search_guard.SearchGuard）も同様に、渡すと巨大な本文の検索範囲と時間を制限する。
+    """
+    for index, record in enumerate(records):
+        row = dict(record)
+        row['本文(テキスト形式)'] = _normalize_body(record.get('本文(テキスト形式)'))
+        extracted_data = _extract_row(row, index, cache, profiler=profiler, guard=guard)
+        yield {col: extracted_data.get(col, 'N/A') for col in MASTER_COLUMNS}
+
+
+def collect_extracted(records, chunk_size: int = EXTRACTION_CHUNK_SIZE, cache=None, typed: bool = False,
+                      profile: bool = PATTERN_PROFILE_ENABLED, guarded: bool = GUARDED_SEARCH_ENABLED) -> pd.DataFrame:
+    """
+    iter_extract の結果を chunk_size 件ごとに DataFrame 化して結合する。
+    DataFrame が必要な呼び出し元向けで、結果は extract_skills_data と同じ形式（typed / profile / guarded も同じ意味）。
+    """
+    profiler = PatternProfiler() if profile else None
+    guard = SearchGuard() if guarded else None
+    chunks = []
+    rows = []
+    for extracted_row in iter_extract(records, cache, profiler, guard):
+        rows.append(extracted_row)
+        if len(rows) >= chunk_size:
+            chunks.append(pd.DataFrame(rows, columns=MASTER_COLUMNS))
+            rows = []
+    if rows or not chunks:
+        chunks.append(pd.DataFrame(rows, columns=MASTER_COLUMNS))
+
+    df_extracted = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    if profiler is not None:
+        profiler.dump(PATTERN_PROFILE_REPORT_PATH)
+    if guard is not None:
+        guard.dump(GUARDED_SEARCH_REPORT_PATH)
+    df_extracted = df_extracted.astype(str)
+    if typed:
+        df_extracted = apply_result_schema(df_extracted)
+
+    return df_extracted
+
+
+# ----------------------------------------------------
+# 部分再抽出: パターン定義が変わった項目だけを、保存済みの本文から再計算する
+# ----------------------------------------------------
+
+def reextract_changed_fields(df_results: pd.DataFrame) -> tuple:
+    """
+    抽出結果（FIELD_META_COLUMN 列と '本文(テキスト形式)' 列を含む DataFrame）を受け取り、
+    フィンガープリントが現在の定義と異なる項目だけを再抽出する。
+    メタ情報が無い行は全項目を再抽出する。(更新後の DataFrame, {項目: 再抽出した行数}) を返す。
+    """
+    df_updated = df_results.copy()
+    if FIELD_META_COLUMN not in df_updated.columns:
+        df_updated[FIELD_META_COLUMN] = ''
+    reextracted_counts = {}
+
+    for index, meta_text, body in zip(df_updated.index, df_updated[FIELD_META_COLUMN], df_updated['本文(テキスト形式)']):
+        stored_meta = _parse_field_meta(meta_text)
+        stale_fields = [
+            field for field, fingerprint in FIELD_FINGERPRINTS.items()
+            if not isinstance(stored_meta.get(field), list) or stored_meta[field][:1] != [fingerprint]
+        ]
+        if not stale_fields:
+            continue
+
+        scores = {field: stored_meta[field][1] for field in FIELD_FINGERPRINTS if field not in stale_fields}
+        computed = _compute_fields(_normalize_body(body), stale_fields)
+        for field, (value, score) in computed.items():
+            if field in df_updated.columns:
+                if field.startswith('開発工程_'):
+                    df_updated.at[index, field] = value
+                else:
+                    df_updated.at[index, field] = value if score > 0 else 'N/A'
+            scores[field] = score
+            reextracted_counts[field] = reextracted_counts.get(field, 0) + 1
+
+        valid_scores = [s for s in scores.values() if s > 0]
+        if '信頼度スコア' in df_updated.columns:
+            df_updated.at[index, '信頼度スコア'] = str(round(sum(valid_scores) / len(valid_scores) if valid_scores else 0.0, 1))
+        df_updated.at[index, FIELD_META_COLUMN] = _field_meta(scores)
+
+    return df_updated, reextracted_counts
\ No newline at end of file
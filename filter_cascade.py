@@ -0,0 +1,90 @@
+# filter_cascade.py
+# 責務: 除外キーワード (EXCLUDE_KEYWORDS) の判定を「件名 → 本文 → 添付ファイル名 → 添付ファイル内容」の順に段階的に行い、
+#       添付ファイルの保存・テキスト化 (最も重い処理) の前に対象外のメールを落とす。
+#       除外キーワードはどこか1か所に含まれれば対象外になるため、前の段階で落としても結果は変わらない。
+#       段階ごとに「判定した件数・除外した件数・かかった時間・省略できた推定時間」を集計する。
+
+import time
+
+STAGE_SUBJECT = '件名'
+STAGE_BODY = '本文'
+STAGE_ATTACHMENT_NAMES = '添付ファイル名'
+STAGE_ATTACHMENT_CONTENTS = '添付ファイル内容'
+STAGES = [STAGE_SUBJECT, STAGE_BODY, STAGE_ATTACHMENT_NAMES, STAGE_ATTACHMENT_CONTENTS]
+ATTACHMENT_STAGES = {STAGE_ATTACHMENT_NAMES, STAGE_ATTACHMENT_CONTENTS}
+
+
+class FilterCascade:
+    """
+    段階的な除外フィルタ。rejects(stage, text) が True を返したメールは、それ以降の段階を処理せずに捨てる。
+    add_cost(stage, elapsed) には、その段階の判定対象を用意するためにかかった時間
+    (本文の取得、添付ファイルの保存・テキスト化など) を記録する。省略できた時間は、
+    後の段階の1件あたりの平均コストから推定する。
+    """
+
+    def __init__(self, matcher, group: str = 'exclude'):
+        self.matcher = matcher
+        self.group = group
+        self.stats = {stage: {'checked': 0, 'rejected': 0, 'cost_sec': 0.0, 'check_sec': 0.0} for stage in STAGES}
+        # 除外時に添付ファイルがあったかどうか (True / False / None=不明) ごとの件数
+        self._rejections = {stage: {True: 0, False: 0, None: 0} for stage in STAGES}
+        self._mails_with_attachments = 0
+        self._mails_with_body = 0
+
+    def add_cost(self, stage: str, elapsed: float):
+        self.stats[stage]['cost_sec'] += elapsed
+
+    def rejects(self, stage: str, text: str, has_attachments: bool = None) -> bool:
+        """text に除外キーワードが含まれるかを判定して集計する。has_attachments は省略時間の推定に使う。"""
+        stage_stats = self.stats[stage]
+        stage_stats['checked'] += 1
+        if stage == STAGE_BODY and has_attachments is not None:
+            self._mails_with_body += 1
+            self._mails_with_attachments += int(has_attachments)
+        if stage in ATTACHMENT_STAGES:
+            has_attachments = True
+
+        started = time.perf_counter()
+        rejected = self.group in self.matcher.match_groups(text, groups=[self.group])
+        stage_stats['check_sec'] += time.perf_counter() - started
+
+        if rejected:
+            stage_stats['rejected'] += 1
+            self._rejections[stage][has_attachments] += 1
+        return rejected
+
+    def _average_cost(self, stage: str) -> float:
+        stage_stats = self.stats[stage]
+        if stage_stats['checked'] == 0:
+            return 0.0
+        return (stage_stats['cost_sec'] + stage_stats['check_sec']) / stage_stats['checked']
+
+    def saved_seconds(self, stage: str) -> float:
+        """stage で除外したメールについて、後の段階を省略したことで節約できた時間の推定値。"""
+        attachment_ratio = (self._mails_with_attachments / self._mails_with_body) if self._mails_with_body else 0.0
+        later_stages = STAGES[STAGES.index(stage) + 1:]
+        saved = 0.0
+        for has_attachments, count in self._rejections[stage].items():
+            if count == 0:
+                continue
+            for later in later_stages:
+                weight = 1.0
+                if later in ATTACHMENT_STAGES:
+                    weight = attachment_ratio if has_attachments is None else float(has_attachments)
+                saved += count * weight * self._average_cost(later)
+        return saved
+
+    def report(self) -> dict:
+        return {
+            stage: dict(self.stats[stage], saved_sec=round(self.saved_seconds(stage), 3),
+                        cost_sec=round(self.stats[stage]['cost_sec'], 3), check_sec=round(self.stats[stage]['check_sec'], 3))
+            for stage in STAGES
+        }
+
+    def summary(self) -> str:
+        """段階ごとの除外件数と省略できた推定時間を複数行の文字列で返す。"""
+        lines = ["段階フィルタ (除外キーワード):"]
+        for stage, stage_report in self.report().items():
+            lines.append(f"  {stage}: 判定 {stage_report['checked']} 件 / 除外 {stage_report['rejected']} 件 "
+                         f"(処理 {stage_report['cost_sec'] + stage_report['check_sec']:.2f} 秒, 省略 約{stage_report['saved_sec']:.2f} 秒)")
+        return "\n".join(lines)
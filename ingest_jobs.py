@@ -0,0 +1,155 @@
+# ingest_jobs.py
+# 責務: 複数のアカウント・フォルダ (共有メールボックス・サブフォルダ) を1つの取り込みジョブとしてまとめて取り込む。
+#       対象 (アカウント, フォルダ, 読み込みモード, 日数) ごとに iter_mail_data_from_outlook を別スレッドで回し
+#       (スレッドごとに独自の COM アパートメントで Outlook に接続する)、取得したレコードを1つのキューに集める。
+#       取り込み側 (呼び出し元のスレッド) は EntryID で重複を除いた1つの系列として受け取るため、
+#       抽出 (extraction_core.extract_skills_data / iter_extract) は全対象で共通の1段で済む。
+#       注意: 対象をまたいだレコードの順序は取得できた順 (対象内の順序は iter_mail_data_from_outlook と同じ)。
+
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import INGEST_TARGETS, INGEST_JOB_SPEC_PATH, INGEST_TARGET_WORKERS, INGEST_TARGET_QUEUE_SIZE
+from email_processor import iter_mail_data_from_outlook, _put_until_cancelled
+
+READ_MODES = ("all", "unprocessed", "days")
+
+_TARGET_DONE = object()
+
+# EntryID を取得できなかったメール (email_processor の 'UNKNOWN' など)。別のメールでも同じ値になるため、重複とみなさない
+_PLACEHOLDER_ENTRY_IDS = (None, '', 'UNKNOWN')
+
+
+def load_ingest_targets(path: str = INGEST_JOB_SPEC_PATH, default=INGEST_TARGETS) -> list:
+    """ジョブ定義 (JSON ファイルの対象のリスト) を読み込む。ファイルが無い場合は default (INGEST_TARGETS) を返す。"""
+    if not path or not os.path.exists(path):
+        return list(default)
+    with open(path, 'r', encoding='utf-8') as f:
+        targets = json.load(f)
+    if not isinstance(targets, list):
+        raise ValueError(f"ジョブ定義 '{path}' は取り込み対象のリストにしてください。")
+    return targets
+
+
+def normalize_ingest_targets(targets, read_mode: str = "all", days_ago: int = None) -> list:
+    """
+    取り込み対象を {'account', 'folder', 'read_mode', 'days_ago'} の dict のリストにそろえる。
+    各対象は dict または (アカウント, フォルダ[, 読み込みモード[, 日数]]) のタプル。省略した読み込みモード・日数は引数の値を使う。
+    同じアカウント・フォルダを複数回指定した場合 (差分同期の状態と処理済みマークが競合する)・未対応の読み込みモードは ValueError。
+    """
+    normalized = []
+    seen = set()
+    for target in targets:
+        spec = dict(target) if isinstance(target, dict) else dict(zip(('account', 'folder', 'read_mode', 'days_ago'), target))
+        account_name = spec.get('account')
+        folder_path = spec.get('folder')
+        if not account_name or not folder_path:
+            raise ValueError(f"取り込み対象にはアカウントとフォルダが必要です: {target}")
+        target_read_mode = spec.get('read_mode') or read_mode
+        if target_read_mode not in READ_MODES:
+            raise ValueError(f"未対応の読み込みモードです: {target_read_mode} (対象: {account_name}/{folder_path})")
+        target_days_ago = spec.get('days_ago', days_ago)
+        if (account_name, folder_path) in seen:
+            raise ValueError(f"取り込み対象が重複しています: {account_name}/{folder_path}")
+        seen.add((account_name, folder_path))
+        normalized.append({
+            'account': account_name, 'folder': folder_path, 'read_mode': target_read_mode,
+            'days_ago': int(target_days_ago) if target_days_ago is not None else None,
+        })
+    return normalized
+
+
+def _target_label(target: dict) -> str:
+    return f"{target['account']}/{target['folder']}"
+
+
+def _dedupe_key(record: dict):
+    """
+    重複の判定に使うキー (EntryID)。同じメールボックスを別の名前 (委任・共有の追加) で指定した対象から届いた同じメールを除く。
+    以降の処理 (受信日時の結合・Excel の追記・メールストア・GetItemFromID) も EntryID だけをキーにするため、同じ EntryID は1件にする。
+    EntryID を取得できなかったメールは None (重複とみなさない)。
+    """
+    entry_id = record.get('EntryID')
+    if entry_id in _PLACEHOLDER_ENTRY_IDS:
+        return None
+    return entry_id
+
+
+class IngestJob:
+    """
+    複数の対象の取り込みジョブ。iter_records() で全対象のレコードを、EntryID で重複を除いて1件ずつ返す
+    (EntryID を取得できなかったメールは除かない)。
+    targets は normalize_ingest_targets() でそろえたもの。同時に取り込む対象は workers 個まで
+    (残りの対象は先に始めた対象が終わってから始める)。
+    outlook_app は iter_mail_data_from_outlook と同じ (None の場合は各スレッドで Outlook に接続する)。
+    stats に、対象ごとの件数 (records)・重複で除いた件数 (duplicates)・取り込みに失敗した対象 (failed) を記録する。
+    1つの対象の失敗は警告を表示して他の対象を続ける (すべての対象が失敗した場合は RuntimeError)。
+    """
+
+    def __init__(self, targets: list, outlook_app=None, workers: int = INGEST_TARGET_WORKERS,
+                 queue_size: int = INGEST_TARGET_QUEUE_SIZE):
+        self.targets = targets
+        self.outlook_app = outlook_app
+        self.workers = workers
+        self.queue_size = queue_size
+        self.stats = {'records': {_target_label(target): 0 for target in targets}, 'duplicates': 0, 'failed': []}
+
+    def _run_target(self, target: dict, out_queue: queue.Queue, cancel: threading.Event):
+        """[ワーカースレッドで実行] 対象1つ分を取り込み、(対象, レコード) を out_queue に渡す。最後に (対象, _TARGET_DONE) を渡す。"""
+        records = iter_mail_data_from_outlook(target['folder'], target['account'], read_mode=target['read_mode'],
+                                              days_ago=target['days_ago'], outlook_app=self.outlook_app)
+        try:
+            for record in records:
+                if not _put_until_cancelled(out_queue, (target, record), cancel):
+                    return
+        except Exception as target_ex:
+            _put_until_cancelled(out_queue, (target, target_ex), cancel)
+        finally:
+            # 途中で止めた場合も、取得したスレッドでジェネレーターを閉じる (COM の後始末・残りの処理済みマークの書き込み)
+            records.close()
+            _put_until_cancelled(out_queue, (target, _TARGET_DONE), cancel)
+
+    def iter_records(self):
+        cancel = threading.Event()
+        out_queue = queue.Queue(maxsize=self.queue_size)
+        executor = ThreadPoolExecutor(max_workers=max(self.workers, 1), thread_name_prefix="ingest-target")
+        for target in self.targets:
+            executor.submit(self._run_target, target, out_queue, cancel)
+
+        seen_keys = set()
+        remaining = len(self.targets)
+        try:
+            while remaining:
+                target, record = out_queue.get()
+                if record is _TARGET_DONE:
+                    remaining -= 1
+                    continue
+                label = _target_label(target)
+                if isinstance(record, Exception):
+                    self.stats['failed'].append(label)
+                    print(f"警告: 取り込み対象 '{label}' の取り込みに失敗しました。他の対象は続けます。エラー: {record}")
+                    continue
+                key = _dedupe_key(record)
+                if key is not None:
+                    if key in seen_keys:
+                        self.stats['duplicates'] += 1
+                        continue
+                    seen_keys.add(key)
+                self.stats['records'][label] += 1
+                yield record
+        finally:
+            cancel.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        if self.targets and len(self.stats['failed']) == len(self.targets):
+            raise RuntimeError(f"すべての取り込み対象で取り込みに失敗しました: {', '.join(self.stats['failed'])}")
+
+    def summary(self) -> str:
+        total = sum(self.stats['records'].values())
+        lines = [f"複数対象の取り込み: {len(self.targets)} 対象 / {total} 件 (重複で除外 {self.stats['duplicates']} 件)"]
+        for label, count in self.stats['records'].items():
+            status = " ⚠️ 失敗" if label in self.stats['failed'] else ""
+            lines.append(f"  - {label}: {count} 件{status}")
+        return "\n".join(lines)
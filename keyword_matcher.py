@@ -0,0 +1,77 @@
+# keyword_matcher.py
+# 責務: キーワードグループ（必須/除外/開発工程など）を一度だけ構築し、
+#       テキスト1件に対して「どのグループがヒットしたか」を1回の走査で返す。
+
+import re
+
+# pyahocorasick があれば Aho–Corasick オートマトンで全キーワードを1パスで照合する
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+class KeywordMatcher:
+    """
+    {グループ名: [キーワード(正規表現文字列), ...]} から構築する大文字小文字無視のマッチャー。
+
+    正規表現の特殊文字を含まないキーワードはオートマトンにまとめ、テキストを1回だけ走査する。
+    pyahocorasick が無い環境では、コンパイル済みのリテラル検索をキーワードごとに行う
+    （純 Python のオートマトンは、C実装の re によるリテラル検索より遅いため使わない）。
+    特殊文字を含むキーワードは従来どおり re.search(kw, text, re.IGNORECASE) で判定する。
+    空文字のキーワードは re.search('', text) と同じく常にヒットする。
+    キーワードが空のグループは any(...) と同じくヒットしない。empty_matches_all=True の場合だけ、
+    '|'.join(キーワード) した正規表現 (空文字) と同じく常にヒット扱いにする (開発工程の判定の従来の動作)。
+    """
+
+    def __init__(self, keyword_groups: dict, empty_matches_all: bool = False):
+        self.group_names = list(keyword_groups)
+        self._always = {g for g, kws in keyword_groups.items() if '' in kws or (empty_matches_all and not kws)}
+        self._regex_keywords = []    # [(group, compiled), ...] 正規表現として評価するキーワード
+        literal_keywords = []        # [(group, keyword), ...]
+
+        for group, keywords in keyword_groups.items():
+            for keyword in keywords:
+                if not keyword:
+                    continue
+                if re.escape(keyword) == keyword:
+                    literal_keywords.append((group, keyword))
+                else:
+                    self._regex_keywords.append((group, re.compile(keyword, re.IGNORECASE)))
+
+        self._automaton = None
+        if ahocorasick is not None and literal_keywords:
+            self._automaton = ahocorasick.Automaton()
+            for group, keyword in literal_keywords:
+                key = keyword.lower()
+                groups = self._automaton.get(key) if key in self._automaton else set()
+                self._automaton.add_word(key, groups | {group})
+            self._automaton.make_automaton()
+        else:
+            self._regex_keywords = [
+                (group, re.compile(re.escape(keyword), re.IGNORECASE)) for group, keyword in literal_keywords
+            ] + self._regex_keywords
+
+    def match_groups(self, text: str, groups=None) -> set:
+        """
+        text にキーワードが1つでも含まれるグループ名の集合を返す。
+        groups を指定した場合はそのグループだけを判定し、すべて見つかった時点で走査を打ち切る。
+        """
+        wanted = set(self.group_names if groups is None else groups)
+        found = self._always & wanted
+
+        if self._automaton is not None and found != wanted:
+            for _, hit_groups in self._automaton.iter(text.lower()):
+                found |= hit_groups & wanted
+                if found == wanted:
+                    return found
+
+        for group, compiled in self._regex_keywords:
+            if group in found or group not in wanted:
+                continue
+            if compiled.search(text):
+                found.add(group)
+                if found == wanted:
+                    break
+
+        return found
@@ -0,0 +1,219 @@
+# mail_source.py
+# 責務: メールの取得元 (Outlook / ローカルの .eml ディレクトリ・mbox ファイル) を共通のインターフェースで扱う。
+#       どの取得元も get_mail_data_from_outlook_in_memory と同じ形のレコード
+#       (EntryID, 件名, 受信日時, 本文(テキスト形式), 本文(ファイル含む), Attachments) を返す。
+#       ローカルの取得元は pywin32 / Outlook が無い Linux のバッチ環境での実行・負荷試験に使う。
+#       "outlook_multi" はジョブ定義 (ingest_jobs.py) の複数のアカウント・フォルダを同時に取り込み、1つの結果にまとめる。
+
+import datetime
+import email
+import glob
+import hashlib
+import html
+import mailbox
+import os
+import re
+import time
+from datetime import timedelta
+from email import policy
+from email.utils import parsedate_to_datetime
+import pandas as pd
+from config import TARGET_FOLDER_PATH, MAIL_SOURCE_BACKEND, LOCAL_MAIL_SOURCE_PATH
+from email_processor import (
+    iter_mail_data_from_outlook, mail_records_to_dataframe, _begin_mail, _finish_in_order, _IngestContext,
+    _open_ingest_context, _close_ingest_context, PROCESSED_CATEGORY_NAME,
+)
+from filter_cascade import FilterCascade, STAGE_SUBJECT, STAGE_BODY
+from ingest_jobs import IngestJob, load_ingest_targets, normalize_ingest_targets
+
+
+class MailSource:
+    """メール取得元の共通インターフェース。iter_records() を実装する。"""
+
+    name = "base"
+
+    def iter_records(self, read_mode: str = "all", days_ago: int = None, cascade: FilterCascade = None):
+        """
+        抽出対象のメールを1件ずつ dict で返すジェネレーター。read_mode / days_ago は Outlook と同じ意味。
+        cascade (filter_cascade.FilterCascade) を渡すと、除外キーワードの段階フィルタの集計を参照できる。
+        """
+        raise NotImplementedError
+
+    def get_dataframe(self, read_mode: str = "all", days_ago: int = None) -> pd.DataFrame:
+        """全件を DataFrame で返す (get_mail_data_from_outlook_in_memory と同じ形式)。"""
+        return mail_records_to_dataframe(self.iter_records(read_mode=read_mode, days_ago=days_ago))
+
+
+class OutlookMailSource(MailSource):
+    """
+    Outlook (win32com) からメールを取得する。取得したメールには処理済みカテゴリを付ける。
+    outlook_app に outlook_recording.RecordedOutlook を渡すと、記録済みのフォルダを Outlook なしで再生する。
+    """
+
+    name = "outlook"
+
+    def __init__(self, account_name: str, folder_path: str = TARGET_FOLDER_PATH, outlook_app=None):
+        self.account_name = account_name
+        self.folder_path = folder_path
+        self.outlook_app = outlook_app
+
+    def iter_records(self, read_mode: str = "all", days_ago: int = None, cascade: FilterCascade = None):
+        return iter_mail_data_from_outlook(self.folder_path, self.account_name, read_mode=read_mode, days_ago=days_ago,
+                                           outlook_app=self.outlook_app, cascade=cascade)
+
+
+class MultiOutlookMailSource(MailSource):
+    """
+    複数のアカウント・フォルダ (ingest_jobs.py の取り込み対象) から同時にメールを取得し、EntryID で重複を除いて返す。
+    iter_records() の read_mode / days_ago は、読み込みモード・日数を指定していない対象に使う。
+    段階フィルタの集計は対象ごとに表示する (cascade は使わない)。
+    """
+
+    name = "outlook_multi"
+
+    def __init__(self, targets: list, outlook_app=None):
+        self.targets = targets
+        self.outlook_app = outlook_app
+
+    def iter_records(self, read_mode: str = "all", days_ago: int = None, cascade: FilterCascade = None):
+        job = IngestJob(normalize_ingest_targets(self.targets, read_mode, days_ago), outlook_app=self.outlook_app)
+        yield from job.iter_records()
+        print(job.summary())
+
+
+class LocalMailSource(MailSource):
+    """
+    .eml ファイルのディレクトリ (サブディレクトリを含む) または mbox ファイルからメールを取得する。
+    処理済みの判定は Keywords / X-Categories ヘッダーの処理済みカテゴリで行う。
+    ファイルは読み取り専用で扱い、処理済みカテゴリの付与 (Outlook のマーク) は行わない。
+    """
+
+    name = "local"
+
+    def __init__(self, path: str = LOCAL_MAIL_SOURCE_PATH):
+        self.path = path
+
+    def _iter_messages(self):
+        """(EntryID の代替キー, email.message.EmailMessage) を返す。"""
+        if os.path.isdir(self.path):
+            for file_path in sorted(glob.glob(os.path.join(self.path, '**', '*.eml'), recursive=True)):
+                with open(file_path, 'rb') as f:
+                    yield os.path.relpath(file_path, self.path), email.message_from_binary_file(f, policy=policy.default)
+        elif os.path.isfile(self.path):
+            mbox = mailbox.mbox(self.path, factory=lambda f: email.message_from_binary_file(f, policy=policy.default), create=False)
+            try:
+                for index, message in enumerate(mbox):
+                    yield f"{os.path.basename(self.path)}#{index}", message
+            finally:
+                mbox.close()
+        else:
+            raise RuntimeError(f"ローカルのメール取得元 '{self.path}' が見つかりませんでした。")
+
+    def iter_records(self, read_mode: str = "all", days_ago: int = None, cascade: FilterCascade = None):
+        ctx = _open_ingest_context(cascade)
+        try:
+            yield from _finish_in_order(self._iter_pending(read_mode, days_ago, ctx), ctx)
+        finally:
+            _close_ingest_context(ctx)
+
+    def _iter_pending(self, read_mode: str, days_ago: int, ctx: _IngestContext):
+        """期間・処理済み・件名の判定を通過したメールの添付ファイルをワーカーに投入し、結果待ちのメールを返す。"""
+        start_date = None
+        if (read_mode == "all" or read_mode == "days") and days_ago is not None:
+            start_date = datetime.datetime.now() - timedelta(days=days_ago)
+
+        for fallback_key, message in self._iter_messages():
+            mail_entry_id = _message_entry_id(message, fallback_key)
+            try:
+                is_processed = PROCESSED_CATEGORY_NAME in _message_categories(message)
+                if read_mode == "unprocessed" and is_processed:
+                    continue
+
+                received_time = _message_received_time(message)
+                if start_date is not None and received_time < start_date:
+                    continue
+
+                subject = str(message.get('Subject', '') or '')
+                if ctx.cascade.rejects(STAGE_SUBJECT, subject):
+                    continue
+
+                started = time.perf_counter()
+                body = _message_body(message)
+                attachments = [(part.get_filename() or 'attachment', _payload_loader(part)) for part in message.iter_attachments()]
+                ctx.cascade.add_cost(STAGE_BODY, time.perf_counter() - started)
+
+                pending = _begin_mail(mail_entry_id, subject, received_time, is_processed, body, attachments, ctx)
+            except Exception as item_ex:
+                print(f"警告: メールファイルの処理中にエラーが発生しました (EntryID: {mail_entry_id}). スキップします。エラー: {item_ex}")
+                continue
+
+            if pending is not None:
+                yield pending
+
+
+def _message_entry_id(message, fallback_key: str) -> str:
+    """Message-ID を EntryID として使う。無い場合はファイル位置から安定したIDを作る。"""
+    message_id = str(message.get('Message-ID', '') or '').strip().strip('<>')
+    if message_id:
+        return message_id
+    return hashlib.sha1(fallback_key.encode('utf-8')).hexdigest()
+
+
+def _message_categories(message) -> str:
+    headers = (message.get_all('Keywords') or []) + (message.get_all('X-Categories') or [])
+    return ", ".join(str(h) for h in headers)
+
+
+def _message_received_time(message) -> datetime.datetime:
+    """Date ヘッダーをローカル時刻 (タイムゾーンなし) に変換する。無い・壊れている場合は現在時刻 (Outlook と同じ)。"""
+    try:
+        received_time = parsedate_to_datetime(str(message.get('Date', '')))
+    except (TypeError, ValueError, IndexError):
+        return datetime.datetime.now()
+    if received_time.tzinfo is not None:
+        received_time = received_time.astimezone().replace(tzinfo=None)
+    return received_time
+
+
+def _message_body(message) -> str:
+    """本文をテキストで返す。text/plain が無い場合は text/html のタグを除いたものを使う。"""
+    body_part = message.get_body(preferencelist=('plain', 'html'))
+    if body_part is None:
+        return ""
+    try:
+        content = body_part.get_content()
+    except (LookupError, UnicodeDecodeError):
+        content = body_part.get_payload(decode=True).decode('utf-8', errors='replace')
+    if body_part.get_content_type() == 'text/html':
+        content = html.unescape(re.sub(r'<[^>]+>', ' ', content))
+    return content
+
+
+def _payload_loader(part):
+    """添付パートの内容をスプールに読み込む関数を返す (attachment_pool.AttachmentPool.submit に渡す形)。"""
+    def load(spool):
+        return spool.from_bytes(part.get_filename() or 'attachment', part.get_payload(decode=True) or b'')
+    return load
+
+
+MAIL_SOURCE_BACKENDS = {
+    "outlook": OutlookMailSource,
+    "outlook_multi": MultiOutlookMailSource,
+    "local": LocalMailSource,
+}
+
+
+def create_mail_source(backend: str = MAIL_SOURCE_BACKEND, account_name: str = None, folder_path: str = TARGET_FOLDER_PATH,
+                       local_path: str = LOCAL_MAIL_SOURCE_PATH, outlook_app=None, targets: list = None) -> MailSource:
+    """
+    設定 (MAIL_SOURCE_BACKEND) に応じたメール取得元を作る。
+    "outlook_multi" の targets を省略した場合はジョブ定義 (load_ingest_targets) を使い、それも空ならば account_name / folder_path だけを取り込む。
+    """
+    if backend not in MAIL_SOURCE_BACKENDS:
+        raise ValueError(f"未対応のメール取得元です: {backend}")
+    if backend == "local":
+        return LocalMailSource(local_path)
+    if backend == "outlook_multi":
+        targets = targets if targets is not None else load_ingest_targets()
+        return MultiOutlookMailSource(targets or [(account_name, folder_path)], outlook_app=outlook_app)
+    return OutlookMailSource(account_name, folder_path, outlook_app=outlook_app)
@@ -0,0 +1,88 @@
+# mail_store.py
+# 責務: EntryID → (本文ハッシュ, 添付ファイル名, 添付ファイルのテキスト) を SQLite に保存し、キーで1件ずつ参照する。
+#       処理済みメールを再度読み込む場合に、添付ファイルの読み込み・解析を省いてテキストを復元する。
+#       (以前は取り込みのたびに抽出結果の Excel 全体を読み込んで EntryID → テキストの辞書を作っていたため、
+#        結果ファイルが大きくなるほど開始が遅くなっていた。このストアは件数によらず参照1回分のコストで済む)
+
+import json
+import os
+import sqlite3
+import time
+from config import MAIL_STORE_PATH
+
+
+class MailStore:
+    """
+    EntryID をキーにしたメールの保存済み情報。
+
+    - lookup(): 保存済みの情報 (dict) を返す (無ければ None)
+    - store(): 添付ファイルのテキスト化が終わったメールを書き込み待ちに積む (一定件数ごとにまとめてコミット)
+    - close(): 未書き込み分を反映する
+    hits / misses / stores の件数を stats に保持する。
+    同じスレッドで生成・使用すること（sqlite3 の接続はスレッドをまたげない）。
+    """
+
+    FLUSH_EVERY = 200
+
+    def __init__(self, path: str = MAIL_STORE_PATH):
+        self.path = path
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0}
+        self._pending = {}
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS mails ("
+            " entry_id TEXT PRIMARY KEY, body_hash TEXT NOT NULL, attachment_names TEXT NOT NULL,"
+            " attachments_text TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def lookup(self, entry_id: str):
+        """{'body_hash', 'attachment_names' (リスト), 'attachments_text'} を返す。無い場合は None。"""
+        if entry_id in self._pending:
+            self.stats['hits'] += 1
+            body_hash, attachment_names, attachments_text, _ = self._pending[entry_id]
+            return {'body_hash': body_hash, 'attachment_names': json.loads(attachment_names), 'attachments_text': attachments_text}
+        row = self._conn.execute(
+            "SELECT body_hash, attachment_names, attachments_text FROM mails WHERE entry_id = ?", (entry_id,)
+        ).fetchone()
+        if row is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return {'body_hash': row[0], 'attachment_names': json.loads(row[1]), 'attachments_text': row[2]}
+
+    def store(self, entry_id: str, body_hash: str, attachment_names: list, attachments_text: str):
+        self._pending[entry_id] = (body_hash, json.dumps(attachment_names, ensure_ascii=False), attachments_text, time.time())
+        self.stats['stores'] += 1
+        if len(self._pending) >= self.FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """書き込み待ちのメールを1トランザクションで反映する。"""
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO mails (entry_id, body_hash, attachment_names, attachments_text, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(entry_id,) + values for entry_id, values in self._pending.items()],
+            )
+        self._pending = {}
+
+    def summary(self) -> str:
+        return f"メールストア: 復元 {self.stats['hits']} / 未登録 {self.stats['misses']} / 保存 {self.stats['stores']}"
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
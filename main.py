@@ -2,14 +2,19 @@
 
 import os
 import sys
+import multiprocessing
 import pandas as pd
-import win32com.client as win32 # 📌 追加: Outlook連携用
+try:
+    import win32com.client as win32 # 📌 追加: Outlook連携用
+except ImportError:
+    win32 = None # Outlook の無い環境ではローカルのメールファイルを使う
 # インポート
-from config import INPUT_QUESTION_CSV, MASTER_ANSWERS_PATH, OUTPUT_EVAL_PATH, NUM_RECORDS
+from config import INPUT_QUESTION_CSV, MASTER_ANSWERS_PATH, OUTPUT_EVAL_PATH, NUM_RECORDS, TARGET_FOLDER_PATH, LOCAL_MAIL_SOURCE_PATH
 from data_generation import generate_raw_data, export_dataframes_to_tsv
-from extraction_core import extract_skills_data
+from extraction_core import extract_skills_data, reextract_changed_fields
 from evaluator_core import run_triple_csv_validation, get_question_data_from_csv
-from email_processor import run_email_extraction, get_mail_data_from_outlook_in_memory, TARGET_FOLDER_PATH
+from email_processor import run_email_extraction, OUTPUT_FILENAME
+from mail_source import create_mail_source
 
 
 # ----------------------------------------------------
@@ -109,6 +114,7 @@ def main_process_exam_mode():
     print("\n--- 試験データの選択 ---")
     print(" [1] ダミーデータ生成 (デフォルト): 新規データを作成しCSVから読み込み")
     print(" [2] Outlookメールから読み込み: 実際のメールデータを使用")
+    print(" [3] ローカルのメールファイルから読み込み: .eml ディレクトリまたは mbox ファイル (Outlook不要)")
     
     data_source_input = input("データソースを選択してください ([1]で実行): ").strip()
     df_mail_data = pd.DataFrame()
@@ -122,7 +128,12 @@ def main_process_exam_mode():
     elif data_source_input == '2':
         print("\n→ Outlookからの読み込みを開始します。")
         target_email = input("✅ 対象アカウントのメールアドレスを入力してください: ").strip()
-        df_mail_data = get_mail_data_from_outlook_in_memory(TARGET_FOLDER_PATH, target_email)
+        df_mail_data = create_mail_source("outlook", account_name=target_email, folder_path=TARGET_FOLDER_PATH).get_dataframe()
+    
+    elif data_source_input == '3':
+        local_path = input(f"✅ メールファイルのパスを入力してください (空欄で {LOCAL_MAIL_SOURCE_PATH}): ").strip() or LOCAL_MAIL_SOURCE_PATH
+        print(f"\n→ ローカルのメールファイル '{local_path}' からの読み込みを開始します。")
+        df_mail_data = create_mail_source("local", local_path=local_path).get_dataframe()
     
     else:
         print(f"\n無効な入力 '{data_source_input}' です。終了します。")
@@ -141,6 +152,27 @@ def main_process_exam_mode():
     print("\n💡 処理が完了しました。")
 
 
+def main_process_reextraction_mode():
+    """抽出結果ファイルのうち、パターン定義が変わった項目だけを保存済みの本文から再抽出して上書きする。"""
+    output_file_abs_path = os.path.abspath(OUTPUT_FILENAME)
+    if not os.path.exists(output_file_abs_path):
+        print(f"❌ 抽出結果ファイル '{OUTPUT_FILENAME}' が見つかりません。先に抽出を実行してください。")
+        return
+
+    df_results = pd.read_excel(output_file_abs_path, dtype=str)
+    print(f"✅ 抽出結果から {len(df_results)} 件のデータを読み込みました。")
+
+    df_updated, reextracted_counts = reextract_changed_fields(df_results)
+    if not reextracted_counts:
+        print("💡 パターン定義の変更はありません。再抽出は不要です。")
+        return
+
+    for field, count in reextracted_counts.items():
+        print(f"  - {field}: {count} 件を再抽出")
+    df_updated.to_excel(output_file_abs_path, index=False)
+    print(f"✨ 再抽出結果を '{OUTPUT_FILENAME}' に上書きしました。")
+
+
 def main_dispatcher():
     """実行モードをユーザーに問い合わせ、処理を分岐させ、最後にテストを実行する。"""
     
@@ -148,6 +180,7 @@ def main_dispatcher():
     print(" 実行モードを選択してください:")
     print(" [1] 試験モード (デフォルト): ダミーデータ生成と評価を実施")
     print(" [2] メールテストモード: Outlookからメールを取得し、抽出結果をXLSXに出力")
+    print(" [3] 部分再抽出モード: パターンを変更した項目だけを抽出結果XLSXの本文から再抽出")
     print("==================================================")
     
     try:
@@ -163,6 +196,10 @@ def main_dispatcher():
             target_email = input("✅ 対象アカウントのメールアドレスを入力してください (例: user@example.com): ").strip()
             run_email_extraction(target_email)
             
+        elif mode_input == '3':
+            print("\n→ 部分再抽出モードを開始します。")
+            main_process_reextraction_mode()
+            
         else:
             print(f"\n無効な入力 '{mode_input}' です。処理を終了します。")
             
@@ -177,4 +214,6 @@ def main_dispatcher():
 
 
 if __name__ == "__main__":
+    # exe化した場合でも抽出の並列処理 (ProcessPoolExecutor) を起動できるようにする
+    multiprocessing.freeze_support()
     main_dispatcher()
\ No newline at end of file
@@ -2,6 +2,7 @@
 
 import os
 import sys
+import multiprocessing
 import pandas as pd
 import win32com.client as win32
 import threading 
@@ -20,13 +21,17 @@ import gui_search_window # 📌 Appクラスをインポートするために使
 import utils 
 
 # 既存の内部処理関数をインポート
-from config import INPUT_QUESTION_CSV, MASTER_ANSWERS_PATH, OUTPUT_EVAL_PATH, NUM_RECORDS, TARGET_FOLDER_PATH, SCRIPT_DIR
+from config import INPUT_QUESTION_CSV, MASTER_ANSWERS_PATH, OUTPUT_EVAL_PATH, NUM_RECORDS, TARGET_FOLDER_PATH, SCRIPT_DIR, USE_EXTRACTION_CACHE
+from config import MAIL_SOURCE_BACKEND
+from mail_source import create_mail_source
 from extraction_core import extract_skills_data
+from result_schema import apply_result_schema
+from extraction_cache import ExtractionCache
 from evaluator_core import run_triple_csv_validation, get_question_data_from_csv
 # 📌 修正1: OUTPUT_FILENAME を config からエイリアスとしてインポート
 # ✅ 修正後 (email_processor.py の XLSX ファイルを参照)
-from email_processor import get_mail_data_from_outlook_in_memory, OUTPUT_FILENAME 
-from email_processor import has_unprocessed_mail 
+from email_processor import OUTPUT_FILENAME 
+from email_processor import count_unprocessed_mail 
 from email_processor import remove_processed_category, PROCESSED_CATEGORY_NAME
 # ----------------------------------------------------
 # ユーティリティ関数群 (Outlook連携、DF処理)
@@ -98,15 +103,12 @@ def actual_run_extraction_logic(root, main_elements, target_email, folder_path,
                 return
 
         mode_text = {"all": "全て", "unprocessed": "未処理のみ", "days": f"過去{days_ago}日"}.get(read_mode, "全て")
-        status_label.config(text=f"状態: {target_email} アカウントからメール取得中 ({mode_text})...")
+        source_text = "ジョブ定義の複数の対象" if MAIL_SOURCE_BACKEND == "outlook_multi" else f"{target_email} アカウント"
+        status_label.config(text=f"状態: {source_text}からメール取得中 ({mode_text})...")
         
-        # 読み込みモードと日数を渡す
-        df_mail_data = get_mail_data_from_outlook_in_memory(
-            folder_path, 
-            target_email, 
-            read_mode=read_mode, 
-            days_ago=days_ago 
-        )
+        # 読み込みモードと日数を渡す (取得元は MAIL_SOURCE_BACKEND: Outlook またはローカルのメールファイル)
+        mail_source = create_mail_source(MAIL_SOURCE_BACKEND, account_name=target_email, folder_path=folder_path)
+        df_mail_data = mail_source.get_dataframe(read_mode=read_mode, days_ago=days_ago)
         
         if df_mail_data.empty:
             status_label.config(text="状態: 処理対象のメールがありませんでした。")
@@ -116,7 +118,13 @@ def actual_run_extraction_logic(root, main_elements, target_email, folder_path,
         # main_application.py の actual_run_extraction_logic 関数内 (修正箇所)
 
         status_label.config(text="状態: 抽出コアロジック実行中...")
-        df_extracted = extract_skills_data(df_mail_data)
+        if USE_EXTRACTION_CACHE:
+            # 再送された同一本文は、パターンが変わっていない項目をキャッシュから復元する
+            with ExtractionCache() as extraction_cache:
+                df_extracted = extract_skills_data(df_mail_data, cache=extraction_cache, with_field_meta=True)
+            print(extraction_cache.summary())
+        else:
+            df_extracted = extract_skills_data(df_mail_data, with_field_meta=True)
         
         # Excel出力処理の準備
         DATE_COLUMN = '受信日時'
@@ -149,7 +157,7 @@ def actual_run_extraction_logic(root, main_elements, target_email, folder_path,
         
         # 受信日時カラムを保護しつつ、他の文字列をエスケープ
         for col in df_output.columns:
-            if col != DATE_COLUMN and df_output[col].dtype == object:
+            if col != DATE_COLUMN and pd.api.types.is_string_dtype(df_output[col]):
                 df_output[col] = df_output[col].str.replace(r'^=', r"'=", regex=True)
                 
         # ----------------------------------------------------
@@ -190,9 +198,11 @@ def actual_run_extraction_logic(root, main_elements, target_email, folder_path,
         # 最終調整と書き出し
         # ----------------------------------------------------
         
+        # 既存の結果 (Excel から文字列で読み込んだもの) と結合した後に、列の型をそろえる (年齢/単金は Int64 など)
+        df_final = apply_result_schema(df_final)
+
         # 日時でソート
         if DATE_COLUMN in df_final.columns:
-            df_final[DATE_COLUMN] = pd.to_datetime(df_final[DATE_COLUMN], errors='coerce')
             df_final = df_final.sort_values(by=DATE_COLUMN, ascending=False).reset_index(drop=True)
         
         # 📌 修正5: 最後に EntryID と EntryID_temp を削除
@@ -567,7 +577,7 @@ def main():
         output_path_exists = os.path.exists(output_file_abs_path)
         
         try:
-            unprocessed_count = has_unprocessed_mail(folder_path, account_email)
+            unprocessed_count = count_unprocessed_mail(folder_path, account_email)
             
             if unprocessed_count > 0:
                 final_message = f"状態: {unprocessed_count}件の新規未処理メールがあります"
@@ -611,5 +621,7 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # exe化した場合でも抽出の並列処理 (ProcessPoolExecutor) を起動できるようにする
+    multiprocessing.freeze_support()
     main()
     
\ No newline at end of file
@@ -0,0 +1,332 @@
+# outlook_recording.py
+# 責務: Outlook (win32com) の代わりに使える、記録済みデータを再生するスタンドイン。
+#       email_processor の Outlook 経路 (Items の走査 / Folder.GetTable / GetItemFromID / カテゴリ付与) を
+#       Outlook なしで実行でき、COM 呼び出し回数を stats に数えるため、取得方法ごとの往復回数を比較できる。
+#       Restrict / GetTable の条件は、DASL ("@SQL=...") の場合だけ dasl_query.py で評価する (Jet 形式の条件は評価しない)。
+#
+# 使い方:
+#   outlook = load_recording('recorded_inbox.json')
+#   records = list(iter_mail_data_from_outlook('受信トレイ', outlook.account_name, outlook_app=outlook))
+#   print(outlook.stats)
+#   # 実際のフォルダを記録する (Windows + Outlook 環境で実行)
+#   record_outlook_folder('user@example.com', '受信トレイ', 'recorded_inbox.json', limit=1000)
+
+import base64
+import datetime
+import json
+import os
+from dasl_query import (compile_query, DASL_PREFIX, PROP_SUBJECT, PROP_BODY, PROP_HAS_ATTACHMENT,
+                        PROP_CATEGORIES, PROP_MESSAGE_CLASS)
+
+
+def _new_stats() -> dict:
+    return {'com_calls': 0, 'item_fetches': 0, 'table_batches': 0, 'saves': 0}
+
+
+class _RecordedComObject:
+    """記録済みプロパティを返し、読み書きを COM 呼び出し1回として数える共通部分。"""
+
+    def __init__(self, stats: dict, props: dict):
+        object.__setattr__(self, '_stats', stats)
+        object.__setattr__(self, '_props', props)
+
+    def __getattr__(self, name):
+        props = object.__getattribute__(self, '_props')
+        if name not in props:
+            raise AttributeError(name)
+        object.__getattribute__(self, '_stats')['com_calls'] += 1
+        return props[name]
+
+    def __setattr__(self, name, value):
+        self._stats['com_calls'] += 1
+        self._props[name] = value
+
+
+class _RecordedPropertyAccessor:
+    """Attachment.PropertyAccessor の代わり。PR_ATTACH_DATA_BIN (添付ファイルの内容) だけを返す。"""
+
+    PR_ATTACH_DATA_BIN = "http://schemas.microsoft.com/mapi/proptag/0x37010102"
+
+    def __init__(self, stats: dict, content: bytes):
+        self._stats = stats
+        self._content = content
+
+    def GetProperty(self, schema_name: str):
+        self._stats['com_calls'] += 1
+        if schema_name != self.PR_ATTACH_DATA_BIN:
+            raise KeyError(f"記録されていないプロパティです: {schema_name}")
+        return self._content
+
+
+class RecordedAttachment(_RecordedComObject):
+    def __init__(self, stats: dict, file_name: str, content: bytes):
+        super().__init__(stats, {'FileName': file_name, 'Size': len(content),
+                                 'PropertyAccessor': _RecordedPropertyAccessor(stats, content)})
+        object.__setattr__(self, '_content', content)
+
+    def SaveAsFile(self, path: str):
+        self._stats['com_calls'] += 1
+        with open(path, 'wb') as f:
+            f.write(self._content)
+
+
+class RecordedAttachments(_RecordedComObject):
+    def __init__(self, stats: dict, attachments: list):
+        super().__init__(stats, {'Count': len(attachments)})
+        object.__setattr__(self, '_attachments', attachments)
+
+    def __iter__(self):
+        self._stats['com_calls'] += 1
+        return iter(self._attachments)
+
+    def Item(self, index: int):
+        self._stats['com_calls'] += 1
+        return self._attachments[index - 1] # COM のコレクションは1始まり
+
+
+class RecordedMailItem(_RecordedComObject):
+    def Save(self):
+        self._stats['com_calls'] += 1
+        self._stats['saves'] += 1
+
+
+def _dasl_property(item: RecordedMailItem, schema_name: str):
+    """DASL 条件の評価用に、アイテムのプロパティを返す (Outlook 側の評価のため COM 呼び出しには数えない)。"""
+    props = item._props
+    if schema_name == PROP_SUBJECT:
+        return props.get('Subject', '')
+    if schema_name == PROP_BODY:
+        return props.get('Body', '')
+    if schema_name == PROP_HAS_ATTACHMENT:
+        return len(props['Attachments']._attachments) > 0
+    if schema_name == PROP_CATEGORIES:
+        return [category.strip() for category in str(props.get('Categories') or '').split(',')]
+    if schema_name == PROP_MESSAGE_CLASS:
+        return props.get('MessageClass', '')
+    raise KeyError(f"記録されていないプロパティです: {schema_name}")
+
+
+def _restrict_items(items: list, query: str) -> list:
+    """DASL 条件に一致するアイテムだけを返す。Jet 形式の条件は評価せず、全件を返す (呼び出し側の再判定で絞り込まれる)。"""
+    if not query or not query.startswith(DASL_PREFIX):
+        return items
+    condition = compile_query(query, _dasl_property)
+    return [item for item in items if condition(item)]
+
+
+class RecordedItems:
+    """Folder.Items の代わり。Restrict の条件は DASL の場合だけ評価する (Jet 形式の場合は全件を返す)。"""
+
+    def __init__(self, stats: dict, items: list):
+        self._stats = stats
+        self._items = items
+
+    @property
+    def Count(self):
+        self._stats['com_calls'] += 1
+        return len(self._items)
+
+    def __iter__(self):
+        for item in self._items:
+            self._stats['com_calls'] += 1 # 次のアイテムの取得
+            yield item
+
+    def Sort(self, *args):
+        self._stats['com_calls'] += 1
+
+    def Restrict(self, query: str):
+        self._stats['com_calls'] += 1
+        return RecordedItems(self._stats, _restrict_items(self._items, query))
+
+
+class _RecordedColumns:
+    def __init__(self, table):
+        self._table = table
+
+    def RemoveAll(self):
+        self._table._stats['com_calls'] += 1
+        self._table._columns = []
+
+    def Add(self, name: str):
+        self._table._stats['com_calls'] += 1
+        self._table._columns.append(name)
+
+
+class RecordedTable:
+    """Folder.GetTable の戻り値の代わり。GetArray 1回を COM 呼び出し1回として数える。"""
+
+    def __init__(self, stats: dict, items: list):
+        self._stats = stats
+        self._items = items
+        self._position = 0
+        self._columns = ['EntryID', 'Subject', 'CreationTime', 'LastModificationTime', 'MessageClass']
+        self.Columns = _RecordedColumns(self)
+
+    @property
+    def EndOfTable(self):
+        self._stats['com_calls'] += 1
+        return self._position >= len(self._items)
+
+    def GetArray(self, max_rows: int):
+        self._stats['com_calls'] += 1
+        self._stats['table_batches'] += 1
+        batch = self._items[self._position:self._position + max_rows]
+        self._position += len(batch)
+        return tuple(tuple(item._props.get(column) for column in self._columns) for item in batch)
+
+    def GetRowCount(self):
+        self._stats['com_calls'] += 1
+        return len(self._items) - self._position
+
+    def GetNextRow(self):
+        rows = self.GetArray(1)
+        return dict(zip(self._columns, rows[0])) if rows else None
+
+    def Restrict(self, query: str):
+        self._stats['com_calls'] += 1
+        return RecordedTable(self._stats, _restrict_items(self._items[self._position:], query))
+
+
+class RecordedFolder:
+    def __init__(self, stats: dict, name: str, items: list):
+        self._stats = stats
+        self.Name = name
+        self._items = items
+
+    @property
+    def Items(self):
+        self._stats['com_calls'] += 1
+        return RecordedItems(self._stats, self._items)
+
+    def GetTable(self, filter_query: str = "", table_contents: int = 0):
+        """Restrict と同じく、条件は DASL の場合だけ評価する。"""
+        self._stats['com_calls'] += 1
+        return RecordedTable(self._stats, _restrict_items(self._items, filter_query))
+
+
+class _RecordedStore:
+    def __init__(self, folders: dict):
+        self.Folders = folders
+
+
+class RecordedNamespace:
+    def __init__(self, stats: dict, account_name: str, folder: RecordedFolder):
+        self._stats = stats
+        self.Folders = {account_name: _RecordedStore({folder.Name: folder})}
+        self._items_by_id = {item._props['EntryID']: item for item in folder._items}
+
+    def GetItemFromID(self, entry_id: str, store_id=None):
+        self._stats['com_calls'] += 1
+        self._stats['item_fetches'] += 1
+        if entry_id not in self._items_by_id:
+            raise KeyError(f"EntryID が見つかりません: {entry_id}")
+        return self._items_by_id[entry_id]
+
+
+class RecordedOutlook:
+    """Outlook.Application の代わり。GetNamespace("MAPI") で記録済みフォルダを持つ名前空間を返す。"""
+
+    def __init__(self, account_name: str, folder_path: str, records: list):
+        self.account_name = account_name
+        self.folder_path = folder_path
+        self.stats = _new_stats()
+        items = [_build_item(self.stats, record) for record in records]
+        self._namespace = RecordedNamespace(self.stats, account_name, RecordedFolder(self.stats, folder_path, items))
+
+    def GetNamespace(self, name: str):
+        return self._namespace
+
+    def reset_stats(self):
+        for key in self.stats:
+            self.stats[key] = 0
+
+    def categories_by_entry_id(self) -> dict:
+        """現在のカテゴリ (処理済みマークの確認用) を {EntryID: カテゴリ} で返す。"""
+        folder = self._namespace.Folders[self.account_name].Folders[self.folder_path]
+        return {item._props['EntryID']: item._props.get('Categories', '') for item in folder._items}
+
+
+def _build_item(stats: dict, record: dict) -> RecordedMailItem:
+    attachments = [
+        RecordedAttachment(stats, att['FileName'], base64.b64decode(att.get('content_b64', '')))
+        for att in record.get('Attachments', [])
+    ]
+    received_time = record.get('ReceivedTime')
+    if isinstance(received_time, str):
+        received_time = datetime.datetime.fromisoformat(received_time)
+    props = {
+        'Class': record.get('Class', 43),
+        'MessageClass': record.get('MessageClass', 'IPM.Note'),
+        'EntryID': record['EntryID'],
+        'Subject': record.get('Subject', ''),
+        'Body': record.get('Body', ''),
+        'Categories': record.get('Categories', ''),
+        'ReceivedTime': received_time,
+        'Attachments': RecordedAttachments(stats, attachments),
+    }
+    return RecordedMailItem(stats, props)
+
+
+def load_recording(path: str) -> RecordedOutlook:
+    """record_outlook_folder / save_recording で保存した JSON からスタンドインを作る。"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return RecordedOutlook(data['account_name'], data['folder_path'], data['items'])
+
+
+def save_recording(path: str, account_name: str, folder_path: str, records: list):
+    """
+    メールの記録 (dict のリスト) を JSON で保存する。各レコードのキーは
+    EntryID, Subject, Body, Categories, ReceivedTime (datetime または ISO 文字列), MessageClass, Class,
+    Attachments ([{'FileName', 'content_b64'}]) 。
+    """
+    items = []
+    for record in records:
+        item = dict(record)
+        if isinstance(item.get('ReceivedTime'), datetime.datetime):
+            item['ReceivedTime'] = item['ReceivedTime'].replace(tzinfo=None).isoformat()
+        items.append(item)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'account_name': account_name, 'folder_path': folder_path, 'items': items}, f, ensure_ascii=False)
+
+
+def record_outlook_folder(account_name: str, folder_path: str, path: str, limit: int = None, with_attachments: bool = True) -> int:
+    """実際の Outlook フォルダの内容を記録する (Windows + Outlook 環境で実行)。記録した件数を返す。"""
+    import tempfile
+    import pythoncom
+    from email_processor import _connect_outlook_namespace, get_outlook_folder
+
+    pythoncom.CoInitialize()
+    try:
+        folder = get_outlook_folder(_connect_outlook_namespace(), account_name, folder_path)
+        if folder is None:
+            raise RuntimeError(f"指定されたフォルダパス '{folder_path}' が見つかりませんでした。")
+
+        records = []
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for item in folder.Items:
+                if limit is not None and len(records) >= limit:
+                    break
+                attachments = []
+                if with_attachments and item.Class == 43:
+                    for index, attachment in enumerate(item.Attachments):
+                        temp_path = os.path.join(temp_dir, f"{index}.bin")
+                        attachment.SaveAsFile(temp_path)
+                        with open(temp_path, 'rb') as f:
+                            attachments.append({'FileName': attachment.FileName,
+                                                'content_b64': base64.b64encode(f.read()).decode('ascii')})
+                records.append({
+                    'EntryID': str(item.EntryID),
+                    'Class': item.Class,
+                    'MessageClass': str(getattr(item, 'MessageClass', '')),
+                    'Subject': str(getattr(item, 'Subject', '')),
+                    'Body': str(getattr(item, 'Body', '')),
+                    'Categories': str(getattr(item, 'Categories', '') or ''),
+                    'ReceivedTime': getattr(item, 'ReceivedTime', None),
+                    'Attachments': attachments,
+                })
+        save_recording(path, account_name, folder_path, records)
+        return len(records)
+    finally:
+        pythoncom.CoUninitialize()
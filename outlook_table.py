@@ -0,0 +1,54 @@
+# outlook_table.py
+# 責務: Outlook の Folder.GetTable で、必要な列 (EntryID・件名・受信日時・カテゴリ等) をまとめて取得する。
+#       Items を1件ずつ getattr すると「1プロパティ = 1回の COM 呼び出し」になるが、
+#       Table.GetArray は数百行分の列を1回の呼び出しで返すため、大きなフォルダの走査が大幅に速くなる。
+#       本文 (Body) と添付は Table の列にできないため、呼び出し側で必要な行だけ GetItemFromID で取得する。
+
+from config import OUTLOOK_TABLE_BATCH_SIZE
+
+OL_USER_ITEMS = 0 # OlTableContents.olUserItems
+
+# 取り込み処理で使う列 (明示的な組み込みプロパティ名で指定すると、日時はローカル時刻で返る)
+TABLE_COLUMNS = ['EntryID', 'Subject', 'ReceivedTime', 'Categories', 'MessageClass']
+
+
+def open_table(folder, filter_query="", columns=TABLE_COLUMNS, fallback: bool = True):
+    """
+    列を columns だけに絞った Table を返す。filter_query (Restrict と同じ書式) の解釈に失敗した場合は、
+    絞り込みなしの Table にフォールバックする (呼び出し側で同じ条件を再判定すること)。
+    filter_query に条件のリストを渡すと、先頭の条件で GetTable し、残りを Table.Restrict で順に絞り込む
+    (Jet 形式と DASL の条件は1つの文字列に混ぜられないため)。失敗した条件は飛ばす。
+    fallback=False の場合は、絞り込みの失敗をそのまま例外として送出する (行を再判定せずに GetRowCount で数える場合など)。
+    """
+    filter_queries = [filter_query] if isinstance(filter_query, str) else list(filter_query)
+    filter_queries = [query for query in filter_queries if query]
+    try:
+        table = folder.GetTable(filter_queries[0], OL_USER_ITEMS) if filter_queries else folder.GetTable()
+    except Exception as table_error:
+        if not fallback:
+            raise
+        print(f"警告: Outlookの絞り込み(GetTable)に失敗しました: {table_error}")
+        table = folder.GetTable()
+    for query in filter_queries[1:]:
+        try:
+            table = table.Restrict(query)
+        except Exception as restrict_error:
+            if not fallback:
+                raise
+            print(f"警告: Outlookの絞り込み(Table.Restrict)に失敗しました: {restrict_error}")
+
+    table.Columns.RemoveAll()
+    for column in columns:
+        table.Columns.Add(column)
+    return table
+
+
+def iter_table_rows(folder, filter_query="", columns=TABLE_COLUMNS, batch_size: int = OUTLOOK_TABLE_BATCH_SIZE):
+    """Table の行を {列名: 値} の dict で1行ずつ返す。内部では batch_size 行ごとに GetArray で取得する。"""
+    table = open_table(folder, filter_query, columns)
+    while not table.EndOfTable:
+        rows = table.GetArray(batch_size)
+        if not rows:
+            break
+        for values in rows:
+            yield dict(zip(columns, values))
@@ -0,0 +1,81 @@
+# pattern_profiler.py
+# 責務: ITEM_PATTERNS の各パターンについて、累積検索時間・呼び出し回数・マッチ数・遅かったメールを記録し、
+#       抽出1回ごとにレポート (JSON) として書き出す。
+#       無効時は extraction_core が計測なしの PatternBank.scan を使うため、オーバーヘッドは発生しない。
+
+import heapq
+import json
+import os
+import time
+
+SLOWEST_MAILS_PER_PATTERN = 5 # パターンごとに保持する「遅かったメール」の件数
+
+
+class PatternProfiler:
+    """
+    パターン単位の計測結果を集計するクラス。
+    record() はパターン1回の検索ごとに呼ばれ、current_mail_id のメールとして記録する。
+    """
+
+    def __init__(self):
+        self.current_mail_id = None
+        self._stats = {}  # (項目名, パターン文字列) -> 集計 dict
+        self._started = time.perf_counter()
+
+    def record(self, field: str, pattern: str, score, elapsed: float, matched: bool):
+        key = (field, pattern)
+        stat = self._stats.get(key)
+        if stat is None:
+            stat = {'field': field, 'pattern': pattern, 'score': score,
+                    'calls': 0, 'matches': 0, 'total_time': 0.0, 'slowest': []}
+            self._stats[key] = stat
+        stat['calls'] += 1
+        stat['total_time'] += elapsed
+        if matched:
+            stat['matches'] += 1
+
+        # 遅い順の上位だけを最小ヒープで保持する
+        entry = (elapsed, str(self.current_mail_id))
+        if len(stat['slowest']) < SLOWEST_MAILS_PER_PATTERN:
+            heapq.heappush(stat['slowest'], entry)
+        elif elapsed > stat['slowest'][0][0]:
+            heapq.heapreplace(stat['slowest'], entry)
+
+    def report(self) -> dict:
+        """累積時間の長い順に並べたレポートを返す。"""
+        patterns = []
+        for stat in sorted(self._stats.values(), key=lambda s: -s['total_time']):
+            patterns.append({
+                'field': stat['field'],
+                'pattern': stat['pattern'],
+                'score': stat['score'],
+                'calls': stat['calls'],
+                'matches': stat['matches'],
+                'hit_rate': round(stat['matches'] / stat['calls'], 4) if stat['calls'] else 0,
+                'total_ms': round(stat['total_time'] * 1000, 3),
+                'avg_us': round(stat['total_time'] / stat['calls'] * 1e6, 2) if stat['calls'] else 0,
+                'slowest_mails': [
+                    {'mail_id': mail_id, 'ms': round(elapsed * 1000, 3)}
+                    for elapsed, mail_id in sorted(stat['slowest'], reverse=True)
+                ],
+            })
+        return {
+            'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'wall_time_sec': round(time.perf_counter() - self._started, 3),
+            'patterns': patterns,
+            'never_matched': [p['pattern'] for p in patterns if p['calls'] and p['matches'] == 0],
+        }
+
+    def dump(self, path: str, top_n: int = 5) -> dict:
+        """レポートを JSON で書き出し、遅いパターンの上位と未マッチ件数をコンソールに表示する。"""
+        report = self.report()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        print(f"📊 パターン計測レポートを出力しました: {path}")
+        for p in report['patterns'][:top_n]:
+            print(f"  {p['total_ms']:>10.1f} ms  {p['calls']:>7} 回  ヒット率 {p['hit_rate']*100:5.1f}%  [{p['field']}] {p['pattern'][:60]}")
+        if report['never_matched']:
+            print(f"  ⚠️ 一度もマッチしなかったパターン: {len(report['never_matched'])} 件")
+        return report
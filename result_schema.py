@@ -0,0 +1,68 @@
+# result_schema.py
+# 責務: 抽出結果の列型（スキーマ）を一か所で定義し、抽出・Excel出力・検索画面で共有する。
+#       年齢/単金を文字列のまま持ち回り、検索のたびに pd.to_numeric で解析し直すのを防ぐ。
+
+import pandas as pd
+
+# pyarrow があれば本文などの長い文字列を Arrow 形式で保持する (メモリ削減)
+try:
+    import pyarrow  # noqa: F401
+    TEXT_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    TEXT_DTYPE = pd.StringDtype("python")
+
+INT_COLUMNS = ['年齢', '単金', '単価'] # '単価' は検索画面でのリネーム後の列名
+FLOAT_COLUMNS = ['信頼度スコア']
+DATE_COLUMNS = ['受信日時']
+TEXT_COLUMNS = ['本文(テキスト形式)', '本文(ファイル含む)', '本文', '添付ファイル内容']
+FLAG_PREFIX = '開発工程_'
+FLAG_VALUES = ['なし', 'あり'] # Excel上の表示（あり/なし）を保ったままカテゴリ型で保持
+
+
+def _flag_dtype(values: pd.Series, col: str) -> pd.CategoricalDtype:
+    """
+    開発工程フラグのカテゴリ型。あり/なし 以外の値 (手で編集した Excel など) もカテゴリに加え、NaN にせずに保持する。
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        observed = list(values.dtype.categories)
+    else:
+        observed = list(values.dropna().unique())
+        unexpected = [value for value in observed if value not in FLAG_VALUES]
+        if unexpected:
+            print(f"警告: 列 '{col}' に あり/なし 以外の値があります (そのまま保持します): {unexpected[:5]}")
+    return pd.CategoricalDtype(FLAG_VALUES + [value for value in observed if value not in FLAG_VALUES])
+
+
+def apply_result_schema(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    抽出結果の DataFrame をスキーマどおりの型に変換した新しい DataFrame を返す。
+    - 年齢/単金: nullable int (Int64)。'N/A' や数値でない値は <NA>
+    - 開発工程_*: あり/なし のカテゴリ型 (それ以外の値は警告を表示し、カテゴリに加えて保持する)
+    - 受信日時: datetime64 (解析できない値は NaT)
+    - 本文系: 文字列型 (pyarrow があれば Arrow)
+    列が存在しない場合は何もしない。すでに型変換済みの列に再適用しても結果は変わらない。
+    """
+    df_typed = df.copy()
+
+    for col in INT_COLUMNS:
+        if col in df_typed.columns:
+            numeric = pd.to_numeric(df_typed[col], errors='coerce')
+            df_typed[col] = numeric.where(numeric % 1 == 0).astype('Int64')
+
+    for col in FLOAT_COLUMNS:
+        if col in df_typed.columns:
+            df_typed[col] = pd.to_numeric(df_typed[col], errors='coerce').astype('Float64')
+
+    for col in DATE_COLUMNS:
+        if col in df_typed.columns:
+            df_typed[col] = pd.to_datetime(df_typed[col], errors='coerce')
+
+    for col in df_typed.columns:
+        if str(col).startswith(FLAG_PREFIX):
+            df_typed[col] = df_typed[col].astype(_flag_dtype(df_typed[col], col))
+
+    for col in TEXT_COLUMNS:
+        if col in df_typed.columns:
+            df_typed[col] = df_typed[col].astype(TEXT_DTYPE)
+
+    return df_typed
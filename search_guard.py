@@ -0,0 +1,106 @@
+# search_guard.py
+# 責務: 添付ファイル内容の結合で巨大化した本文に対し、パターン検索の範囲と時間を制限する。
+#       - アンカー（'年齢' の「齢」など、パターンに必ず含まれる文字列）の周辺だけを正規表現で検索する
+#       - メール1件あたりの検索時間に上限を設け、超えた場合は残りの項目を打ち切って記録する
+#       re モジュールは検索の途中で中断できないため、1回の検索コストは「窓の長さ」で抑える。
+
+import json
+import os
+import re
+import time
+from config import (PATTERN_ANCHORS, GUARDED_MIN_BODY_LENGTH, GUARDED_WINDOW_BEFORE,
+                    GUARDED_WINDOW_AFTER, GUARDED_TIME_BUDGET_SEC)
+
+
+class SearchGuard:
+    """
+    PatternBank.scan_guarded から使う検索ガード。
+    start_mail() でメールごとの計測を始め、windows() で項目ごとの検索範囲を、
+    over_budget() で時間切れかどうかを返す。時間切れのメールは overflows に記録する。
+    """
+
+    def __init__(self, anchors: dict = PATTERN_ANCHORS, min_body_length: int = GUARDED_MIN_BODY_LENGTH,
+                 window_before: int = GUARDED_WINDOW_BEFORE, window_after: int = GUARDED_WINDOW_AFTER,
+                 time_budget: float = GUARDED_TIME_BUDGET_SEC):
+        self.min_body_length = min_body_length
+        self.window_before = window_before
+        self.window_after = window_after
+        self.time_budget = time_budget
+        # 大文字小文字の区別が無いアンカー（漢字・記号）は str.find、英字を含むものは IGNORECASE のリテラル検索で探す
+        # （1本の IGNORECASE 交替パターンにまとめるより、リテラルごとの検索の方が数倍速い）
+        self._anchors = {}
+        for field, field_anchors in anchors.items():
+            if field_anchors:
+                self._anchors[field] = [
+                    (a, re.compile(re.escape(a), re.IGNORECASE) if a.lower() != a.upper() else None) for a in field_anchors
+                ]
+        self.stats = {'mails': 0, 'windowed_mails': 0, 'skipped_by_anchor': 0, 'overflows': 0}
+        self.overflows = []   # [{'mail_id', 'text_length', 'elapsed_sec', 'skipped_fields'}, ...]
+        self.current_mail_id = None
+        self._started = 0.0
+
+    def start_mail(self, text_length: int):
+        self.stats['mails'] += 1
+        if text_length >= self.min_body_length:
+            self.stats['windowed_mails'] += 1
+        self._started = time.perf_counter()
+
+    def over_budget(self) -> bool:
+        return time.perf_counter() - self._started > self.time_budget
+
+    def windows(self, text: str, field: str):
+        """
+        項目 field を検索する範囲 [(start, end), ...] を前から順に返す。
+        本文が短い場合やアンカー未定義の項目は全文、アンカーが1つも無い場合は空リスト（検索不要）。
+        """
+        field_anchors = self._anchors.get(field)
+        if len(text) < self.min_body_length or field_anchors is None:
+            return [(0, len(text))]
+
+        positions = []
+        for anchor, compiled in field_anchors:
+            if compiled is not None:
+                positions.extend((m.start(), m.end()) for m in compiled.finditer(text))
+                continue
+            found = text.find(anchor)
+            while found != -1:
+                positions.append((found, found + len(anchor)))
+                found = text.find(anchor, found + 1)
+        positions.sort()
+
+        merged = []
+        for anchor_start, anchor_end in positions:
+            start = max(anchor_start - self.window_before, 0)
+            end = min(anchor_end + self.window_after, len(text))
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        if not merged:
+            self.stats['skipped_by_anchor'] += 1
+        return merged
+
+    def record_overflow(self, text_length: int, skipped_fields: list):
+        self.stats['overflows'] += 1
+        self.overflows.append({
+            'mail_id': str(self.current_mail_id),
+            'text_length': text_length,
+            'elapsed_sec': round(time.perf_counter() - self._started, 3),
+            'skipped_fields': list(skipped_fields),
+        })
+
+    def summary(self) -> str:
+        """集計を1行の文字列で返す。"""
+        return (f"ガード付き検索: {self.stats['mails']} 件 (窓検索 {self.stats['windowed_mails']} 件, "
+                f"アンカーなしで省略 {self.stats['skipped_by_anchor']} 項目, 時間超過 {self.stats['overflows']} 件)")
+
+    def dump(self, path: str) -> dict:
+        """時間超過したメールの一覧を JSON で書き出す（手作業での確認用）。超過が無ければ書き出さない。"""
+        print(self.summary())
+        report = {'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'stats': self.stats, 'overflows': self.overflows}
+        if self.overflows:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"⚠️ 時間超過で一部の項目を抽出できなかったメール: {len(self.overflows)} 件 → {path}")
+        return report
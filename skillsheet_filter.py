@@ -0,0 +1,77 @@
+# skillsheet_filter.py
+# 責務: 検索画面 (gui_search_window.py) の絞り込みロジック (キーワードの AND 検索と、年齢/単価/実働開始の範囲指定)。
+#       tkinter / win32com を読み込まないため、GUI の無い環境 (ベンチマーク・テスト) からも同じ処理を呼び出せる。
+
+import pandas as pd
+
+
+def filter_skillsheets_by_keywords(df: pd.DataFrame, keywords: list) -> pd.DataFrame:
+    """キーワードリストを用いて、指定された列に対してAND検索を実行する。"""
+    if df.empty or not keywords: return df
+    search_cols = [col for col in df.columns if col  in ['スキル','件名','本文','添付ファイル内容']]
+    df_search = df[search_cols].astype(str).fillna(' ').agg(' '.join, axis=1).str.lower()
+    
+    filter_condition = pd.Series([True] * len(df), index=df.index)
+    
+    for keyword in keywords:
+        lower_keyword = keyword.lower().strip()
+        if lower_keyword:
+            filter_condition = filter_condition & df_search.str.contains(lower_keyword, na=False)
+            
+    return df[filter_condition]
+
+def filter_skillsheets(df: pd.DataFrame, keywords: list, range_data: dict) -> pd.DataFrame:
+    """キーワード（AND検索）と範囲指定（年齢/単価/実働開始）の両方でデータをフィルタリングするメインロジック。"""
+    df_filtered = df.copy()
+    
+    # 1. キーワードフィルタリング (AND条件)
+    df_filtered = filter_skillsheets_by_keywords(df_filtered, keywords)
+    if df_filtered.empty: return df_filtered
+    
+    # 2. 範囲指定フィルタリング
+    for key, limits in range_data.items():
+        lower = limits['lower']
+        upper = limits['upper']
+        if not lower and not upper: continue
+
+        col_name = {'age': '年齢', 'price': '単価', 'start': '実働開始'}.get(key)
+        
+        if col_name in ['年齢', '単価']:
+            try:
+                col = df_filtered[col_name]
+                # 読み込み時に型変換済み（Int64）なら再解析しない
+                col_numeric = col if pd.api.types.is_numeric_dtype(col) else pd.to_numeric(col, errors='coerce')
+                
+                is_not_nan = col_numeric.notna()
+                
+                lower_val = int(lower) if lower and str(lower).isdigit() else col_numeric.min()
+                upper_val = int(upper) if upper and str(upper).isdigit() else col_numeric.max()
+                
+                valid_range_filter = is_not_nan & (col_numeric >= lower_val) & (col_numeric <= upper_val)
+                
+                filter_condition = valid_range_filter | (~is_not_nan) 
+                df_filtered = df_filtered[filter_condition]
+                
+            except Exception as e:
+                print(f"🚨 データ型エラー: '{col_name}'の入力値またはデータが無効です。{e}")
+                continue
+                
+        elif key == 'start' and '実働開始' in df_filtered.columns:
+            is_nan_or_nat = df_filtered['実働開始'].isna()
+            
+            df_target = df_filtered[~is_nan_or_nat].copy()
+            start_col_target_str = df_target['実働開始'].astype(str)
+            
+            filter_condition = pd.Series([True] * len(df_target), index=df_target.index)
+            
+            if lower: 
+                filter_condition = filter_condition & (start_col_target_str >= lower)
+            if upper:
+                filter_condition = filter_condition & (start_col_target_str <= upper)
+                
+            df_filtered = pd.concat([
+                df_target[filter_condition],
+                df_filtered[is_nan_or_nat] # NaNだった行を無条件で追加
+            ]).drop_duplicates(keep='first').sort_index()
+            
+    return df_filtered
@@ -0,0 +1,208 @@
+# sync_state.py
+# 責務: 「未処理のみ」の取り込みを差分同期にするため、アカウント・フォルダごとの同期状態を SQLite に保存する。
+#       - 最高水位 (high-water mark): 前回までに最後まで走査できた実行で見た、最も新しい受信日時
+#       - 判定済みの EntryID: 最高水位の少し前 (SYNC_OVERLAP_MINUTES) 以降に判定したメール
+#       次回は Outlook 側の絞り込みを「[ReceivedTime] >= 最高水位 - 重なり」だけにし (カテゴリの DASL 絞り込みは使わない)、
+#       判定済みの EntryID はプロパティを読まずに飛ばす。処理済みカテゴリの判定は安全のために残す。
+#       あわせて、起動時に表示する未処理メールの件数 (email_processor.count_unprocessed_mail) の前回の結果も保存する。
+#       必須/除外キーワードの設定を変えた場合は、判定済みのメールも判定し直すため状態を作り直す。
+#       注意: 受信日時が最高水位より古いメールを後からフォルダに移動した場合は対象にならない。
+#             reset_sync_state() で状態を消すと、次回は従来どおりカテゴリで絞り込む全件走査になる。
+
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+from config import SYNC_STATE_PATH, SYNC_OVERLAP_MINUTES
+
+
+def _connect(path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS sync_state ("
+        " account TEXT NOT NULL, folder TEXT NOT NULL, high_water_mark TEXT NOT NULL, keywords_hash TEXT NOT NULL,"
+        " updated_at TEXT NOT NULL,"
+        " PRIMARY KEY (account, folder))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS sync_seen ("
+        " account TEXT NOT NULL, folder TEXT NOT NULL, entry_id TEXT NOT NULL, received_time TEXT NOT NULL,"
+        " PRIMARY KEY (account, folder, entry_id))"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS unprocessed_count ("
+        " account TEXT NOT NULL, folder TEXT NOT NULL, keywords_hash TEXT NOT NULL, checked_at TEXT NOT NULL,"
+        " entry_ids TEXT NOT NULL, PRIMARY KEY (account, folder))"
+    )
+    conn.commit()
+    return conn
+
+
+def _hash_keywords(keywords) -> str:
+    return hashlib.sha256(json.dumps(keywords, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class SyncState:
+    """
+    アカウント・フォルダ1つ分の同期状態。keywords (判定に使うキーワード設定) が保存時と違う場合は、状態が無いものとして扱う。
+    window_start() が None の場合は初回 (または状態を消した後) のため、呼び出し側は従来の絞り込みで全件を走査する。
+    mark_seen() で判定したメールを記録し、close(completed=True) で最高水位を進める
+    (途中で止めた実行では最高水位を進めず、判定済みの EntryID だけを残す)。
+    同じスレッドで生成・使用すること（sqlite3 の接続はスレッドをまたげない）。
+    """
+
+    FLUSH_EVERY = 500
+
+    def __init__(self, account_name: str, folder_path: str, keywords=None, path: str = SYNC_STATE_PATH,
+                 overlap_minutes: int = SYNC_OVERLAP_MINUTES):
+        self.account_name = account_name
+        self.folder_path = folder_path
+        self.overlap = datetime.timedelta(minutes=overlap_minutes)
+        self.stats = {'skipped_seen': 0, 'marked_seen': 0}
+        self._conn = _connect(path)
+        self._key = (account_name, folder_path)
+        self._keywords_hash = _hash_keywords(keywords)
+        self._pending = {}
+        self._newest = None
+
+        row = self._conn.execute(
+            "SELECT high_water_mark, keywords_hash FROM sync_state WHERE account = ? AND folder = ?", self._key
+        ).fetchone()
+        if row is not None and row[1] != self._keywords_hash:
+            print("キーワードの設定が変わったため、差分同期の状態を作り直します。")
+            self._clear()
+            row = None
+        self.high_water_mark = datetime.datetime.fromisoformat(row[0]) if row else None
+        self._seen = {entry_id for (entry_id,) in self._conn.execute(
+            "SELECT entry_id FROM sync_seen WHERE account = ? AND folder = ?", self._key
+        )}
+
+    def _clear(self):
+        with self._conn:
+            self._conn.execute("DELETE FROM sync_state WHERE account = ? AND folder = ?", self._key)
+            self._conn.execute("DELETE FROM sync_seen WHERE account = ? AND folder = ?", self._key)
+
+    def window_start(self):
+        """Outlook 側で絞り込む受信日時の下限 (最高水位 - 重なり)。初回は None。"""
+        if self.high_water_mark is None:
+            return None
+        return self.high_water_mark - self.overlap
+
+    def seen_entry_ids(self) -> frozenset:
+        """判定済みの EntryID のスナップショット (別スレッドでの事前の判定には、SyncState ではなくこれを渡す)。"""
+        return frozenset(self._seen)
+
+    def is_seen(self, entry_id: str) -> bool:
+        if entry_id in self._seen:
+            self.stats['skipped_seen'] += 1
+            return True
+        return False
+
+    def mark_seen(self, entry_id: str, received_time: datetime.datetime):
+        """判定した (または判定を始めた) メールを記録し、最高水位の候補を更新する。"""
+        self._seen.add(entry_id)
+        self._pending[entry_id] = received_time.isoformat()
+        self.stats['marked_seen'] += 1
+        if self._newest is None or received_time > self._newest:
+            self._newest = received_time
+        if len(self._pending) >= self.FLUSH_EVERY:
+            self.flush()
+
+    def forget(self, entry_id: str):
+        """判定を終えられなかったメール (途中で止めた実行で結果待ちだったもの) を、判定済みから外す。"""
+        self._seen.discard(entry_id)
+        if self._pending.pop(entry_id, None) is None:
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM sync_seen WHERE account = ? AND folder = ? AND entry_id = ?", self._key + (entry_id,)
+                )
+
+    def flush(self):
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sync_seen (account, folder, entry_id, received_time) VALUES (?, ?, ?, ?)",
+                [self._key + (entry_id, received_time) for entry_id, received_time in self._pending.items()],
+            )
+        self._pending = {}
+
+    def summary(self) -> str:
+        high_water_mark = self.high_water_mark.strftime('%Y-%m-%d %H:%M') if self.high_water_mark else "なし"
+        return (f"差分同期: 最高水位 {high_water_mark} / 判定済みで省略 {self.stats['skipped_seen']} 件 "
+                f"/ 新たに判定 {self.stats['marked_seen']} 件")
+
+    def close(self, completed: bool = False):
+        """
+        判定済みの EntryID を反映する。completed=True (最後まで走査できた) の場合は最高水位を進め、
+        新しい重なりの範囲より古い判定済みの EntryID を削除する (次回の絞り込みで対象にならないため)。
+        """
+        self.flush()
+        if completed and self._newest is not None and (self.high_water_mark is None or self._newest > self.high_water_mark):
+            self.high_water_mark = self._newest
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO sync_state (account, folder, high_water_mark, keywords_hash, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    self._key + (self.high_water_mark.isoformat(), self._keywords_hash, datetime.datetime.now().isoformat()),
+                )
+                self._conn.execute(
+                    "DELETE FROM sync_seen WHERE account = ? AND folder = ? AND received_time < ?",
+                    self._key + (self.window_start().isoformat(),),
+                )
+        self._conn.close()
+
+
+def reset_sync_state(account_name: str, folder_path: str, path: str = SYNC_STATE_PATH):
+    """同期状態を消す (処理済みカテゴリを解除した場合など)。次回の「未処理のみ」は全件を走査する。"""
+    if not os.path.exists(path):
+        return
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM sync_state WHERE account = ? AND folder = ?", (account_name, folder_path))
+            conn.execute("DELETE FROM sync_seen WHERE account = ? AND folder = ?", (account_name, folder_path))
+            conn.execute("DELETE FROM unprocessed_count WHERE account = ? AND folder = ?", (account_name, folder_path))
+    finally:
+        conn.close()
+
+
+def load_unprocessed_count(account_name: str, folder_path: str, keywords=None, path: str = SYNC_STATE_PATH,
+                           overlap_minutes: int = SYNC_OVERLAP_MINUTES):
+    """
+    前回数えた未処理メールの件数の情報を (この受信日時以降のメールを判定し直す日時, 該当した EntryID のリスト) で返す。
+    保存が無い場合・keywords が保存時と違う場合は None。
+    """
+    if not os.path.exists(path):
+        return None
+    conn = _connect(path)
+    try:
+        row = conn.execute(
+            "SELECT keywords_hash, checked_at, entry_ids FROM unprocessed_count WHERE account = ? AND folder = ?",
+            (account_name, folder_path),
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None or row[0] != _hash_keywords(keywords):
+        return None
+    since = datetime.datetime.fromisoformat(row[1]) - datetime.timedelta(minutes=overlap_minutes)
+    return since, json.loads(row[2])
+
+
+def save_unprocessed_count(account_name: str, folder_path: str, checked_at: datetime.datetime, entry_ids,
+                           keywords=None, path: str = SYNC_STATE_PATH):
+    """数えた時刻 (数え始めた時刻) と、該当した EntryID を保存する。"""
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO unprocessed_count (account, folder, keywords_hash, checked_at, entry_ids)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (account_name, folder_path, _hash_keywords(keywords), checked_at.isoformat(), json.dumps(sorted(entry_ids))),
+            )
+    finally:
+        conn.close()
@@ -0,0 +1,7 @@
+# tests/conftest.py
+# リポジトリ直下のモジュール (email_processor など) をテストから import できるようにする。
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,58 @@
+# tests/test_attachment_pool.py
+# AttachmentPool のタイムアウトが解析の開始から数えられ、応答しないワーカーの後ろのジョブが止まらないことを確認する。
+
+import threading
+import time
+import attachment_pool
+from attachment_pool import AttachmentPool, is_complete
+from attachment_spool import AttachmentSpool
+
+
+def _pool(tmp_path, monkeypatch, parse, **kwargs):
+    monkeypatch.setattr(attachment_pool, 'get_attachment_text', parse)
+    return AttachmentPool(mode="thread", spool=AttachmentSpool(spool_dir=str(tmp_path)), **kwargs)
+
+
+def _attachments(names):
+    return [(name, lambda spool, name=name: spool.from_bytes(name, b"data")) for name in names]
+
+
+def test_queued_jobs_are_not_timed_out(tmp_path, monkeypatch):
+    def parse(path, file_name):
+        time.sleep(0.3)
+        return file_name
+
+    pool = _pool(tmp_path, monkeypatch, parse, workers=1, timeout=0.5)
+    try:
+        text = pool.collect(pool.submit(_attachments(["a.txt", "b.txt", "c.txt"])))
+    finally:
+        pool.close()
+    assert is_complete(text) and pool.stats['timeouts'] == 0
+
+
+def test_hung_job_is_abandoned_and_queued_jobs_continue(tmp_path, monkeypatch):
+    release = threading.Event()
+
+    def parse(path, file_name):
+        if file_name == "hung.xlsx":
+            release.wait(10)
+        return file_name
+
+    pool = _pool(tmp_path, monkeypatch, parse, workers=1, timeout=0.3, max_abandoned=2)
+    try:
+        jobs = pool.submit(_attachments(["hung.xlsx", "ok.txt"]))
+        time.sleep(0.5)
+        # 開始から timeout を過ぎたジョブは、collect() に届いた時点で待たずにタイムアウトにする
+        started = time.time()
+        text = pool.collect(jobs)
+        assert time.time() - started < 0.3
+        assert "hung.xlsx: テキスト化が開始から" in text and "--- FILE: ok.txt ---" in text
+        assert pool.stats['timeouts'] == 1 and pool.stats['pool_replacements'] == 1
+
+        # 見捨てたジョブが上限に達した後はプールを入れ替えず、新しい添付ファイルはエラーとして記録する
+        pool.collect(pool.submit(_attachments(["hung.xlsx"])))
+        text = pool.collect(pool.submit(_attachments(["later.txt"])))
+        assert pool.stats['pool_replacements'] == 1 and not is_complete(text)
+    finally:
+        release.set()
+        pool.close()
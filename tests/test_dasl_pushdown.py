@@ -0,0 +1,93 @@
+# tests/test_dasl_pushdown.py
+# 必須/除外キーワードの DASL 絞り込み (dasl_query.py) をしても、Python 側の判定だけの場合と同じメールが残ることを、
+# 記録済みの Outlook フォルダ (outlook_recording.py) で確認する。
+
+import base64
+import datetime
+import pytest
+import attachment_pool
+import email_processor
+from attachment_cache import AttachmentTextCache
+from dasl_query import PROP_SUBJECT, evaluate, keyword_condition, to_dasl_query
+from keyword_matcher import KeywordMatcher
+from mail_store import MailStore
+from outlook_recording import RecordedOutlook
+
+ACCOUNT = 'user@example.com'
+FOLDER = '受信トレイ'
+MUST_INCLUDE_KEYWORDS = [r'スキルシート', r'100%達成', r'C_B', r'\[至急\]']
+EXCLUDE_KEYWORDS = [r'請求書', r'セミナー']
+
+
+def _record(entry_id, subject, body='', attachment=None):
+    attachments = [{'FileName': 'attachment.txt', 'content_b64': base64.b64encode(attachment.encode()).decode()}] if attachment else []
+    return {'EntryID': entry_id, 'Subject': subject, 'Body': body, 'Categories': '', 'MessageClass': 'IPM.Note', 'Class': 43,
+            'ReceivedTime': datetime.datetime(2026, 10, 18, 12) - datetime.timedelta(hours=len(entry_id)), 'Attachments': attachments}
+
+
+RECORDS = [
+    _record('E01', 'スキルシート送付', 'よろしくお願いします'),
+    _record('E02', 'ご連絡', '本文にスキルシートがあります'),
+    _record('E03', 'お世話になります'),
+    # 必須キーワードが添付ファイルの内容にだけある (hasattachment = 1 で候補に残す)
+    _record('E04', 'ご紹介', '添付をご確認ください', attachment='スキルシート 氏名：山田'),
+    _record('E05', 'ご紹介', '添付をご確認ください', attachment='関係のない資料'),
+    # 除外キーワード: 件名・本文は Outlook 側で除外し、添付ファイルの内容は Python 側で除外する
+    _record('E06', 'スキルシートと請求書', '送付します'),
+    _record('E07', 'セミナーのご案内', '添付をご確認ください', attachment='スキルシート'),
+    _record('E08', 'スキルシート送付', '添付をご確認ください', attachment='請求書'),
+    _record('E09', 'ご紹介', '添付をご確認ください', attachment='スキルシート 請求書'),
+    # LIKE の特殊文字 (% _ [) はリテラルとして扱う
+    _record('E10', '目標100%達成の要員'),
+    _record('E11', '目標100X達成の要員'),
+    _record('E12', 'C_B 経験者'),
+    _record('E13', 'CXB 経験者'),
+    _record('E14', '[至急] 要員のご紹介'),
+    _record('E15', '至急 要員のご紹介'),
+]
+
+
+@pytest.fixture
+def keywords(tmp_path, monkeypatch):
+    monkeypatch.setattr(email_processor, 'MUST_INCLUDE_KEYWORDS', MUST_INCLUDE_KEYWORDS)
+    monkeypatch.setattr(email_processor, 'EXCLUDE_KEYWORDS', EXCLUDE_KEYWORDS)
+    monkeypatch.setattr(email_processor, 'MAIL_KEYWORD_MATCHER',
+                        KeywordMatcher({'must_include': MUST_INCLUDE_KEYWORDS, 'exclude': EXCLUDE_KEYWORDS}))
+    # キャッシュ・メールストアは実行ごとに新しいファイルにする (リポジトリのファイルを使わない)
+    runs = iter(range(100))
+    monkeypatch.setattr(email_processor, 'MailStore', lambda: MailStore(str(tmp_path / f'mail_store_{next(runs)}.sqlite3')))
+    monkeypatch.setattr(email_processor, 'AttachmentTextCache', lambda: AttachmentTextCache(str(tmp_path / f'attachment_cache_{next(runs)}.sqlite3')))
+    monkeypatch.setattr(attachment_pool, 'get_attachment_text', lambda path, file_name: open(path, encoding='utf-8').read())
+
+
+def _ingest(use_table, use_keyword_pushdown):
+    outlook = RecordedOutlook(ACCOUNT, FOLDER, RECORDS)
+    records = email_processor.iter_mail_data_from_outlook(FOLDER, ACCOUNT, outlook_app=outlook, use_table=use_table,
+                                                          use_sync_state=False, use_keyword_pushdown=use_keyword_pushdown)
+    return {record['EntryID'] for record in records}, outlook.stats
+
+
+@pytest.mark.parametrize('use_table', [False, True])
+def test_pushdown_keeps_python_filter_result(keywords, use_table):
+    python_only, python_stats = _ingest(use_table, use_keyword_pushdown=False)
+    pushdown, pushdown_stats = _ingest(use_table, use_keyword_pushdown=True)
+
+    assert python_only == {'E01', 'E02', 'E04', 'E10', 'E12', 'E14'}
+    assert pushdown == python_only
+    assert pushdown_stats['com_calls'] < python_stats['com_calls']
+
+
+@pytest.mark.parametrize('keyword, matching, other', [
+    ('100%達成', '目標100%達成', '目標100X達成'),
+    ('C_B', 'C_B 経験者', 'CXB 経験者'),
+    ('[至急]', '[至急] ご紹介', '至 ご紹介'),
+])
+def test_like_literals_are_escaped(keyword, matching, other):
+    query = to_dasl_query([keyword_condition(PROP_SUBJECT, keyword)])
+    assert evaluate(query, matching, lambda subject, prop: subject)
+    assert not evaluate(query, other, lambda subject, prop: subject)
+
+
+def test_restrict_datetime_format():
+    assert email_processor._format_restrict_datetime(datetime.datetime(2026, 1, 5, 13, 7, 59)) == '01/05/2026 01:07 PM'
+    assert email_processor._format_restrict_datetime(datetime.datetime(2026, 10, 18, 0, 30)) == '10/18/2026 12:30 AM'
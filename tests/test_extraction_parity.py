@@ -0,0 +1,46 @@
+# tests/test_extraction_parity.py
+# 本文が文字列以外 (None・NaN など) の場合も含めて、抽出エンジン (row / vectorized) と
+# ストリーミング抽出 (collect_extracted) が同じ結果になることを確認する。
+
+import numpy as np
+import pandas as pd
+import pytest
+from extraction_core import extract_skills_data, collect_extracted, _normalize_body
+
+BODIES = [
+    "スキルシートを送付します。\r\n氏名：山田 太郎\t年齢：35歳\n単金：70万円\n詳細設計・製造・テスト",
+    None,
+    np.nan,
+    12345,
+    "",
+]
+
+
+def _mail_data() -> pd.DataFrame:
+    return pd.DataFrame({
+        'EntryID': [f'E{i}' for i in range(len(BODIES))],
+        '件名': ['スキルシート送付'] * len(BODIES),
+        '本文(テキスト形式)': pd.Series(BODIES, dtype=object),
+    })
+
+
+def test_normalize_body_stringifies_like_str():
+    assert _normalize_body("a\r\n b\t\tc") == "a b c"
+    assert _normalize_body(None) == 'None'
+    assert _normalize_body(np.nan) == 'nan'
+    assert _normalize_body(12345) == '12345'
+
+
+@pytest.mark.parametrize("mode", ["row", "vectorized"])
+def test_streaming_matches_dataframe_engines(mode):
+    expected = extract_skills_data(_mail_data(), mode=mode, workers=1, profile=False, guarded=False)
+    streamed = collect_extracted(_mail_data().to_dict('records'), profile=False, guarded=False)
+    pd.testing.assert_frame_equal(streamed, expected)
+    assert expected['本文(テキスト形式)'].tolist()[1:3] == ['None', 'nan']
+
+
+def test_row_matches_vectorized():
+    pd.testing.assert_frame_equal(
+        extract_skills_data(_mail_data(), mode="row", workers=1, profile=False, guarded=False),
+        extract_skills_data(_mail_data(), mode="vectorized", workers=1, profile=False, guarded=False),
+    )
@@ -0,0 +1,29 @@
+# tests/test_ingest_jobs.py
+# IngestJob が EntryID で重複を除き、EntryID を取得できなかったメールは除かないことを確認する。
+
+import ingest_jobs
+from ingest_jobs import IngestJob, normalize_ingest_targets
+
+# 同じ共有メールボックスを、共有アドレスと委任 (自分のアカウントに追加した名前) の2つの対象で指定した場合
+RECORDS = {
+    ('shared@example.com', '受信トレイ'): ['E1', 'E2', 'UNKNOWN', None],
+    ('営業部 共有', '受信トレイ'): ['E1', 'E2', 'UNKNOWN'],
+    ('user@example.com', '受信トレイ'): ['E3', None],
+}
+
+
+def _iter_mail_data(folder_path, account_name, **kwargs):
+    for entry_id in RECORDS[(account_name, folder_path)]:
+        yield {'EntryID': entry_id, '件名': f'{account_name}/{folder_path}'}
+
+
+def test_dedupe_by_entry_id_and_keep_placeholder_ids(monkeypatch):
+    monkeypatch.setattr(ingest_jobs, 'iter_mail_data_from_outlook', _iter_mail_data)
+    job = IngestJob(normalize_ingest_targets(list(RECORDS)), outlook_app=object(), workers=2)
+    records = list(job.iter_records())
+
+    # 2つの対象から届いた E1・E2 は1件ずつにし、EntryID を取得できなかったメールはすべて残す
+    assert sorted(record['EntryID'] for record in records if record['EntryID'] not in ('UNKNOWN', None)) == ['E1', 'E2', 'E3']
+    assert sum(1 for record in records if record['EntryID'] in ('UNKNOWN', None)) == 4
+    assert job.stats['duplicates'] == 2
+    assert sum(job.stats['records'].values()) == len(records) == 7
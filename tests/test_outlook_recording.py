@@ -0,0 +1,146 @@
+# tests/test_outlook_recording.py
+# 記録済みの Outlook フォルダ (outlook_recording.py) で、従来の取得経路と Folder.GetTable の経路の結果が一致し、
+# GetTable の経路の COM 呼び出しが少ないことを確認する。
+
+import base64
+import datetime
+import threading
+import pytest
+import attachment_pool
+import email_processor
+from attachment_cache import AttachmentTextCache
+from mail_store import MailStore
+from outlook_recording import RecordedNamespace, RecordedOutlook, load_recording, save_recording
+from sync_state import SyncState
+
+ACCOUNT = 'user@example.com'
+FOLDER = '受信トレイ'
+
+
+def _records():
+    subjects = ['スキルシート送付', '案件のご紹介', 'セミナーのご案内', 'スキルシート 山田']
+    bodies = ['スキルシートを添付します。氏名：山田 年齢：30歳', 'お世話になります', '請求書を送付します スキルシート']
+    categories = ['', '', 'スキルシート処理済', '赤']
+    message_classes = ['IPM.Note', 'IPM.Note.SMIME', 'IPM.Appointment']
+    received = datetime.datetime(2026, 10, 18, 12)
+    records = []
+    for i in range(40):
+        message_class = message_classes[i % len(message_classes)]
+        attachments = [{'FileName': 'skill.txt', 'content_b64': base64.b64encode('スキル：Java'.encode()).decode()}] if i % 5 == 0 else []
+        records.append({
+            'EntryID': f'E{i:04d}', 'Subject': subjects[i % len(subjects)], 'Body': bodies[i % len(bodies)],
+            'Categories': categories[i % len(categories)], 'MessageClass': message_class,
+            'Class': 43 if message_class.startswith('IPM.Note') else 26,
+            'ReceivedTime': received - datetime.timedelta(hours=i * 7), 'Attachments': attachments,
+        })
+    return records
+
+
+@pytest.fixture
+def recording(tmp_path, monkeypatch):
+    path = str(tmp_path / 'recorded_inbox.json')
+    save_recording(path, ACCOUNT, FOLDER, _records())
+    # キャッシュ・メールストアは実行ごとに新しいファイルにする (リポジトリのファイルを使わない)
+    runs = iter(range(100))
+    monkeypatch.setattr(email_processor, 'MailStore', lambda: MailStore(str(tmp_path / f'mail_store_{next(runs)}.sqlite3')))
+    monkeypatch.setattr(email_processor, 'AttachmentTextCache', lambda: AttachmentTextCache(str(tmp_path / f'attachment_cache_{next(runs)}.sqlite3')))
+    monkeypatch.setattr(attachment_pool, 'get_attachment_text', lambda path, file_name: open(path, encoding='utf-8').read())
+    return path
+
+
+def _ingest(path, use_table):
+    outlook = load_recording(path)
+    records = list(email_processor.iter_mail_data_from_outlook(FOLDER, outlook.account_name, outlook_app=outlook,
+                                                               use_table=use_table, use_sync_state=False))
+    return sorted(records, key=lambda record: record['EntryID']), outlook
+
+
+def test_table_path_matches_legacy_path_with_fewer_com_calls(recording):
+    legacy_records, legacy_outlook = _ingest(recording, use_table=False)
+    table_records, table_outlook = _ingest(recording, use_table=True)
+
+    assert legacy_records, "記録から1件も取得できませんでした"
+    assert table_records == legacy_records
+    assert table_outlook.categories_by_entry_id() == legacy_outlook.categories_by_entry_id()
+    assert table_outlook.stats['table_batches'] > 0
+    assert table_outlook.stats['com_calls'] < legacy_outlook.stats['com_calls']
+
+
+def test_table_path_marks_mail_when_item_fetch_fails(recording, monkeypatch):
+    # 取り込みのスレッドの GetItemFromID だけが1回失敗する (書き込みキューのスレッドでは取得できる)
+    get_item = RecordedNamespace.GetItemFromID
+    failed = []
+
+    def flaky_get_item(namespace, entry_id, store_id=None):
+        if entry_id == 'E0000' and not failed:
+            failed.append(entry_id)
+            raise RuntimeError("一時的な取得エラー")
+        return get_item(namespace, entry_id, store_id)
+
+    monkeypatch.setattr(RecordedNamespace, 'GetItemFromID', flaky_get_item)
+    records, outlook = _ingest(recording, use_table=True)
+
+    assert failed == ['E0000']
+    assert 'E0000' not in {record['EntryID'] for record in records}
+    assert email_processor.PROCESSED_CATEGORY_NAME in outlook.categories_by_entry_id()['E0000']
+
+
+def test_windowed_path_uses_sync_state_on_ingest_thread(recording, tmp_path, monkeypatch):
+    now = datetime.datetime.now().replace(microsecond=0)
+    records = [
+        {'EntryID': f'W{i:02d}', 'Subject': 'スキルシート送付', 'Body': '氏名：山田', 'Categories': '',
+         'ReceivedTime': now - datetime.timedelta(hours=i * 12)}
+        for i in range(20)
+    ]
+    keywords = [email_processor.MUST_INCLUDE_KEYWORDS, email_processor.EXCLUDE_KEYWORDS]
+    sync_path = str(tmp_path / 'sync_state.sqlite3')
+    # 前回の実行で W15 以前を判定済みにしておく (最高水位は W15 の受信日時)
+    previous = SyncState(ACCOUNT, FOLDER, keywords=keywords, path=sync_path)
+    for record in records[15:]:
+        previous.mark_seen(record['EntryID'], record['ReceivedTime'])
+    previous.close(completed=True)
+
+    opened = []
+
+    class ThreadCheckedSyncState(SyncState):
+        # SyncState は生成したスレッドでしか使えない (期間のスレッドから呼ばれたら失敗させる)
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, path=sync_path, **kwargs)
+            self.thread = threading.current_thread()
+            opened.append(self)
+
+        def is_seen(self, entry_id):
+            assert threading.current_thread() is self.thread
+            return super().is_seen(entry_id)
+
+        def mark_seen(self, entry_id, received_time):
+            assert threading.current_thread() is self.thread
+            super().mark_seen(entry_id, received_time)
+
+    monkeypatch.setattr(email_processor, 'SyncState', ThreadCheckedSyncState)
+    outlook = RecordedOutlook(ACCOUNT, FOLDER, records)
+    ingested = list(email_processor.iter_mail_data_from_outlook(FOLDER, ACCOUNT, read_mode="unprocessed", outlook_app=outlook,
+                                                                use_table=True, window_days=2, window_workers=2))
+
+    assert sorted(record['EntryID'] for record in ingested) == [f'W{i:02d}' for i in range(15)]
+    assert opened[0].stats['skipped_seen'] == 1
+    # 判定済みの W15 はアイテムを取得しない
+    assert outlook.stats['item_fetches'] == 15 + 15 # 取り込み (15) + 処理済みマークの書き込み (15)
+
+
+def test_unprocessed_count_uses_row_count(recording, monkeypatch):
+    expected = sum(
+        1 for record in _records()
+        if record['MessageClass'].startswith('IPM.Note') and email_processor.PROCESSED_CATEGORY_NAME not in record['Categories']
+        and email_processor.MAIL_KEYWORD_MATCHER.match_groups(record['Subject'], groups=['must_include'])
+    )
+    outlook = load_recording(recording)
+    assert email_processor.count_unprocessed_mail(FOLDER, ACCOUNT, outlook_app=outlook, use_cache=False) == expected
+    # 行を取得せずに数える
+    assert outlook.stats['table_batches'] == 0
+
+    # Outlook 側で数えられない場合は、1件ずつの判定で同じ件数になる
+    monkeypatch.setattr(email_processor, 'open_table', lambda *args, **kwargs: email_processor._raise(RuntimeError("絞り込みエラー")))
+    outlook = load_recording(recording)
+    assert email_processor.count_unprocessed_mail(FOLDER, ACCOUNT, outlook_app=outlook, use_cache=False) == expected
+    assert outlook.stats['table_batches'] > 0
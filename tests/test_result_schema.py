@@ -0,0 +1,20 @@
+# tests/test_result_schema.py
+# apply_result_schema の型変換で値が失われないことを確認する。
+
+import pandas as pd
+from result_schema import apply_result_schema
+
+
+def test_flags_keep_unexpected_values():
+    df = pd.DataFrame({'開発工程_製造': ['あり', 'なし', '要確認', None]})
+    typed = apply_result_schema(df)
+    assert isinstance(typed['開発工程_製造'].dtype, pd.CategoricalDtype)
+    assert typed['開発工程_製造'].tolist()[:3] == ['あり', 'なし', '要確認']
+    assert typed['開発工程_製造'].isna().tolist() == [False, False, False, True]
+
+
+def test_schema_is_idempotent():
+    df = pd.DataFrame({'年齢': ['35', 'N/A'], '開発工程_製造': ['あり', '要確認'], '受信日時': ['2026-10-18 12:00:00', '']})
+    once = apply_result_schema(df)
+    pd.testing.assert_frame_equal(apply_result_schema(once), once)
+    assert once['年齢'].tolist()[0] == 35 and once['年齢'].isna().tolist() == [False, True]
@@ -0,0 +1,26 @@
+# tests/test_skillsheet_filter.py
+# 検索画面の絞り込みロジックを GUI なしで確認する (ベンチマークの検索ステージと同じ関数)。
+
+import pandas as pd
+from result_schema import apply_result_schema
+from skillsheet_filter import filter_skillsheets
+
+NO_RANGE = {'age': {'lower': '', 'upper': ''}, 'price': {'lower': '', 'upper': ''}, 'start': {'lower': '', 'upper': ''}}
+
+
+def _skills() -> pd.DataFrame:
+    return apply_result_schema(pd.DataFrame({
+        'スキル': ['JAVA, DB', 'Python, AWS', 'Java, PM'],
+        '件名': ['スキルシート', 'スキルシート', 'PM案件'],
+        '本文': ['', '', 'AWS 経験あり'],
+        '年齢': ['30', 'N/A', '55'],
+    }))
+
+
+def test_keywords_are_and_conditions():
+    assert filter_skillsheets(_skills(), ['java', 'aws'], NO_RANGE).index.tolist() == [2]
+
+
+def test_age_range_keeps_unknown_ages():
+    ranges = dict(NO_RANGE, age={'lower': '25', 'upper': '50'})
+    assert filter_skillsheets(_skills(), [], ranges).index.tolist() == [0, 1]